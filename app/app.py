@@ -1,5 +1,6 @@
 import sys
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QGridLayout, QFrame, QLabel
+from PyQt5.QtCore import Qt
 from videowidget import VideoWidget
 from joystickthread import JoystickThread
 from arduinothread import ArduinoThread
@@ -21,31 +22,11 @@ class MainWindow(QMainWindow):
         grid.setSpacing(20)
         
         # --- Row 0: Video Widget ---
-        self.video_widget = VideoWidget(640, 480)
+        self.video_widget = VideoWidget(1280, 720)
         self.video_widget.setStyleSheet("background-color: transparent;")
         grid.addWidget(self.video_widget, 0, 0, 1, 2)
         
-        # --- Row 1, Column 0: Thruster Outputs Panel (only Left/Right & Vertical) ---
-        thruster_frame = QFrame()
-        # Updated colors and border for increased vibrancy.
-        thruster_frame.setStyleSheet(
-            "background-color: #1E1E1E; border: 2px solid #61afef; border-radius: 5px;"
-        )
-        thruster_layout = QGridLayout(thruster_frame)
-        thruster_layout.setSpacing(10)
-        thruster_style = (
-            "font-size: 32px; font-weight: bold; color: #61afef; "
-            "background-color: transparent; padding: 10px;"
-        )
-        self.left_right_label = QLabel("Left/Right: 1500", self)
-        self.left_right_label.setStyleSheet(thruster_style)
-        self.vertical_label = QLabel("Vertical: 1500", self)
-        self.vertical_label.setStyleSheet(thruster_style)
-        thruster_layout.addWidget(self.left_right_label, 0, 0)
-        thruster_layout.addWidget(self.vertical_label, 0, 1)
-        grid.addWidget(thruster_frame, 1, 0)
-        
-        # --- Row 1, Column 1: Status / Telemetry Panel ---
+        # --- Row 1: Controller status panel. Thrusters, claws and telemetry are on the video HUD. ---
         status_frame = QFrame()
         # Use a striking orange border for this panel.
         status_frame.setStyleSheet(
@@ -59,23 +40,13 @@ class MainWindow(QMainWindow):
             "background-color: transparent; padding: 10px;"
         )
         status_layout.addWidget(self.status_label, 0, 0)
-        grid.addWidget(status_frame, 1, 1)
-        
-        # --- Create dummy labels for removed panels (Forward/Backward and Pitch) ---
-        self.dummy_fb_label = QLabel("Forward/Backward: 1500", self)
-        self.dummy_fb_label.setVisible(False)
-        self.dummy_pitch_label = QLabel("Pitch: 1500", self)
-        self.dummy_pitch_label.setVisible(False)
+        grid.addWidget(status_frame, 1, 0, 1, 2)
         
         # --- Instantiate Threads ---
         self.arduino_thread = ArduinoThread()
         self.arduino_thread.start()
         
         self.joystick_thread = JoystickThread(
-            forward_backward_thrust_label=self.dummy_fb_label,
-            left_right_thrust_label=self.left_right_label,
-            vertical_thrust_label=self.vertical_label,
-            pitch_thrust_label=self.dummy_pitch_label,
             status_bar=self.status_label,
             arduino_thread=self.arduino_thread,
             video_thread=self.video_widget  # used for screenshot capture
@@ -83,16 +54,43 @@ class MainWindow(QMainWindow):
         self.joystick_thread.start()
         
         # --- Connect Signals ---
-        self.joystick_thread.joystick_change_signal.connect(
-            lambda data: self.video_widget.update_axis_info(data.get("axis_readings", {}), data)
-        )
-        self.joystick_thread.joystick_change_signal.connect(
-            lambda data: self.status_label.setText(f"{data.get('joystickName', 'N/A')}")
-        )
+        self.joystick_thread.joystick_change_signal.connect(self.video_widget.update_controls)
+        self.video_widget.set_link_stats(self.arduino_thread.link_stats)
         self.arduino_thread.arduino_data_channel_signal.connect(self.handle_arduino_data)
         
+    def closeEvent(self, event):
+        self.video_widget.close_frame_bus()
+        super().closeEvent(event)
+
     def handle_arduino_data(self, data):
-        print("Arduino Telemetry:", data)
+        self.video_widget.update_telemetry(data)
+
+    def keyPressEvent(self, event):
+        match event.key():
+            case Qt.Key_R:
+                self.video_widget.toggle_recording()
+            case Qt.Key_I:
+                self.video_widget.save_replay()
+            case Qt.Key_S:
+                self.video_widget.toggle_streaming()
+            case Qt.Key_V:
+                self.video_widget.toggle_vision()
+            case Qt.Key_D:
+                self.video_widget.toggle_inference()
+            case Qt.Key_G:
+                self.video_widget.toggle_change_gate()
+            case Qt.Key_M:
+                self.video_widget.toggle_mosaic()
+            case Qt.Key_N:
+                self.video_widget.save_mosaic()
+            case Qt.Key_F:
+                self.video_widget.toggle_frame_bus()
+            case Qt.Key_L:
+                self.video_widget.toggle_latency_overlay()
+            case Qt.Key_E:
+                self.video_widget.export_latency()
+            case _:
+                super().keyPressEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,126 +1,461 @@
 import serial
 from PyQt5.QtCore import pyqtSignal, QThread, QObject, QTimer, pyqtSlot
-import platform
-import serial.tools.list_ports as ports
 import coloredlogs
 import logging
-import json
-from queue import Queue
 import time
+from queue import Queue
+from serialprotocol import (FrameDecoder, CONTROL_REPLIES, MSG_HELLO_ACK, MSG_ACK, DEFAULT_BAUD, encode_control,
+                            encode_json)
+from seriallink import LinkControl, HEARTBEAT_TIMEOUT, PING_TIMEOUT, REQUEST_ATTEMPTS
+from controlscheduler import ControlScheduler, CONTROL_RATE_HZ, KEEPALIVE_INTERVAL
+from commandchannel import CommandChannel
+from commandtracker import CommandTracker
+from serialsupervisor import SerialSupervisor, LINK_CONNECTING, LINK_UP, LINK_LOST
 
 coloredlogs.install(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Seconds a serial read waits for data before returning, so workers notice when they are stopped.
+READ_TIMEOUT = 0.1
+# How long the binary protocol handshake is attempted before falling back to JSON. Opening the port resets
+# the Mega, and its setup() waits several seconds for the ESCs, so this has to outlast a full boot.
+HANDSHAKE_TIMEOUT = 10.0
+# After a failed read or write the worker waits this long, doubling up to the maximum while failures go on.
+ERROR_BACKOFF_MIN = 0.05
+ERROR_BACKOFF_MAX = 1.0
+# A recurring error is logged at most this often.
+ERROR_REPORT_INTERVAL = 5.0
+# The writer warns when more than this fraction of recent commands went unacknowledged, checked this often.
+LOSS_WARNING_RATIO = 0.05
+HEALTH_CHECK_INTERVAL = 1.0
+# Once the handshake is done every keepalive is acked, so a link that has received nothing for this long is
+# lost: the board reset or the tether dropped. As are this many failed reads in a row.
+LINK_SILENCE_TIMEOUT = 2.0
+READ_FAILURES_LOST = 3
+# Sent in place of the pilot's setpoint when it goes stale: thrusters neutral, claws left where they are, as
+# the firmware does when the keepalives stop.
+FAILSAFE_SETPOINT = {"axisInfo": [1500, 1500, 1500, 1500]}
+
+
+class ErrorReporter:
+    """
+    Logs a recurring error at most once every `interval` seconds, with a count of the repeats held back,
+    so a failing port is reported without flooding the log.
+    """
+
+    def __init__(self, what, interval=ERROR_REPORT_INTERVAL, level=logging.CRITICAL):
+        """
+        Args:
+            what (str): What failed, prefixed to every report.
+            interval (float): Least seconds between two reports.
+            level (int): Logging level of the reports.
+        """
+        self.__what = what
+        self.__interval = interval
+        self.__level = level
+        self.__held_back = 0
+        self.__reported_at = -interval
+        self.total = 0
+
+    def report(self, error, count=1):
+        """
+        Args:
+            error: The error, or a description of it.
+            count (int): How many occurrences this report stands for.
+        """
+        self.total += count
+        now = time.monotonic()
+        if now - self.__reported_at < self.__interval:
+            self.__held_back += count
+            return
+        repeats = f" ({self.__held_back} more since the last report)" if self.__held_back else ""
+        logger.log(self.__level, f"{self.__what}: {error}{repeats}")
+        self.__held_back = 0
+        self.__reported_at = now
+
 
 class ArduinoReadWorker(QObject):
-    arduino_data_channel_signal = pyqtSignal(dict)
+    # Every message decoded from one read, delivered together so a burst costs one cross-thread signal.
+    arduino_data_batch_signal = pyqtSignal(list)
 
-    def __init__(self, serial_port):
+    def __init__(self, serial_port, tracker):
         super().__init__()
         self.serial_port = serial_port
         self.running = True
+        # time.monotonic() of the last data received, and the number of reads that failed in a row.
+        self.received_at = time.monotonic()
+        self.failures = 0
+        # Starts in binary mode for the handshake; the writer switches it to JSON if the firmware is too old.
+        self.decoder = FrameDecoder(binary=True)
+        # Replies to the link's own control messages, consumed by the writer's LinkControl.
+        self.control = Queue()
+        self.version = None
+        # Matches the sequence numbers echoed in acks against the commands the writer sent. Shared by every
+        # connection, so loss across a reconnect shows in its statistics.
+        self.tracker = tracker
+        self.__read_errors = ErrorReporter("Error reading Arduino")
+        self.__decode_errors = ErrorReporter("Undecodable data from Arduino", level=logging.WARNING)
 
     def read_arduino(self):
+        backoff = 0.0
         while self.running:
             try:
-                payload = self.serial_port.readline().decode("utf-8").strip()
-                if payload:
-                    data = json.loads(payload)
-                    self.arduino_data_channel_signal.emit(data)
+                # With nothing buffered this blocks in the driver for up to READ_TIMEOUT, so an idle link
+                # costs no CPU; otherwise it takes everything buffered in one call.
+                data = self.serial_port.read(self.serial_port.in_waiting or 1)
+                if data and self.serial_port.in_waiting:
+                    data += self.serial_port.read(self.serial_port.in_waiting)
+                backoff = 0.0
+                self.failures = 0
             except Exception as e:
-                logger.critical(f"Error reading Arduino: {e}")
+                # An unplugged port fails every read at once; back off instead of spinning on it.
+                self.__read_errors.report(e)
+                self.failures += 1
+                backoff = min(max(backoff * 2, ERROR_BACKOFF_MIN), ERROR_BACKOFF_MAX)
+                time.sleep(backoff)
+                continue
+            if data:
+                self.received_at = time.monotonic()
+                self.__deliver(data)
+
+    def __deliver(self, data):
+        errors = self.decoder.errors
+        batch = []
+        for message in self.decoder.feed(data):
+            if message.type in CONTROL_REPLIES:
+                if message.type == MSG_HELLO_ACK:
+                    self.version = message.fields["hello"]
+                self.control.put(message)
+            else:
+                if message.type == MSG_ACK and "seq" in message.fields:
+                    self.tracker.acked(message.fields["seq"])
+                batch.append(message.fields)
+        if batch:
+            self.arduino_data_batch_signal.emit(batch)
+        if self.decoder.errors != errors:
+            self.__decode_errors.report(f"{self.decoder.errors} frames dropped so far", self.decoder.errors - errors)
 
 
 class ArduinoWriteWorker(QObject):
-    def __init__(self, serial_port, queue):
+    def __init__(self, serial_port, channel, read_worker, heartbeat_timeout=HEARTBEAT_TIMEOUT, refresh=None):
         super().__init__()
         self.serial_port = serial_port
-        self.queue = queue
+        self.channel = channel
+        # Asks for the full setpoint to be sent again, after the writer overrode it.
+        self.refresh = refresh
+        self.heartbeat_timeout = heartbeat_timeout
+        # The heartbeat timeout the firmware applied, or None if it has no watchdog.
+        self.watchdog = None
+        self.read_worker = read_worker
         self.running = True
+        self.protocol = None
+        # time.monotonic() when the handshake and baud negotiation finished.
+        self.ready_at = None
+        self.link = LinkControl(serial_port, read_worker.control, lambda: read_worker.decoder.errors)
+        self.__write_errors = ErrorReporter("Error writing to Arduino")
+        self.__degraded = ErrorReporter("Serial link degrading", level=logging.WARNING)
+        self.__health_checked_at = time.monotonic()
 
     def handle_data(self):
-        import queue as _queue
+        self.__negotiate()
+        backoff = 0.0
         while self.running:
             try:
-                data = self.queue.get(timeout=0.02)
-                payload = json.dumps(data) + '\0'
-                self.serial_port.write(payload.encode('utf-8'))
-                self.serial_port.flush()
-            except _queue.Empty:
-                continue
+                if self.read_worker.version:
+                    self.link.check_errors(self.__stop_thrusters)
+                    self.__check_health()
+                data = self.channel.get(timeout=0.02)
+                if data is None:
+                    continue
+                self.__write(data)
+                backoff = 0.0
             except Exception as e:
-                logger.critical(f"Error writing to Arduino: {e}")
+                self.__write_errors.report(e)
+                # Setpoints keep coalescing in the channel meanwhile, so nothing stale piles up.
+                backoff = min(max(backoff * 2, ERROR_BACKOFF_MIN), ERROR_BACKOFF_MAX)
+                time.sleep(backoff)
+
+    def backlog_bytes(self):
+        """
+        Returns the bytes still to go out: what waits in the channel, as it will be encoded, plus what the
+        serial driver has not transmitted yet.
+        """
+        waiting = sum(len(self.__encode(data)) for data in self.channel.pending())
+        try:
+            return waiting + self.serial_port.out_waiting
+        except Exception:
+            return waiting
+
+    def __check_health(self):
+        now = time.monotonic()
+        if self.read_worker.version < 2 or now - self.__health_checked_at < HEALTH_CHECK_INTERVAL:
+            return
+        self.__health_checked_at = now
+        stats = self.read_worker.tracker.stats()
+        if stats["loss_recent"] > LOSS_WARNING_RATIO:
+            self.__degraded.report(f"{stats['loss_recent']:.0%} of recent commands unacknowledged, "
+                                   f"round trip {stats['rtt_ms_p95']:.1f} ms p95 at {self.link.baud} baud")
+
+    def __write(self, data):
+        # Returns the sequence number the data went out with, or None before protocol version 2.
+        seq = None
+        if self.read_worker.version and self.read_worker.version >= 2:
+            seq = self.read_worker.tracker.sent()
+            payload = self.__encode(data, seq)
+        else:
+            payload = self.__encode(data)
+        self.serial_port.write(payload)
+        self.serial_port.flush()
+        return seq
+
+    def __stop_thrusters(self):
+        # Before a baud step, during which no setpoint goes out. The link is noisy, which is why it steps down,
+        # so the failsafe is sent again until acknowledged; without sequence numbers there is no telling, and
+        # it goes out every time. The setpoint sent on the next tick is the full one, and waits in the channel
+        # until the step is over.
+        tracker = self.read_worker.tracker
+        for _ in range(REQUEST_ATTEMPTS):
+            seq = self.__write(FAILSAFE_SETPOINT)
+            if seq is None:
+                continue
+            deadline = time.monotonic() + PING_TIMEOUT
+            while tracker.pending(seq) and time.monotonic() < deadline:
+                time.sleep(0.005)
+            if not tracker.pending(seq):
+                break
+        if self.refresh is not None:
+            self.refresh()
+
+    def __encode(self, data, seq=0):
+        if self.read_worker.version:
+            return encode_control(data, self.read_worker.version, seq)
+        return encode_json(data)
+
+    def __negotiate(self):
+        # Firmware that only speaks JSON ignores HELLO, since it is not valid JSON, and never answers.
+        try:
+            version = self.link.hello(HANDSHAKE_TIMEOUT, lambda: not self.running)
+        except Exception as e:
+            logger.critical(f"Error writing to Arduino: {e}")
+            version = None
+        if version is None:
+            self.read_worker.decoder.binary = False
+            logger.warning("Arduino did not answer the binary protocol handshake, falling back to JSON")
+            self.__ready("json")
+            return
+        logger.info(f"Arduino speaks the binary protocol, version {version}")
+        try:
+            self.link.step_up()
+        except Exception as e:
+            logger.critical(f"Error negotiating the baud rate: {e}")
+        try:
+            self.watchdog = self.link.set_watchdog(self.heartbeat_timeout)
+        except Exception as e:
+            logger.critical(f"Error setting the heartbeat watchdog: {e}")
+        if self.watchdog is None:
+            logger.warning("Arduino firmware has no heartbeat watchdog: thrusters keep their last command if the "
+                           "host goes silent")
+        else:
+            logger.info(f"Arduino stops the thrusters after {self.watchdog:.2f} s without a heartbeat")
+        self.__ready(f"binary v{version}")
+
+    def __ready(self, protocol):
+        self.ready_at = time.monotonic()
+        self.protocol = protocol
 
 
 class ArduinoThread(QThread):
     arduino_data_channel_signal = pyqtSignal(dict)
 
-    def __init__(self):
+    def __init__(self, control_rate_hz=CONTROL_RATE_HZ, board=None, list_ports=None,
+                 heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        """
+        Args:
+            control_rate_hz (float): Rate at which the pilot's setpoint is sent to the ROV.
+            heartbeat_timeout (float): Seconds without a message from the host after which the firmware stops
+                                       the thrusters; 0 disables its watchdog. Keepalives go out every
+                                       KEEPALIVE_INTERVAL, so it must allow a few of them to be lost.
+            board (dict | None): Which board to connect to, by any of "port", "vid", "pid" and
+                                 "serial_number"; None for the first Mega found. See serialsupervisor.
+            list_ports (callable | None): Replaces serial.tools.list_ports.comports(), e.g. to offer pty pairs.
+        """
         super().__init__()
-        self.write_queue = Queue()
+        if 0 < heartbeat_timeout < 2 * KEEPALIVE_INTERVAL:
+            raise ValueError(f"heartbeat_timeout of {heartbeat_timeout} s would trip between keepalives, sent "
+                             f"every {KEEPALIVE_INTERVAL} s")
+        self.heartbeat_timeout = heartbeat_timeout
+        self.write_channel = CommandChannel()
+        self.tracker = CommandTracker()
+        self.control = ControlScheduler(self.handle_data, control_rate_hz, failsafe=FAILSAFE_SETPOINT)
+        # Link events reported by the firmware's watchdog.
+        self.__failsafe_trips = 0
+        self.__failsafe_silent_ms = None
+        self.__failsafe_outage_ms = None
         self.__serial = None
         self._run_flag = True
-        self.__initialize_serial()
-
-        if self.__serial:
-            # Reader
-            self.read_worker = ArduinoReadWorker(self.__serial)
-            self.read_worker.arduino_data_channel_signal.connect(self.forward_arduino_data)
-            self.read_thread = QThread()
-            self.read_worker.moveToThread(self.read_thread)
-            self.read_thread.started.connect(self.read_worker.read_arduino)
-            self.read_thread.start()
-
-            # Writer
-            self.write_worker = ArduinoWriteWorker(self.__serial, self.write_queue)
-            self.write_thread = QThread()
-            self.write_worker.moveToThread(self.write_thread)
-            self.write_thread.started.connect(self.write_worker.handle_data)
-            self.write_thread.start()
+        self.latest_telemetry = {}
+        self.read_worker = None
+        self.write_worker = None
+        self.read_thread = None
+        self.write_thread = None
+        # Opens the board when it appears and reopens it whenever it goes away, from run().
+        supervisor_args = {} if list_ports is None else {"list_ports": list_ports}
+        self.supervisor = SerialSupervisor(self.__connect, self.__disconnect, self.__link_state, board,
+                                           **supervisor_args)
+        # Keeps ticking while the board is away; setpoints coalesce in the channel until it is back.
+        self.control.start()
 
         logger.info("Arduino thread ready!")
 
-    def __initialize_serial(self):
-        port_filter = None
-        available_ports = self.__list_ports()
-        logger.debug(f"Available ports: {available_ports}")
-
-        match platform.system():
-            case "Darwin":
-                port_filter = "/dev/cu.usb"
-            case "Linux":
-                port_filter = "/dev/ttyACM"
-            case "Windows":
-                port_filter = "COM"
-
-        filtered_ports = [p for p in available_ports if port_filter in p]
-        if not filtered_ports:
-            logger.critical("Arduino port not found! Ensure proper connection.")
-        else:
-            port = filtered_ports[0]
-            logger.debug(f"Using port: {port}")
-            self.__serial = serial.Serial(port=port, baudrate=9600, write_timeout=0, dsrdtr=True)
+    def run(self):
+        self.supervisor.run()
 
-    def __list_ports(self):
-        return [port.device for port in ports.comports()]
+    def __connect(self, device):
+        logger.debug(f"Using port: {device}")
+        # Every connection starts at DEFAULT_BAUD; the writer steps it up once the firmware answers.
+        self.__serial = serial.Serial(port=device, baudrate=DEFAULT_BAUD, timeout=READ_TIMEOUT, write_timeout=0,
+                                      dsrdtr=True)
 
-    def stop(self):
+        # Reader
+        read_worker = ArduinoReadWorker(self.__serial, self.tracker)
+        read_worker.arduino_data_batch_signal.connect(self.forward_arduino_data)
+        self.read_thread = QThread()
+        read_worker.moveToThread(self.read_thread)
+        self.read_thread.started.connect(read_worker.read_arduino)
+
+        # Writer
+        write_worker = ArduinoWriteWorker(self.__serial, self.write_channel, read_worker, self.heartbeat_timeout,
+                                          self.control.refresh)
+        self.write_thread = QThread()
+        write_worker.moveToThread(self.write_thread)
+        self.write_thread.started.connect(write_worker.handle_data)
+
+        self.read_worker, self.write_worker = read_worker, write_worker
+        self.read_thread.start()
+        self.write_thread.start()
+        # A board that reset lost its outputs; the full setpoint goes out again rather than just changes.
+        self.control.refresh()
+
+    def __disconnect(self):
         if self.read_worker:
             self.read_worker.running = False
         if self.write_worker:
             self.write_worker.running = False
-        if hasattr(self, "read_thread"):
-            self.read_thread.quit()
-            self.read_thread.wait()
-        if hasattr(self, "write_thread"):
-            self.write_thread.quit()
-            self.write_thread.wait()
+        for thread in (self.read_thread, self.write_thread):
+            if thread is not None:
+                thread.quit()
+                thread.wait()
+        self.read_worker = self.write_worker = None
+        self.read_thread = self.write_thread = None
+        try:
+            self.__serial.close()
+        except Exception as e:
+            logger.debug(f"Error closing Arduino port: {e}")
+        self.__serial = None
+
+    def __link_state(self):
+        if self.read_worker.failures >= READ_FAILURES_LOST:
+            return LINK_LOST
+        if self.write_worker.protocol is None:
+            return LINK_CONNECTING
+        if time.monotonic() - max(self.read_worker.received_at, self.write_worker.ready_at) > LINK_SILENCE_TIMEOUT:
+            return LINK_LOST
+        return LINK_UP
+
+    def stop(self):
+        self.control.stop()
+        self.supervisor.stop()
         self._run_flag = False
         self.wait()
 
+    def protocol(self):
+        """
+        Returns the protocol negotiated with the firmware, e.g. "binary v1" or "json", or None while the
+        handshake is still running or no board is connected.
+        """
+        # The supervisor swaps the workers on its own thread; read each once.
+        write_worker = self.write_worker
+        return write_worker.protocol if write_worker else None
+
+    def baud_rate(self):
+        """
+        Returns the serial link's current baud rate, or None when no board is connected.
+        """
+        write_worker = self.write_worker
+        return write_worker.link.baud if write_worker else None
+
+    def link_stats(self):
+        """
+        Returns the negotiated protocol and baud rate, the control scheduler's statistics, the outbound
+        channel's counters with the current backlog in bytes, and the acknowledgement statistics: commands
+        in flight, round-trip time, loss and reordering. The last are empty before protocol version 2. Also
+        the supervisor's connection state and the time to recover of recent reconnects.
+        """
+        write_worker = self.write_worker
+        channel = self.write_channel.stats()
+        channel["backlog_bytes"] = write_worker.backlog_bytes() if write_worker else 0
+        return {"protocol": self.protocol(), "baud": self.baud_rate(), "control": self.control.stats(),
+                "channel": channel, "commands": self.command_stats(), "connection": self.supervisor.stats(),
+                "failsafe": self.failsafe_stats()}
+
+    def failsafe_stats(self):
+        """
+        Returns the heartbeat timeout the firmware applied (None without a watchdog or board), how often its
+        watchdog tripped, the silence that tripped it last and how long that outage lasted, in ms.
+        """
+        write_worker = self.write_worker
+        return {"watchdog_s": write_worker.watchdog if write_worker else None, "trips": self.__failsafe_trips,
+                "silent_ms": self.__failsafe_silent_ms, "outage_ms": self.__failsafe_outage_ms}
+
+    def command_stats(self):
+        """
+        Returns the live acknowledgement statistics of CommandTracker, or {} until the firmware speaks
+        protocol version 2 (or when no board is connected).
+        """
+        read_worker = self.read_worker
+        if read_worker is None or not read_worker.version or read_worker.version < 2:
+            return {}
+        return self.tracker.stats()
+
+    def set_setpoint(self, data):
+        """
+        Hands the pilot's latest command to the control scheduler, which sends it on its next tick.
+        """
+        self.control.set_setpoint(data)
+
     def handle_data(self, data):
-        self.write_queue.put(data)
+        """
+        Sends setpoint fields. Merged into any setpoint still waiting, so only the newest goes out.
+        """
+        self.write_channel.put_setpoint(data)
+
+    def send_command(self, data):
+        """
+        Sends a one-shot command, in order after any still waiting.
+
+        Returns:
+            bool: Whether the command was queued; False when the link is too far behind.
+        """
+        queued = self.write_channel.put_command(data)
+        if not queued:
+            logger.warning(f"Arduino command dropped, {self.write_channel.stats()['pending']} already waiting")
+        return queued
 
-    @pyqtSlot(dict)
-    def forward_arduino_data(self, data):
-        self.arduino_data_channel_signal.emit(data)
+    @pyqtSlot(list)
+    def forward_arduino_data(self, batch):
+        self.latest_telemetry = batch[-1]
+        for data in batch:
+            if "link" in data:
+                self.__link_event(data)
+            self.arduino_data_channel_signal.emit(data)
+
+    def __link_event(self, data):
+        if data["link"] == "lost":
+            self.__failsafe_trips += 1
+            self.__failsafe_silent_ms = data["silent_ms"]
+            logger.critical(f"Arduino heard nothing for {data['silent_ms']} ms and stopped the thrusters")
+        else:
+            self.__failsafe_outage_ms = data["silent_ms"]
+            logger.warning(f"Arduino hears the host again after {data['silent_ms']} ms")
+            # Its thrusters stay neutral until commanded, so the full setpoint goes out now.
+            self.control.refresh()
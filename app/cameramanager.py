@@ -0,0 +1,172 @@
+import cv2
+import glob
+import os
+import platform
+from PyQt5.QtCore import QObject, pyqtSignal
+from videothread import VideoThread
+from capturesource import V4L2Source, create_capture_source
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Thumbnail feeds are scaled to this size and only every n-th frame is decoded.
+THUMBNAIL_SIZE = (240, 135)
+THUMBNAIL_DECIMATION = 6
+# Number of camera indexes probed on platforms without /sys/class/video4linux.
+MAX_PROBED_CAMERAS = 4
+
+
+class CameraManager(QObject):
+    """
+    CameraManager runs one VideoThread per attached camera and decides which one is the main feed.
+
+    The main feed is converted at full rate and display size. The other feeds are either decimated to
+    low-rate thumbnails or paused, in which case frames are grabbed without being decoded. Every device
+    stays open for the lifetime of the manager, so switching the main feed only changes those settings.
+
+    Attributes:
+        active_camera_changed (pyqtSignal): Emitted with the index of the new main camera.
+        threads (list[VideoThread]): One capture thread per camera, in discovery order.
+
+    Methods:
+        discover_cameras():
+            Lists attached capture devices without opening them where the platform allows it.
+
+        start():
+            Starts every capture thread.
+
+        stop():
+            Stops every capture thread.
+
+        switch_to(index):
+            Makes camera `index` the main feed.
+
+        set_thumbnails_visible(visible):
+            Decimates hidden feeds when thumbnails are shown, pauses them otherwise.
+
+        set_display_size(width, height):
+            Changes the size the main feed is scaled to, e.g. when the video surface is resized.
+    """
+    active_camera_changed = pyqtSignal(int)
+
+    def __init__(self, width, height, configs=None):
+        """
+        Args:
+            width (int): Main display width, as passed to VideoThread.
+            height (int): Main display height, as passed to VideoThread.
+            configs (list[dict] | None): Per-camera capture source configurations for create_capture_source().
+                                          None discovers the attached cameras and opens each through V4L2.
+        """
+        super().__init__()
+        self.__width = width
+        self.__height = height
+        self.__active = 0
+        self.__thumbnails_visible = True
+
+        if configs is None:
+            sources = [V4L2Source(device) for device in self.discover_cameras()]
+            if not sources:
+                logger.warning("No cameras found, falling back to camera 0.")
+                sources = [V4L2Source(0)]
+        else:
+            sources = [create_capture_source(config) for config in configs]
+
+        self.threads = [VideoThread(width, height, source=source) for source in sources]
+        for index in range(len(self.threads)):
+            self.__apply_role(index)
+        logger.info(f"Camera manager ready with {len(self.threads)} camera(s)")
+
+    @staticmethod
+    def discover_cameras():
+        """
+        Lists attached capture devices.
+
+        On Linux this reads /sys/class/video4linux, which is instant and skips the metadata nodes that
+        UVC cameras also expose. Elsewhere camera indexes are probed with OpenCV.
+
+        Returns:
+            list: Device paths on Linux, camera indexes elsewhere.
+        """
+        if platform.system() == "Linux" and os.path.isdir("/sys/class/video4linux"):
+            devices = []
+            for node in glob.glob("/sys/class/video4linux/video*"):
+                try:
+                    with open(os.path.join(node, "index")) as f:
+                        if f.read().strip() != "0":
+                            continue
+                except OSError:
+                    pass
+                devices.append("/dev/" + os.path.basename(node))
+            return sorted(devices, key=lambda d: int(d.removeprefix("/dev/video")))
+
+        devices = []
+        for index in range(MAX_PROBED_CAMERAS):
+            cap = cv2.VideoCapture(index)
+            if cap.isOpened():
+                devices.append(index)
+            cap.release()
+        return devices
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        for thread in self.threads:
+            thread.stop()
+
+    def active_index(self):
+        return self.__active
+
+    def active_thread(self):
+        return self.threads[self.__active]
+
+    def switch_to(self, index):
+        """
+        Makes camera `index` the main feed. The device is not reopened.
+
+        Args:
+            index (int): Index into `threads`.
+        """
+        if index == self.__active or not 0 <= index < len(self.threads):
+            return
+        previous = self.__active
+        self.__active = index
+        self.__apply_role(previous)
+        self.__apply_role(index)
+        logger.info(f"Switched main camera to {index}")
+        self.active_camera_changed.emit(index)
+
+    def set_thumbnails_visible(self, visible):
+        """
+        Args:
+            visible (bool): Whether the thumbnail strip is shown. Hidden feeds are paused when it is not.
+        """
+        self.__thumbnails_visible = visible
+        for index in range(len(self.threads)):
+            self.__apply_role(index)
+
+    def set_display_size(self, width, height):
+        """
+        Args:
+            width (int): Main display width in pixels.
+            height (int): Main display height in pixels.
+        """
+        if (width, height) == (self.__width, self.__height):
+            return
+        self.__width = width
+        self.__height = height
+        self.__apply_role(self.__active)
+
+    def __apply_role(self, index):
+        thread = self.threads[index]
+        if index == self.__active:
+            thread.set_display_size(self.__width, self.__height)
+            thread.set_decimation(1)
+            thread.set_paused(False)
+        else:
+            thread.set_display_size(*THUMBNAIL_SIZE)
+            thread.set_decimation(THUMBNAIL_DECIMATION)
+            thread.set_paused(not self.__thumbnails_visible)
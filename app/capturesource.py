@@ -0,0 +1,306 @@
+import cv2
+import numpy as np
+import platform
+from abc import ABC, abstractmethod
+import time
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class CaptureSource(ABC):
+    """
+    CaptureSource is the interface VideoThread reads frames from.
+
+    Subclasses open a specific kind of input, negotiate a format with it and report what they actually
+    got, which may differ from what was requested.
+
+    Attributes:
+        negotiated (dict): The width, height, fps and fourcc reported by the source after open().
+
+    Methods:
+        open():
+            Opens the source and fills in `negotiated`. Returns True on success.
+
+        read(buffer):
+            Reads the next BGR frame, into `buffer` when possible. Returns (ret, frame).
+
+        skip():
+            Advances past the next frame as cheaply as possible, without decoding it. Returns True on success.
+
+        release():
+            Closes the source.
+
+        describe():
+            Returns a short human-readable description for logging.
+    """
+
+    def __init__(self):
+        self.negotiated = {"width": 0, "height": 0, "fps": 0.0, "fourcc": ""}
+
+    @abstractmethod
+    def open(self):
+        pass
+
+    @abstractmethod
+    def read(self, buffer=None):
+        pass
+
+    def skip(self):
+        return self.read()[0]
+
+    def release(self):
+        pass
+
+    def describe(self):
+        return type(self).__name__
+
+    def frame_shape(self):
+        """
+        Returns the negotiated frame shape as (height, width, channels).
+        """
+        return (self.negotiated["height"], self.negotiated["width"], 3)
+
+
+class OpenCVSource(CaptureSource):
+    """
+    Base class for sources backed by a cv2.VideoCapture.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._cap = None
+
+    def read(self, buffer=None):
+        return self._cap.read(buffer)
+
+    def skip(self):
+        # grab() dequeues the frame without decoding it, which is most of the cost for MJPG streams.
+        return self._cap.grab()
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _read_back(self):
+        fourcc = int(self._cap.get(cv2.CAP_PROP_FOURCC))
+        self.negotiated = {
+            "width": int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self._cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip("\0")
+        }
+        logger.info(f"{self.describe()} negotiated {self.negotiated}")
+
+
+class V4L2Source(OpenCVSource):
+    """
+    A local camera opened through V4L2 with an explicit pixel format, resolution and frame rate.
+
+    Many USB cameras default to uncompressed YUYV, which caps them at a low frame rate at 720p; asking
+    for MJPG lets them run at full rate. On platforms without V4L2 the default OpenCV backend is used
+    and the requested format is passed through as a hint.
+    """
+
+    def __init__(self, device=0, width=1280, height=720, fps=30, fourcc="MJPG"):
+        """
+        Args:
+            device (int | str): Camera index or device path such as "/dev/video2".
+            width (int): Requested frame width.
+            height (int): Requested frame height.
+            fps (float): Requested frame rate.
+            fourcc (str | None): Requested pixel format, e.g. "MJPG" or "YUYV". None keeps the default.
+        """
+        super().__init__()
+        self.device = device
+        self.__width = width
+        self.__height = height
+        self.__fps = fps
+        self.__fourcc = fourcc
+
+    def open(self):
+        backend = cv2.CAP_V4L2 if platform.system() == "Linux" else cv2.CAP_ANY
+        self._cap = cv2.VideoCapture(self.device, backend)
+        if not self._cap.isOpened():
+            logger.error(f"Could not open {self.describe()}")
+            return False
+
+        # The pixel format has to be set before the resolution, otherwise the driver may reject the size.
+        if self.__fourcc:
+            self._cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.__fourcc))
+        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.__width)
+        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.__height)
+        self._cap.set(cv2.CAP_PROP_FPS, self.__fps)
+        self._read_back()
+        return True
+
+    def describe(self):
+        return f"V4L2 camera {self.device}"
+
+
+class GStreamerSource(OpenCVSource):
+    """
+    A GStreamer pipeline that ends in an appsink producing BGR frames.
+
+    Example:
+        "v4l2src device=/dev/video0 ! image/jpeg,width=1280,height=720 ! jpegdec ! videoconvert ! appsink"
+    """
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def open(self):
+        self._cap = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
+        if not self._cap.isOpened():
+            logger.error(f"Could not open GStreamer pipeline. Is OpenCV built with GStreamer? {self.pipeline}")
+            return False
+        self._read_back()
+        return True
+
+    def describe(self):
+        return "GStreamer pipeline"
+
+
+class FileSource(OpenCVSource):
+    """
+    A video file, optionally looped and paced at its own frame rate so it behaves like a live camera.
+    """
+
+    def __init__(self, path, loop=True, realtime=True):
+        """
+        Args:
+            path (str): Path to the video file.
+            loop (bool): Restart from the beginning at the end of the file.
+            realtime (bool): Sleep between frames to match the file's frame rate. Disable for benchmarks.
+        """
+        super().__init__()
+        self.path = path
+        self.__loop = loop
+        self.__realtime = realtime
+        self.__next_frame_time = 0.0
+
+    def open(self):
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            logger.error(f"Could not open video file {self.path}")
+            return False
+        self._read_back()
+        self.__next_frame_time = time.monotonic()
+        return True
+
+    def read(self, buffer=None):
+        ret, frame = self._cap.read(buffer)
+        if not ret and self.__loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read(buffer)
+        if ret and self.__realtime and self.negotiated["fps"] > 0:
+            self.__next_frame_time = _pace(self.__next_frame_time, self.negotiated["fps"])
+        return ret, frame
+
+    def skip(self):
+        ret = self._cap.grab()
+        if not ret and self.__loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret = self._cap.grab()
+        if ret and self.__realtime and self.negotiated["fps"] > 0:
+            self.__next_frame_time = _pace(self.__next_frame_time, self.negotiated["fps"])
+        return ret
+
+    def describe(self):
+        return f"video file {self.path}"
+
+
+class TestPatternSource(CaptureSource):
+    """
+    A synthetic scrolling color-bar pattern. Needs no hardware and allocates nothing per frame, so it
+    isolates the cost of the rest of the video path.
+    """
+
+    def __init__(self, width=1280, height=720, fps=30):
+        """
+        Args:
+            width (int): Frame width.
+            height (int): Frame height.
+            fps (float): Frame rate to pace at. 0 produces frames as fast as they are read.
+        """
+        super().__init__()
+        self.__width = width
+        self.__height = height
+        self.__fps = fps
+        self.__pattern = None
+        self.__offset = 0
+        self.__next_frame_time = 0.0
+
+    def open(self):
+        # Two copies of the bars side by side, so any window of `width` columns is a contiguous slice.
+        bars = np.array([[255, 255, 255], [0, 255, 255], [255, 255, 0], [0, 255, 0],
+                         [255, 0, 255], [0, 0, 255], [255, 0, 0], [0, 0, 0]], dtype=np.uint8)
+        columns = bars[np.arange(self.__width) * len(bars) // self.__width]
+        row = np.concatenate([columns, columns])
+        self.__pattern = np.broadcast_to(row, (self.__height, 2 * self.__width, 3))
+        self.negotiated = {"width": self.__width, "height": self.__height, "fps": float(self.__fps), "fourcc": "BGR3"}
+        self.__next_frame_time = time.monotonic()
+        return True
+
+    def read(self, buffer=None):
+        if buffer is None or buffer.shape != (self.__height, self.__width, 3):
+            buffer = np.empty((self.__height, self.__width, 3), dtype=np.uint8)
+        np.copyto(buffer, self.__pattern[:, self.__offset:self.__offset + self.__width])
+        self.__offset = (self.__offset + 4) % self.__width
+        if self.__fps > 0:
+            self.__next_frame_time = _pace(self.__next_frame_time, self.__fps)
+        return True, buffer
+
+    def skip(self):
+        self.__offset = (self.__offset + 4) % self.__width
+        if self.__fps > 0:
+            self.__next_frame_time = _pace(self.__next_frame_time, self.__fps)
+        return True
+
+    def describe(self):
+        return f"test pattern {self.__width}x{self.__height}@{self.__fps}"
+
+
+def _pace(next_frame_time, fps):
+    """
+    Sleeps until `next_frame_time` and returns the deadline for the following frame.
+    Falls back to the current time if the reader is already more than a frame behind.
+    """
+    now = time.monotonic()
+    if next_frame_time > now:
+        time.sleep(next_frame_time - now)
+    else:
+        next_frame_time = max(next_frame_time, now - 1.0 / fps)
+    return next_frame_time + 1.0 / fps
+
+
+def create_capture_source(config):
+    """
+    Builds a capture source from a per-camera configuration dictionary.
+
+    Args:
+        config (dict): Must contain "type", one of "v4l2", "gstreamer", "file" or "test". The
+                       remaining keys are passed to the matching source's constructor.
+
+    Returns:
+        CaptureSource: The configured, unopened source.
+
+    Raises:
+        ValueError: If the type is unknown.
+    """
+    options = dict(config)
+    source_type = options.pop("type", "v4l2")
+    match source_type:
+        case "v4l2":
+            return V4L2Source(**options)
+        case "gstreamer":
+            return GStreamerSource(**options)
+        case "file":
+            return FileSource(**options)
+        case "test":
+            return TestPatternSource(**options)
+    raise ValueError(f"Unknown capture source type: {source_type}")
@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Frames are compared as grayscale thumbnails of this size.
+SIGNATURE_SIZE = (64, 36)
+
+
+class ChangeGate:
+    """
+    ChangeGate sits in front of a frame listener and only passes on frames where something changed.
+
+    Each frame is reduced to a small blurred grayscale thumbnail and compared with the thumbnail of the
+    last frame that was passed on. A frame passes when enough thumbnail pixels changed by more than a few
+    gray levels, so a small object moving through one corner counts while sensor noise does not. Once a
+    change is seen, every frame passes for `hold` seconds, so motion is recorded at the full frame rate
+    rather than in jumps. A keyframe passes every `keyframe_interval` seconds regardless, so static
+    stretches are still documented. Comparing against the last passed frame, not the previous one, means
+    slow drift accumulates until it crosses the threshold.
+
+    While disabled the gate passes every frame straight through.
+
+    Attributes:
+        enabled (bool): Whether frames are gated.
+
+    Methods:
+        submit(frame, captured_at):
+            Frame listener. Forwards the frame to the wrapped listener if it passes.
+
+        stats():
+            Returns counts of passed, gated and keyframe frames.
+    """
+
+    def __init__(self, listener, pixel_threshold=12, min_changed=0.005, hold=1.0, keyframe_interval=5.0):
+        """
+        Args:
+            listener (callable): Frame listener that receives the frames that pass.
+            pixel_threshold (int): Gray levels a thumbnail pixel must change by to count as changed.
+            min_changed (float): Fraction of thumbnail pixels that must change for a frame to pass.
+            hold (float): Seconds every frame passes after a change.
+            keyframe_interval (float): Seconds after which a frame passes even without a change.
+        """
+        self.__listener = listener
+        self.__pixel_threshold = pixel_threshold
+        self.__min_changed = int(min_changed * SIGNATURE_SIZE[0] * SIGNATURE_SIZE[1])
+        self.__hold = hold
+        self.__keyframe_interval = keyframe_interval
+        # Two thumbnail buffers that swap roles whenever a frame passes, plus scratch for the resize and the
+        # compare, so gating allocates nothing.
+        self.__signature = np.empty((SIGNATURE_SIZE[1], SIGNATURE_SIZE[0]), np.uint8)
+        self.__reference = np.empty_like(self.__signature)
+        self.__difference = np.empty_like(self.__signature)
+        self.__small = np.empty((SIGNATURE_SIZE[1], SIGNATURE_SIZE[0], 3), np.uint8)
+        self.__has_reference = False
+        self.__kept_at = 0.0
+        self.__hold_until = 0.0
+        self.enabled = False
+
+        self.__passed = 0
+        self.__gated = 0
+        self.__keyframes = 0
+
+    def submit(self, frame, captured_at):
+        """
+        Frame listener. Costs one thumbnail resize and compare per frame while enabled.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        if not self.enabled:
+            self.__has_reference = False
+            self.__listener(frame, captured_at)
+            return
+
+        cv2.resize(frame, SIGNATURE_SIZE, dst=self.__small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.__small, cv2.COLOR_BGR2GRAY, dst=self.__signature)
+        cv2.GaussianBlur(self.__signature, (3, 3), 0, dst=self.__signature)
+
+        if not self.__has_reference:
+            changed = True
+        else:
+            cv2.absdiff(self.__signature, self.__reference, dst=self.__difference)
+            cv2.threshold(self.__difference, self.__pixel_threshold, 255, cv2.THRESH_BINARY, dst=self.__difference)
+            changed = cv2.countNonZero(self.__difference) > self.__min_changed
+        if changed:
+            self.__hold_until = captured_at + self.__hold
+        elif captured_at >= self.__hold_until:
+            if captured_at - self.__kept_at < self.__keyframe_interval:
+                self.__gated += 1
+                return
+            self.__keyframes += 1
+
+        self.__passed += 1
+        self.__kept_at = captured_at
+        self.__signature, self.__reference = self.__reference, self.__signature
+        self.__has_reference = True
+        self.__listener(frame, captured_at)
+
+    def stats(self):
+        total = self.__passed + self.__gated
+        return {
+            "enabled": self.enabled,
+            "passed": self.__passed,
+            "gated": self.__gated,
+            "keyframes": self.__keyframes,
+            "gated_ratio": self.__gated / total if total else 0.0
+        }
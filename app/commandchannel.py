@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+
+# Most one-shot commands held while the link is slower than their producer; further ones are refused.
+MAX_PENDING_COMMANDS = 32
+
+
+class CommandChannel:
+    """
+    CommandChannel is the outbound channel between command producers and the serial writer.
+
+    It holds two kinds of traffic. Setpoints, the continuous thruster and claw targets, coalesce: a new
+    setpoint is merged into the one still waiting, newer fields overwriting older ones, so however slow the
+    link is only one setpoint, the newest, is ever pending and the ROV never executes a stale one. An empty
+    setpoint (a keepalive) coalesces into whatever is pending. One-shot commands, which each have to happen,
+    keep their order in a bounded queue and are handed out before the setpoint. When that queue is full new
+    commands are refused and counted rather than growing the backlog.
+
+    Methods:
+        put_setpoint(data):
+            Merges a setpoint, or the fields of one that changed, into the pending setpoint.
+
+        put_command(data):
+            Queues a one-shot command behind the ones still waiting.
+
+        get(timeout):
+            Takes the next item for the writer, waiting up to `timeout` seconds for one.
+
+        pending():
+            Returns what is waiting, in the order it will be sent.
+
+        stats():
+            Returns the channel counters.
+    """
+
+    def __init__(self, max_commands=MAX_PENDING_COMMANDS):
+        """
+        Args:
+            max_commands (int): Most one-shot commands held at once.
+        """
+        self.__condition = threading.Condition()
+        self.__setpoint = None
+        self.__commands = deque()
+        self.__max_commands = max_commands
+        self.__setpoints = 0
+        self.__coalesced = 0
+        self.__commands_queued = 0
+        self.__dropped = 0
+        self.__delivered = 0
+
+    def put_setpoint(self, data):
+        """
+        Never blocks on the writer.
+
+        Args:
+            data (dict): Setpoint fields. {} is a keepalive.
+        """
+        with self.__condition:
+            self.__setpoints += 1
+            if self.__setpoint is None:
+                self.__setpoint = dict(data)
+            else:
+                self.__coalesced += 1
+                self.__setpoint.update(data)
+            self.__condition.notify()
+
+    def put_command(self, data):
+        """
+        Args:
+            data (dict): A one-shot command.
+
+        Returns:
+            bool: Whether the command was queued. False when MAX_PENDING_COMMANDS are already waiting.
+        """
+        with self.__condition:
+            if len(self.__commands) >= self.__max_commands:
+                self.__dropped += 1
+                return False
+            self.__commands.append(data)
+            self.__commands_queued += 1
+            self.__condition.notify()
+            return True
+
+    def get(self, timeout):
+        """
+        Returns:
+            dict | None: The oldest one-shot command, else the pending setpoint, or None on timeout.
+        """
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: self.__commands or self.__setpoint is not None, timeout):
+                return None
+            self.__delivered += 1
+            if self.__commands:
+                return self.__commands.popleft()
+            setpoint, self.__setpoint = self.__setpoint, None
+            return setpoint
+
+    def pending(self):
+        with self.__condition:
+            return list(self.__commands) + ([] if self.__setpoint is None else [self.__setpoint])
+
+    def stats(self):
+        """
+        Returns:
+            dict: Setpoints received and coalesced, one-shot commands queued and dropped, items delivered
+                  and items waiting.
+        """
+        with self.__condition:
+            return {
+                "setpoints": self.__setpoints,
+                "coalesced": self.__coalesced,
+                "commands": self.__commands_queued,
+                "dropped": self.__dropped,
+                "delivered": self.__delivered,
+                "pending": len(self.__commands) + (self.__setpoint is not None)
+            }
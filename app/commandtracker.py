@@ -0,0 +1,142 @@
+import threading
+import time
+import numpy as np
+
+# A command not acknowledged within this many seconds is counted as lost.
+ACK_TIMEOUT = 1.0
+# Recent loss is measured over this many of the latest commands.
+LOSS_WINDOW = 200
+
+
+class CommandTracker:
+    """
+    CommandTracker numbers outbound commands and matches the sequence numbers echoed in acks against them.
+
+    The writer calls sent() for each command and puts the returned sequence number on the wire. The reader
+    calls acked() with every echoed one. Commands still unacknowledged after ACK_TIMEOUT count as lost, and
+    an ack that arrives for an older command after a newer one was already acknowledged counts as reordered.
+    Round-trip times go into a preallocated ring, like LatencyTracer, and percentiles are only computed when
+    stats() is called. The sequence number is 16 bits and wraps; comparisons use serial-number arithmetic.
+
+    Methods:
+        sent(now=None):
+            Registers an outbound command and returns its sequence number.
+
+        acked(seq, now=None):
+            Matches an echoed sequence number.
+
+        pending(seq):
+            Returns whether a command still waits for its ack.
+
+        stats():
+            Returns in-flight, loss, reordering and round-trip statistics.
+    """
+
+    def __init__(self, window=1024):
+        """
+        Args:
+            window (int): Number of recent round-trip times kept.
+        """
+        self.__lock = threading.Lock()
+        self.__next_seq = 0
+        self.__in_flight = {}
+        self.__highest_acked = None
+        self.__window = window
+        self.__rtt = np.zeros(window)
+        # 1 for every recent command that was lost, 0 for one that was acknowledged.
+        self.__outcomes = np.zeros(LOSS_WINDOW, np.uint8)
+        self.__outcome_count = 0
+        self.__sent = 0
+        self.__acked = 0
+        self.__lost = 0
+        self.__late = 0
+        self.__reordered = 0
+
+    def sent(self, now=None):
+        """
+        Args:
+            now (float | None): time.monotonic() send time. Defaults to now.
+
+        Returns:
+            int: The sequence number to send the command with.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.__lock:
+            self.__expire(now)
+            seq = self.__next_seq
+            self.__next_seq = (seq + 1) & 0xFFFF
+            self.__in_flight[seq] = now
+            self.__sent += 1
+            return seq
+
+    def acked(self, seq, now=None):
+        """
+        Args:
+            seq (int): Sequence number echoed by the firmware.
+            now (float | None): time.monotonic() receive time. Defaults to now.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.__lock:
+            # An ack past ACK_TIMEOUT is for a command already counted lost, e.g. one flushed out of the
+            # buffers after a reconnect, and must not show up as a round trip.
+            self.__expire(now)
+            sent_at = self.__in_flight.pop(seq, None)
+            if sent_at is None:
+                # Already written off as lost, or a duplicate.
+                self.__late += 1
+                return
+            self.__rtt[self.__acked % self.__window] = now - sent_at
+            self.__acked += 1
+            self.__record(0)
+            if self.__highest_acked is not None and (seq - self.__highest_acked) & 0xFFFF >= 0x8000:
+                self.__reordered += 1
+            else:
+                self.__highest_acked = seq
+
+    def pending(self, seq):
+        """
+        Returns:
+            bool: Whether the command sent with `seq` is neither acknowledged nor written off as lost yet.
+        """
+        with self.__lock:
+            return seq in self.__in_flight
+
+    def stats(self):
+        """
+        Returns:
+            dict: Commands sent, acknowledged, lost, late and reordered, the number in flight, the loss ratio
+                  over the last LOSS_WINDOW commands, and round-trip p50/p95/max in milliseconds.
+        """
+        with self.__lock:
+            self.__expire(time.monotonic())
+            count = min(self.__acked, self.__window)
+            rtt = self.__rtt[:count] * 1000
+            outcomes = self.__outcomes[:min(self.__outcome_count, LOSS_WINDOW)]
+            return {
+                "sent": self.__sent,
+                "acked": self.__acked,
+                "lost": self.__lost,
+                "late": self.__late,
+                "reordered": self.__reordered,
+                "in_flight": len(self.__in_flight),
+                "loss_recent": float(outcomes.mean()) if len(outcomes) else 0.0,
+                "rtt_ms_p50": float(np.percentile(rtt, 50)) if count else 0.0,
+                "rtt_ms_p95": float(np.percentile(rtt, 95)) if count else 0.0,
+                "rtt_ms_max": float(rtt.max()) if count else 0.0
+            }
+
+    def __expire(self, now):
+        # Sends are in order, so the oldest in-flight commands come first in the dict.
+        while self.__in_flight:
+            seq, sent_at = next(iter(self.__in_flight.items()))
+            if now - sent_at < ACK_TIMEOUT:
+                break
+            del self.__in_flight[seq]
+            self.__lost += 1
+            self.__record(1)
+
+    def __record(self, lost):
+        self.__outcomes[self.__outcome_count % LOSS_WINDOW] = lost
+        self.__outcome_count += 1
@@ -0,0 +1,183 @@
+import threading
+import time
+import numpy as np
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Default tick rate of the control loop.
+CONTROL_RATE_HZ = 50
+# With nothing changed, a keepalive goes out this often so the firmware knows the host is alive.
+KEEPALIVE_INTERVAL = 0.1
+# A full command goes out this often regardless, so an update lost on the wire cannot leave an output stale.
+REFRESH_INTERVAL = 1.0
+# A setpoint not renewed for this long means its producer, the joystick poll on the GUI thread, has stalled.
+SETPOINT_TIMEOUT = 0.5
+
+
+class ControlScheduler:
+    """
+    ControlScheduler sends the pilot's setpoint to the ROV on a fixed-rate tick.
+
+    The joystick hands over its latest setpoint whenever it is sampled with set_setpoint(); only the newest
+    is kept. A dedicated thread wakes on absolute deadlines on the monotonic clock, so ticks do not drift
+    with the time each one takes. On every tick it compares the setpoint with what was last sent and hands
+    `send` only the fields that changed. When nothing changed it sends an empty dict, a keepalive, every
+    `keepalive_interval`, and every `refresh_interval` it sends the full setpoint so a lost update heals
+    itself. Pilot input therefore reaches the link within one tick. Keepalives go out even before the first
+    setpoint, so the link is never silent while the host is up.
+
+    The firmware stops the thrusters by itself when the keepalives stop, but they keep coming from this thread
+    even if the GUI thread that produces the setpoints hangs. So a setpoint not renewed within
+    `setpoint_timeout` is overlaid with `failsafe`, the neutral thrusters, until a fresh one arrives.
+
+    Every tick records how late it woke. A tick that wakes a whole period late counts as a missed deadline,
+    and the schedule skips ahead instead of bursting to catch up.
+
+    Methods:
+        start() / stop():
+            Runs or stops the control loop.
+
+        set_setpoint(data):
+            Replaces the setpoint sent on the next tick.
+
+        refresh():
+            Sends the full setpoint on the next tick, e.g. to a board that just reconnected.
+
+        stats():
+            Returns tick counts, jitter and missed deadlines.
+    """
+
+    def __init__(self, send, rate_hz=CONTROL_RATE_HZ, keepalive_interval=KEEPALIVE_INTERVAL,
+                 refresh_interval=REFRESH_INTERVAL, window=1024, setpoint_timeout=SETPOINT_TIMEOUT, failsafe=None):
+        """
+        Args:
+            send (callable): Receives a dict of the fields to send: all of them, the changed ones, or none
+                             for a keepalive. Called on the scheduler thread and must not block.
+            rate_hz (float): Ticks per second.
+            keepalive_interval (float): Seconds between keepalives while nothing changes.
+            refresh_interval (float): Seconds between full setpoints.
+            window (int): Number of recent ticks kept for jitter statistics.
+            setpoint_timeout (float): Seconds after which an unrenewed setpoint is stale.
+            failsafe (dict | None): Fields sent in place of a stale setpoint's; None sends it unchanged.
+        """
+        self.__send = send
+        self.__period = 1.0 / rate_hz
+        self.__keepalive_interval = keepalive_interval
+        self.__refresh_interval = refresh_interval
+        self.__setpoint_timeout = setpoint_timeout
+        self.__failsafe = failsafe
+        self.__setpoint_at = None
+        self.__stale = False
+        self.__stale_events = 0
+        self.__lock = threading.Lock()
+        self.__setpoint = None
+        self.__sent = {}
+        self.__refresh_due = False
+        self.__run_flag = False
+        self.__thread = None
+
+        self.__window = window
+        self.__jitter = np.zeros(window)
+        self.__ticks = 0
+        self.__missed = 0
+        self.__updates = 0
+        self.__keepalives = 0
+        self.__refreshes = 0
+
+    def start(self):
+        if self.__run_flag:
+            return
+        self.__run_flag = True
+        self.__thread = threading.Thread(target=self.__run, name="control", daemon=True)
+        self.__thread.start()
+        logger.info(f"Control scheduler running at {1.0 / self.__period:.0f} Hz")
+
+    def stop(self):
+        self.__run_flag = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def set_setpoint(self, data):
+        """
+        Args:
+            data (dict): The full command, as built by JoystickThread.
+        """
+        with self.__lock:
+            self.__setpoint = data
+            self.__setpoint_at = time.monotonic()
+
+    def refresh(self):
+        self.__refresh_due = True
+
+    def stats(self):
+        count = min(self.__ticks, self.__window)
+        jitter = self.__jitter[:count] * 1000
+        return {
+            "rate_hz": 1.0 / self.__period,
+            "ticks": self.__ticks,
+            "missed": self.__missed,
+            "updates": self.__updates,
+            "keepalives": self.__keepalives,
+            "refreshes": self.__refreshes,
+            "stale": self.__stale,
+            "stale_events": self.__stale_events,
+            "jitter_ms_avg": float(jitter.mean()) if count else 0.0,
+            "jitter_ms_p99": float(np.percentile(jitter, 99)) if count else 0.0,
+            "jitter_ms_max": float(jitter.max()) if count else 0.0
+        }
+
+    def __run(self):
+        deadline = time.monotonic()
+        last_sent_at = last_refresh_at = -np.inf
+        while self.__run_flag:
+            deadline += self.__period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.monotonic()
+            late = now - deadline
+            self.__jitter[self.__ticks % self.__window] = late
+            self.__ticks += 1
+            if late >= self.__period:
+                # Skip the ticks that were slept through rather than sending them back to back.
+                skipped = int(late // self.__period)
+                self.__missed += skipped
+                deadline += skipped * self.__period
+
+            with self.__lock:
+                setpoint, setpoint_at = self.__setpoint, self.__setpoint_at
+            setpoint = self.__check_stale(setpoint, setpoint_at, now)
+            if setpoint is not None and (self.__refresh_due or now - last_refresh_at >= self.__refresh_interval):
+                changes = setpoint
+                last_refresh_at = now
+                self.__refresh_due = False
+                self.__refreshes += 1
+            else:
+                # Without a setpoint yet, e.g. no joystick, only keepalives go out.
+                changes = {key: value for key, value in (setpoint or {}).items() if self.__sent.get(key) != value}
+                if changes:
+                    self.__updates += 1
+                elif now - last_sent_at >= self.__keepalive_interval:
+                    self.__keepalives += 1
+                else:
+                    continue
+            try:
+                self.__send(changes)
+            except Exception as e:
+                logger.error(f"Control scheduler failed to send: {e}")
+            self.__sent.update(changes)
+            last_sent_at = now
+
+    def __check_stale(self, setpoint, setpoint_at, now):
+        stale = setpoint is not None and self.__failsafe is not None and now - setpoint_at > self.__setpoint_timeout
+        if stale and not self.__stale:
+            self.__stale_events += 1
+            logger.warning(f"No pilot input for {now - setpoint_at:.2f} s, sending the failsafe setpoint")
+        elif self.__stale and not stale:
+            logger.info("Pilot input is back")
+        self.__stale = stale
+        return {**setpoint, **self.__failsafe} if stale else setpoint
@@ -0,0 +1,308 @@
+import os
+import tty
+import array
+import fcntl
+import json
+import random
+import select
+import struct
+import threading
+import time
+from serial.tools.list_ports_common import ListPortInfo
+from serialprotocol import (PROTOCOL_VERSION, FRAME_DELIMITER, MAX_FRAME_BYTES, MSG_HELLO, MSG_SET_BAUD,
+                            MSG_BAUD_COMMIT, MSG_PING, MSG_KEEPALIVE, MSG_SET_WATCHDOG, MSG_COMMAND, MSG_UPDATE,
+                            MSG_HELLO_ACK, MSG_BAUD_ACK, MSG_PONG, MSG_WATCHDOG_ACK, MSG_ACK, MSG_LINK_EVENT,
+                            COMMAND_FORMAT, UPDATE_FIELDS, HELLO_ACK_FORMAT, ACK_FORMAT, ACK_STATUS_OK, BAUD_FORMAT,
+                            BAUD_ACK_FORMAT, BAUD_SWITCHING, BAUD_COMMITTED, BAUD_REJECTED, PING_FORMAT,
+                            SEQUENCE_FORMAT, SEQUENCED_ACK_FORMAT, WATCHDOG_FORMAT, LINK_EVENT_FORMAT, LINK_EVENTS,
+                            LINK_LOST, LINK_RESTORED,
+                            DEFAULT_BAUD, BAUD_RATES, ProtocolError, encode_frame, split_frame)
+from seriallink import BAUD_CONFIRM_TIMEOUT, BAUD_IDLE_TIMEOUT, HEARTBEAT_TIMEOUT
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Linux ioctl that reads termios2, which holds the line rate as a plain number even for non-standard rates.
+TCGETS2 = 0x802C542A
+# Bits on the wire per byte: start bit, eight data bits, stop bit.
+BITS_PER_BYTE = 10
+# How often the simulated loop checks its timeouts while no input arrives.
+LOOP_INTERVAL = 0.005
+# USB IDs the simulated board reports: a genuine Mega 2560.
+SIMULATED_VID = 0x2341
+SIMULATED_PID = 0x0042
+
+
+class FirmwareSimulator:
+    """
+    FirmwareSimulator stands in for the Mega on a pseudo-terminal, so the serial link can be exercised and
+    benchmarked without a board.
+
+    It answers the same binary and JSON protocols as arduino.ino, including baud-rate switching with its
+    confirm timeout, and paces every read and write to the simulated line rate, so throughput and round-trip
+    numbers mean what they would on a UART. The host's rate is read back from the pty: while it differs from
+    the simulated firmware's rate every byte arrives as garbage, as it would on real hardware. Above
+    `max_stable_baud` bytes are corrupted at `error_rate`, like a tether too long for that rate.
+
+    Like the firmware it runs the heartbeat watchdog: once the host has been heard from, a silence of the
+    heartbeat timeout stops the thrusters and is reported with a LINK_EVENT, and so is the host's return. The
+    watchdog is paused while a baud switch waits for its commit.
+    Each trip is recorded with the silence that caused it, so detection time can be measured.
+
+    stop() closes the pty, which to a host that has it open looks like the board being unplugged; a new
+    simulator with the same `serial_number` is the board plugged back in, usually under another path. The
+    system's port enumeration does not list ptys, so port_info() provides the entry for a `list_ports`
+    stand-in.
+
+    Attributes:
+        port (str): Path of the pty to open with pyserial.
+        baud (int): The simulated firmware's current rate.
+        commands (int): Commands and updates applied so far.
+        keepalives (int): Keepalives received so far.
+        outputs (tuple): The last applied thruster and claw pulse widths.
+        serial_number (str): USB serial number reported by port_info().
+        link_events (list): (time.monotonic(), "lost" or "restored", silence in ms) for every link event sent.
+
+    Methods:
+        start() / stop():
+            Runs or stops the simulated firmware on a background thread.
+
+        port_info():
+            Returns the board's port as serial.tools.list_ports.comports() would list it.
+    """
+
+    def __init__(self, binary=True, max_stable_baud=None, error_rate=0.01, serial_number="SIM0001"):
+        """
+        Args:
+            binary (bool): Whether the firmware speaks the binary protocol, or only legacy JSON.
+            max_stable_baud (int | None): Fastest rate the simulated wire carries cleanly; None for any.
+            error_rate (float): Probability each byte is corrupted above `max_stable_baud`.
+            serial_number (str): USB serial number of the simulated board.
+        """
+        self.__binary = binary
+        self.__max_stable_baud = max_stable_baud
+        self.__error_rate = error_rate
+        self.__master, self.__slave = os.openpty()
+        tty.setraw(self.__slave)
+        self.port = os.ttyname(self.__slave)
+        self.baud = DEFAULT_BAUD
+        self.commands = 0
+        self.keepalives = 0
+        self.outputs = (1500,) * 6
+        self.serial_number = serial_number
+        self.link_events = []
+        self.__heartbeat_timeout = HEARTBEAT_TIMEOUT
+        self.__heartbeat_seen = False
+        self.__link_lost = False
+        self.__json_host = False
+        self.__previous_baud = None
+        self.__revert_at = None
+        self.__frame_at = time.monotonic()
+        self.__buffer = bytearray()
+        self.__reply_version = 1
+        self.__random = random.Random(0)
+        self.__run_flag = False
+        self.__thread = None
+
+    def start(self):
+        self.__run_flag = True
+        self.__thread = threading.Thread(target=self.__run, name="firmware-sim", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__run_flag = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        os.close(self.__master)
+        os.close(self.__slave)
+
+    def port_info(self):
+        info = ListPortInfo(self.port, skip_link_detection=True)
+        info.vid, info.pid, info.serial_number = SIMULATED_VID, SIMULATED_PID, self.serial_number
+        return info
+
+    def __run(self):
+        while self.__run_flag:
+            if self.__revert_at is not None and time.monotonic() >= self.__revert_at:
+                # No commit arrived in time: go back to the rate that worked, as the firmware does, and give
+                # the host a full heartbeat timeout there.
+                self.baud, self.__revert_at = self.__previous_baud, None
+                self.__frame_at = time.monotonic()
+            if (self.__revert_at is None and self.baud != DEFAULT_BAUD
+                    and time.monotonic() - self.__frame_at >= BAUD_IDLE_TIMEOUT):
+                # The host went quiet: go back to where a reconnecting host looks first.
+                self.baud = DEFAULT_BAUD
+            self.__check_heartbeat()
+            readable, _, _ = select.select([self.__master], [], [], LOOP_INTERVAL)
+            if not readable:
+                continue
+            data = os.read(self.__master, 4096)
+            time.sleep(len(data) * BITS_PER_BYTE / self.baud)
+            self.__buffer += self.__wire(data)
+            self.__process()
+
+    def __process(self):
+        delimiter = FRAME_DELIMITER
+        while True:
+            end = self.__buffer.find(delimiter)
+            if end < 0:
+                if len(self.__buffer) > 512:
+                    self.__buffer.clear()
+                return
+            piece = bytes(self.__buffer[:end])
+            del self.__buffer[:end + 1]
+            if piece.startswith(b"{"):
+                self.__handle_json(piece)
+            elif piece and self.__binary and len(piece) <= MAX_FRAME_BYTES:
+                self.__handle_frame(piece)
+
+    def __handle_frame(self, piece):
+        try:
+            version, msg_type, payload = split_frame(piece)
+        except ProtocolError:
+            return
+        # Replies carry the version of the frame they answer; from version 2 commands carry a sequence number.
+        self.__reply_version = version
+        self.__heartbeat(json_host=False)
+        seq = None
+        if version >= 2 and msg_type in (MSG_COMMAND, MSG_UPDATE, MSG_KEEPALIVE):
+            if len(payload) < SEQUENCE_FORMAT.size:
+                return
+            seq, = SEQUENCE_FORMAT.unpack_from(payload)
+            payload = payload[SEQUENCE_FORMAT.size:]
+        if msg_type == MSG_HELLO and len(payload) >= 1:
+            self.__send(MSG_HELLO_ACK, HELLO_ACK_FORMAT.pack(min(payload[0], PROTOCOL_VERSION), 0))
+        elif msg_type == MSG_PING and len(payload) == PING_FORMAT.size:
+            self.__send(MSG_PONG, payload)
+        elif msg_type == MSG_COMMAND and len(payload) == COMMAND_FORMAT.size:
+            fields = COMMAND_FORMAT.unpack(payload)
+            self.outputs = fields[:4] + fields[6:]
+            self.commands += 1
+            self.__ack(seq)
+        elif msg_type == MSG_UPDATE and payload and self.__apply_update(payload):
+            self.commands += 1
+            self.__ack(seq)
+        elif msg_type == MSG_SET_WATCHDOG and len(payload) == WATCHDOG_FORMAT.size:
+            self.__heartbeat_timeout = WATCHDOG_FORMAT.unpack(payload)[0] / 1000
+            self.__send(MSG_WATCHDOG_ACK, payload)
+        elif msg_type == MSG_KEEPALIVE:
+            self.keepalives += 1
+            self.__ack(seq)
+        elif msg_type == MSG_SET_BAUD and len(payload) == BAUD_FORMAT.size:
+            rate, = BAUD_FORMAT.unpack(payload)
+            if rate not in (DEFAULT_BAUD, *BAUD_RATES):
+                self.__send(MSG_BAUD_ACK, BAUD_ACK_FORMAT.pack(self.baud, BAUD_REJECTED))
+                return
+            self.__send(MSG_BAUD_ACK, BAUD_ACK_FORMAT.pack(rate, BAUD_SWITCHING))
+            if self.__revert_at is None:
+                self.__previous_baud = self.baud
+            self.baud = rate
+            self.__revert_at = time.monotonic() + BAUD_CONFIRM_TIMEOUT
+        elif msg_type == MSG_BAUD_COMMIT and len(payload) == BAUD_FORMAT.size:
+            rate, = BAUD_FORMAT.unpack(payload)
+            if rate == self.baud:
+                self.__revert_at = None
+                self.__send(MSG_BAUD_ACK, BAUD_ACK_FORMAT.pack(rate, BAUD_COMMITTED))
+
+    def __apply_update(self, payload):
+        mask, offset = payload[0], 1
+        values = {}
+        try:
+            for bit, (key, layout) in enumerate(UPDATE_FIELDS):
+                if mask & (1 << bit):
+                    values[key] = struct.unpack_from(layout, payload, offset)
+                    offset += struct.calcsize(layout)
+        except struct.error:
+            return False
+        if offset != len(payload):
+            return False
+        outputs = list(self.outputs)
+        if "axisInfo" in values:
+            outputs[:4] = values["axisInfo"]
+        if "claw_trigger" in values:
+            outputs[4] = values["claw_trigger"][0]
+        if "claw_bumper" in values:
+            outputs[5] = values["claw_bumper"][0]
+        self.outputs = tuple(outputs)
+        return True
+
+    def __handle_json(self, piece):
+        try:
+            doc = json.loads(piece.decode("utf-8"))
+        except ValueError:
+            return
+        self.__heartbeat(json_host=True)
+        if not doc:
+            self.keepalives += 1
+        else:
+            axis = doc.get("axisInfo", [])
+            thrusters = tuple(axis[:4]) if len(axis) >= 4 else self.outputs[:4]
+            self.outputs = thrusters + (doc.get("claw_trigger", self.outputs[4]), doc.get("claw_bumper", self.outputs[5]))
+            self.commands += 1
+        self.__write(b'{"status":"OK"}\n')
+
+    def __heartbeat(self, json_host):
+        now = time.monotonic()
+        self.__json_host = json_host
+        if self.__link_lost:
+            self.__link_lost = False
+            self.__link_event(LINK_RESTORED, now - self.__frame_at)
+        self.__heartbeat_seen = True
+        self.__frame_at = now
+
+    def __check_heartbeat(self):
+        # Paused while a baud switch is pending, when the two ends may not understand each other.
+        if (not self.__heartbeat_seen or self.__link_lost or not self.__heartbeat_timeout
+                or self.__revert_at is not None):
+            return
+        silence = time.monotonic() - self.__frame_at
+        if silence < self.__heartbeat_timeout:
+            return
+        self.__link_lost = True
+        self.outputs = (1500,) * 4 + self.outputs[4:]
+        self.__link_event(LINK_LOST, silence)
+
+    def __link_event(self, event, silence):
+        silent_ms = int(silence * 1000)
+        self.link_events.append((time.monotonic(), LINK_EVENTS[event], silent_ms))
+        if self.__json_host:
+            self.__write(json.dumps({"link": LINK_EVENTS[event], "silent_ms": silent_ms}).encode() + b"\n")
+        else:
+            self.__send(MSG_LINK_EVENT, LINK_EVENT_FORMAT.pack(event, silent_ms))
+
+    def __ack(self, seq):
+        if seq is None:
+            self.__send(MSG_ACK, ACK_FORMAT.pack(ACK_STATUS_OK))
+        else:
+            self.__send(MSG_ACK, SEQUENCED_ACK_FORMAT.pack(ACK_STATUS_OK, seq))
+
+    def __send(self, msg_type, payload):
+        self.__write(encode_frame(msg_type, payload, self.__reply_version))
+
+    def __write(self, data):
+        time.sleep(len(data) * BITS_PER_BYTE / self.baud)
+        try:
+            os.write(self.__master, self.__wire(data))
+        except OSError:
+            pass
+
+    def __wire(self, data):
+        # What the other end actually receives: garbage on a rate mismatch, bit errors on a marginal rate.
+        if self.__host_baud() not in (None, self.baud):
+            return bytes(self.__random.getrandbits(8) for _ in data)
+        if self.__max_stable_baud is not None and self.baud > self.__max_stable_baud:
+            return bytes(b ^ (1 << self.__random.randrange(8)) if self.__random.random() < self.__error_rate else b
+                         for b in data)
+        return data
+
+    def __host_baud(self):
+        try:
+            buffer = array.array("i", [0] * 64)
+            fcntl.ioctl(self.__slave, TCGETS2, buffer)
+            return struct.unpack_from("<I", buffer.tobytes(), 40)[0]
+        except OSError:
+            # Not Linux: trust that the host switched when asked.
+            return None
@@ -0,0 +1,238 @@
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from collections import namedtuple
+import threading
+import time
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Identifies a frame bus segment and its layout version.
+FRAME_BUS_MAGIC = 0x524F564255530001
+# Bus header: magic, slot count, slot data size, latest published sequence. Padded to one cache line.
+HEADER_BYTES = 64
+# Slot header: sequence, capture time, height, width, channels. Padded to one cache line.
+SLOT_HEADER_BYTES = 64
+# Written to a slot's sequence while the publisher is overwriting it.
+WRITING = np.uint64(2 ** 64 - 1)
+
+# A frame read from the bus. `frame` is a read-only view straight into shared memory.
+BusFrame = namedtuple("BusFrame", ["sequence", "captured_at", "frame"])
+
+
+def _layout(buffer, slots, slot_size):
+    header = np.ndarray((4,), dtype=np.uint64, buffer=buffer, offset=0)
+    stride = SLOT_HEADER_BYTES + slot_size
+    slot_headers = []
+    slot_times = []
+    slot_data = []
+    for slot in range(slots):
+        offset = HEADER_BYTES + slot * stride
+        slot_headers.append(np.ndarray((5,), dtype=np.uint64, buffer=buffer, offset=offset))
+        slot_times.append(np.ndarray((1,), dtype=np.float64, buffer=buffer, offset=offset + 8))
+        slot_data.append(np.ndarray((slot_size,), dtype=np.uint8, buffer=buffer, offset=offset + SLOT_HEADER_BYTES))
+    return header, slot_headers, slot_times, slot_data
+
+
+class FrameBusPublisher:
+    """
+    FrameBusPublisher publishes frames into a ring of slots in shared memory for other processes.
+
+    Every frame gets the next sequence number. A slot's sequence is set to WRITING while it is overwritten
+    and to the frame's sequence once it is complete, and only then is the bus-wide latest sequence advanced.
+    Consumers use those two numbers to notice when a slot they want was overwritten, so the publisher never
+    waits for anyone; a consumer that falls more than a ring behind is lapped and told so.
+
+    Methods:
+        submit(frame, captured_at):
+            VideoThread frame listener. Copies the frame into the next slot.
+
+        close():
+            Closes and removes the shared memory segment.
+    """
+
+    def __init__(self, name, slots=8, max_width=1920, max_height=1080, channels=3):
+        """
+        Args:
+            name (str): Shared memory name consumers attach to.
+            slots (int): Number of frames in the ring.
+            max_width (int): Widest frame the bus can carry.
+            max_height (int): Tallest frame the bus can carry.
+            channels (int): Channels per pixel.
+
+        Raises:
+            FileExistsError: If a segment with that name already exists.
+        """
+        # Keep every slot's data cache-line aligned.
+        self.__slot_size = -(-max_width * max_height * channels // 64) * 64
+        self.__slots = slots
+        size = HEADER_BYTES + slots * (SLOT_HEADER_BYTES + self.__slot_size)
+        try:
+            self.__shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Another instance may be publishing into it, so it is not ours to remove.
+            raise FileExistsError(f"Frame bus {name} already exists; if no other instance is running it was left "
+                                  f"by a crashed run, remove /dev/shm/{name}") from None
+        self.name = name
+        self.__header, self.__slot_headers, self.__slot_times, self.__slot_data = _layout(self.__shm.buf, slots, self.__slot_size)
+        self.__header[:] = (FRAME_BUS_MAGIC, slots, self.__slot_size, 0)
+        self.__sequence = 0
+        self.__lock = threading.Lock()
+        self.oversized = 0
+        logger.info(f"Frame bus {name} ready: {slots} slots of {self.__slot_size / 1e6:.1f} MB")
+
+    def submit(self, frame, captured_at):
+        """
+        Copies a frame into the next slot and publishes it. Never blocks.
+
+        Args:
+            frame (numpy.ndarray): uint8 frame of at most max_width x max_height x channels.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        with self.__lock:
+            if self.__header is None:
+                return
+            if frame.nbytes > self.__slot_size:
+                self.oversized += 1
+                return
+            self.__write(frame, captured_at)
+
+    def close(self):
+        # Waits for a submit() in progress; views into the buffer must be dropped before it can be closed.
+        with self.__lock:
+            self.__header = self.__slot_headers = self.__slot_times = self.__slot_data = None
+        self.__shm.close()
+        self.__shm.unlink()
+
+    def __write(self, frame, captured_at):
+        sequence = self.__sequence + 1
+        slot = (sequence - 1) % self.__slots
+        slot_header = self.__slot_headers[slot]
+        slot_header[0] = WRITING
+        np.copyto(self.__slot_data[slot][:frame.nbytes].reshape(frame.shape), frame)
+        self.__slot_times[slot][0] = captured_at
+        slot_header[2] = frame.shape[0]
+        slot_header[3] = frame.shape[1]
+        slot_header[4] = frame.shape[2] if frame.ndim == 3 else 1
+        slot_header[0] = sequence
+        self.__header[3] = sequence
+        self.__sequence = sequence
+
+
+class FrameBusConsumer:
+    """
+    FrameBusConsumer reads frames from a FrameBusPublisher in another process, without copying them.
+
+    Each consumer has its own read cursor. read_next() returns frames in order and read_latest() skips to the
+    newest one. The returned frame is a view into shared memory; once done with it, call is_valid() to learn
+    whether the publisher overwrote the slot while it was being used.
+
+    Attributes:
+        lapped (int): Number of frames this consumer missed because the publisher overwrote them first.
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Shared memory name given to the publisher.
+
+        Raises:
+            FileNotFoundError: If no publisher with that name exists.
+            ValueError: If the segment is not a frame bus.
+        """
+        self.__shm = shared_memory.SharedMemory(name=name)
+        # Before Python 3.13 the resource tracker would unlink the publisher's segment when this process exits.
+        resource_tracker.unregister(self.__shm._name, "shared_memory")
+        header = np.ndarray((4,), dtype=np.uint64, buffer=self.__shm.buf, offset=0)
+        magic, slots, slot_size = (int(v) for v in header[:3])
+        del header
+        if magic != FRAME_BUS_MAGIC:
+            self.__shm.close()
+            raise ValueError(f"{name} is not a frame bus")
+        self.__slots = slots
+        self.__header, self.__slot_headers, self.__slot_times, self.__slot_data = _layout(self.__shm.buf, slots, slot_size)
+        self.cursor = int(self.__header[3])
+        self.lapped = 0
+
+    def latest_sequence(self):
+        return int(self.__header[3])
+
+    def read_next(self):
+        """
+        Returns the frame after the cursor and advances the cursor.
+
+        Returns:
+            BusFrame | None: The next frame, or None if nothing new was published.
+        """
+        latest = int(self.__header[3])
+        if self.cursor >= latest:
+            return None
+        wanted = self.cursor + 1
+        # The slot after the newest one may already be half overwritten, so keep one slot of margin.
+        oldest_safe = latest - self.__slots + 2
+        if wanted < oldest_safe:
+            self.lapped += oldest_safe - wanted
+            wanted = oldest_safe
+        return self.__read(wanted, latest)
+
+    def read_latest(self):
+        """
+        Returns the newest frame and moves the cursor to it. Frames skipped this way do not count as lapped.
+
+        Returns:
+            BusFrame | None: The newest frame, or None if nothing new was published.
+        """
+        latest = int(self.__header[3])
+        if self.cursor >= latest:
+            return None
+        return self.__read(latest, latest)
+
+    def is_valid(self, bus_frame):
+        """
+        Returns True if the slot still holds `bus_frame`, i.e. it was not overwritten while in use.
+        """
+        return int(self.__slot_headers[(bus_frame.sequence - 1) % self.__slots][0]) == bus_frame.sequence
+
+    def close(self):
+        self.__header = self.__slot_headers = self.__slot_times = self.__slot_data = None
+        self.__shm.close()
+
+    def __read(self, sequence, latest):
+        slot = (sequence - 1) % self.__slots
+        slot_header = self.__slot_headers[slot]
+        if int(slot_header[0]) != sequence:
+            # Overwritten between reading the bus header and getting here.
+            self.lapped += 1
+            self.cursor = latest
+            return None
+        height, width, channels = (int(v) for v in slot_header[2:5])
+        frame = self.__slot_data[slot][:height * width * channels].reshape((height, width, channels))
+        frame.flags.writeable = False
+        captured_at = float(self.__slot_times[slot][0])
+        self.cursor = sequence
+        return BusFrame(sequence, captured_at, frame)
+
+
+if __name__ == "__main__":
+    # Example subprocess consumer: python3 ./framebus.py rov_main
+    import sys
+    consumer = FrameBusConsumer(sys.argv[1] if len(sys.argv) > 1 else "rov_main")
+    frames = 0
+    torn = 0
+    start = time.monotonic()
+    while True:
+        bus_frame = consumer.read_next()
+        if bus_frame is None:
+            time.sleep(0.002)
+            continue
+        mean = bus_frame.frame.mean()
+        frames += 1
+        if not consumer.is_valid(bus_frame):
+            torn += 1
+        if time.monotonic() - start >= 1.0:
+            print(f"{frames} fps, lapped {consumer.lapped}, torn {torn}, "
+                  f"age {(time.monotonic() - bus_frame.captured_at) * 1000:.1f} ms, mean {mean:.1f}")
+            frames = 0
+            start = time.monotonic()
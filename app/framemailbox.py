@@ -0,0 +1,169 @@
+import numpy as np
+import threading
+
+
+class FrameMailbox:
+    """
+    FrameMailbox is a single-slot, latest-wins handoff between a producer thread and a consumer.
+
+    The producer overwrites the slot on every post, and the consumer takes whatever is newest when it is
+    ready for it. A frame that is overwritten before it was taken is dropped and counted, so the depth of
+    the mailbox never exceeds one no matter how slow the consumer is.
+
+    The consumer owns the frame it took until it takes the next one. If a release callback is given, it is
+    called with each frame once nobody uses it any more, that is when it is dropped or when the consumer
+    takes its successor, so the producer can reuse the frame's buffer without copying it first.
+
+    Attributes:
+        posted (int): Number of frames posted by the producer.
+        delivered (int): Number of frames taken by the consumer.
+        dropped (int): Number of frames overwritten before the consumer took them.
+
+    Methods:
+        post(frame):
+            Stores a frame in the slot, replacing and dropping any frame that was not taken yet.
+
+        take():
+            Removes and returns the newest frame, or None if nothing new was posted.
+
+        stats():
+            Returns the mailbox counters as a dictionary.
+    """
+
+    def __init__(self, release=None):
+        """
+        Args:
+            release (callable | None): Called with every frame that is dropped or replaced in the consumer's
+                                       hands, on whichever thread dropped or replaced it.
+        """
+        self.__lock = threading.Lock()
+        self.__release = release
+        self.__frame = None
+        self.__taken = None
+        self.posted = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def post(self, frame):
+        """
+        Stores a frame in the slot. Never blocks on the consumer.
+
+        Args:
+            frame: The frame to hand over.
+        """
+        with self.__lock:
+            dropped = self.__frame
+            if dropped is not None:
+                self.dropped += 1
+            self.__frame = frame
+            self.posted += 1
+        if dropped is not None and self.__release is not None:
+            self.__release(dropped)
+
+    def take(self):
+        """
+        Removes and returns the newest frame. The frame taken before it is released, unless this returns None.
+
+        Returns:
+            The newest posted frame, or None if no frame was posted since the last call.
+        """
+        with self.__lock:
+            frame = self.__frame
+            if frame is None:
+                return None
+            self.__frame = None
+            self.delivered += 1
+            replaced, self.__taken = self.__taken, frame
+        if replaced is not None and self.__release is not None:
+            self.__release(replaced)
+        return frame
+
+    def depth(self):
+        """
+        Returns the number of frames waiting in the mailbox, which is either 0 or 1.
+        """
+        return 0 if self.__frame is None else 1
+
+    def stats(self):
+        """
+        Returns the mailbox counters.
+
+        Returns:
+            dict: The posted, delivered and dropped frame counts and the current depth.
+        """
+        with self.__lock:
+            return {
+                "posted": self.posted,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "depth": 0 if self.__frame is None else 1
+            }
+
+
+class TripleBuffer:
+    """
+    TripleBuffer is a latest-wins handoff for frames that are copied rather than referenced.
+
+    The producer copies into a back buffer it owns, then swaps it with the pending slot. The consumer swaps
+    the pending slot with the front buffer it owns and reads from that. Neither side ever touches a buffer
+    the other is using, the producer never waits for the consumer, and after the first three frames no
+    further buffers are allocated unless the frame size changes.
+
+    Attributes:
+        posted (int): Number of frames written by the producer.
+        dropped (int): Number of frames overwritten before the consumer read them.
+
+    Methods:
+        write(frame, captured_at):
+            Copies a frame in and publishes it.
+
+        read():
+            Returns (frame, captured_at) for the newest unread frame, or None.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__back = None
+        self.__back_time = 0.0
+        self.__pending = None
+        self.__pending_time = 0.0
+        self.__front = None
+        self.__front_time = 0.0
+        self.__fresh = False
+        self.posted = 0
+        self.dropped = 0
+
+    def write(self, frame, captured_at):
+        """
+        Copies a frame into the back buffer and publishes it. Never blocks on the consumer.
+
+        Args:
+            frame (numpy.ndarray): The frame to copy.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        if self.__back is None or self.__back.shape != frame.shape or self.__back.dtype != frame.dtype:
+            self.__back = np.empty_like(frame)
+        np.copyto(self.__back, frame)
+        self.__back_time = captured_at
+        with self.__lock:
+            self.__back, self.__pending = self.__pending, self.__back
+            self.__back_time, self.__pending_time = self.__pending_time, self.__back_time
+            if self.__fresh:
+                self.dropped += 1
+            self.__fresh = True
+            self.posted += 1
+
+    def read(self):
+        """
+        Returns the newest unread frame. The array stays valid until the next call to read().
+
+        Returns:
+            tuple | None: (frame, captured_at), or None if nothing new was written.
+        """
+        with self.__lock:
+            if not self.__fresh:
+                return None
+            self.__front, self.__pending = self.__pending, self.__front
+            self.__front_time, self.__pending_time = self.__pending_time, self.__front_time
+            self.__fresh = False
+        return self.__front, self.__front_time
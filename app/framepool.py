@@ -0,0 +1,130 @@
+import numpy as np
+import threading
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class FramePool:
+    """
+    FramePool is a fixed ring of preallocated numpy buffers that are handed out round-robin.
+
+    Buffers are only (re)allocated when the requested shape or dtype changes, which normally happens
+    once when the first frame arrives. Every allocation is counted so the video path can prove that it
+    stays allocation-free in steady state.
+
+    A leased pool does not hand a buffer out again until it is released, so a consumer on another thread
+    can hold on to one for as long as it needs. If every buffer is still held, a new one is allocated
+    rather than waiting, and counted like any other allocation.
+
+    Attributes:
+        allocations (int): Total number of buffers allocated by this pool since it was created.
+
+    Methods:
+        acquire(shape, dtype=np.uint8):
+            Returns the next buffer in the ring, reallocating the ring if the shape or dtype changed.
+
+        adopt(buffer):
+            Replaces the buffer that was just handed out with one that was allocated elsewhere.
+
+        release(buffer):
+            Returns a buffer of a leased pool to the ring.
+    """
+
+    def __init__(self, size=3, leased=False):
+        """
+        Initializes an empty FramePool.
+
+        Args:
+            size (int): Number of buffers in the ring. It must be larger than the number of frames a
+                        consumer may hold on to at once, otherwise a buffer is reused while still in use
+                        (or, in a leased pool, a new one is allocated).
+            leased (bool): Whether acquired buffers stay out of the ring until release() is called.
+        """
+        self.__size = size
+        self.__leased = leased
+        self.__buffers = []
+        self.__held = []
+        self.__shape = None
+        self.__dtype = None
+        self.__index = 0
+        self.__lock = threading.Lock()
+        self.allocations = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        Returns the next buffer in the ring.
+
+        Args:
+            shape (tuple): Required buffer shape.
+            dtype (numpy.dtype): Required buffer dtype.
+
+        Returns:
+            numpy.ndarray: A preallocated buffer. Its contents are whatever was written to it last.
+        """
+        shape = tuple(shape)
+        with self.__lock:
+            if shape != self.__shape or dtype != self.__dtype:
+                if self.__buffers:
+                    logger.debug(f"Frame pool reallocated: {self.__shape} -> {shape}")
+                self.__buffers = [np.empty(shape, dtype=dtype) for _ in range(self.__size)]
+                # Buffers of the old size that are still held are simply dropped when released.
+                self.__held = []
+                self.__shape = shape
+                self.__dtype = dtype
+                self.__index = 0
+                self.allocations += self.__size
+
+            if not self.__leased:
+                buffer = self.__buffers[self.__index]
+                self.__index = (self.__index + 1) % self.__size
+                return buffer
+
+            for _ in range(self.__size):
+                buffer = self.__buffers[self.__index]
+                self.__index = (self.__index + 1) % self.__size
+                if not any(held is buffer for held in self.__held):
+                    break
+            else:
+                # Every buffer is held, so this one takes the place of the oldest in the ring.
+                buffer = np.empty(shape, dtype=dtype)
+                self.__buffers[(self.__index - 1) % self.__size] = buffer
+                self.allocations += 1
+            self.__held.append(buffer)
+            return buffer
+
+    def release(self, buffer):
+        """
+        Returns a buffer handed out by a leased pool, so acquire() may hand it out again.
+
+        Args:
+            buffer (numpy.ndarray): A buffer returned by acquire(). Buffers the pool no longer knows are ignored.
+        """
+        with self.__lock:
+            for index, held in enumerate(self.__held):
+                if held is buffer:
+                    del self.__held[index]
+                    return
+
+    def adopt(self, buffer):
+        """
+        Replaces the most recently acquired buffer with one that was allocated outside of the pool.
+
+        OpenCV silently allocates a new output array when the one passed in has the wrong shape. Adopting
+        that array keeps the ring consistent and records the allocation.
+
+        Args:
+            buffer (numpy.ndarray): The array that was returned instead of the pooled one.
+        """
+        self.allocations += 1
+        if buffer.shape != self.__shape or buffer.dtype != self.__dtype:
+            # The stream changed geometry, so the rest of the ring is stale as well.
+            self.__buffers = [buffer] + [np.empty_like(buffer) for _ in range(self.__size - 1)]
+            self.allocations += self.__size - 1
+            self.__shape = buffer.shape
+            self.__dtype = buffer.dtype
+            self.__index = 1 % self.__size
+        else:
+            self.__buffers[(self.__index - 1) % self.__size] = buffer
@@ -0,0 +1,278 @@
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QImage, QPainter, QColor, QFont, QFontMetrics
+import time
+
+# Pulse widths the thruster and claw bars span, in microseconds.
+THRUSTER_RANGE = (1100, 1900)
+CLAW_RANGE = (1100, 2100)
+NEUTRAL_PULSEWIDTH = 1500
+# Most elements redrawn per paint. Elements over budget stay dirty and are redrawn on the next paint.
+HUD_DRAW_BUDGET = 3
+# Telemetry older than this marks the link as stale, then as lost, in seconds.
+LINK_STALE_AFTER = 1.0
+LINK_LOST_AFTER = 3.0
+
+PANEL_COLOR = QColor(0, 0, 0, 150)
+FRAME_COLOR = QColor(97, 175, 239)
+TEXT_COLOR = QColor(229, 192, 123)
+BAR_COLOR = QColor(0, 230, 118)
+LINK_COLORS = {"OK": QColor(0, 230, 118), "STALE": QColor(229, 192, 123), "LOST": QColor(224, 108, 117),
+               "--": QColor(171, 178, 191)}
+
+
+class GlyphCache:
+    """
+    Pre-rendered glyphs for one font and color, so changing numbers are blitted instead of shaped and
+    rasterized on every redraw. Glyphs are rendered on first use.
+    """
+
+    def __init__(self, font, color):
+        self.__font = font
+        self.__color = color
+        self.__metrics = QFontMetrics(font)
+        self.__glyphs = {}
+        self.height = self.__metrics.height()
+
+    def width(self, text):
+        return sum(self.__glyph(c).width() for c in text)
+
+    def draw(self, painter, x, y, text):
+        """
+        Draws `text` with its top-left corner at (x, y) and returns the x after the last glyph.
+        """
+        for c in text:
+            glyph = self.__glyph(c)
+            painter.drawImage(x, y, glyph)
+            x += glyph.width()
+        return x
+
+    def __glyph(self, c):
+        glyph = self.__glyphs.get(c)
+        if glyph is None:
+            glyph = QImage(max(1, self.__metrics.horizontalAdvance(c)), self.height, QImage.Format_ARGB32_Premultiplied)
+            glyph.fill(Qt.transparent)
+            painter = QPainter(glyph)
+            painter.setFont(self.__font)
+            painter.setPen(self.__color)
+            painter.drawText(0, self.__metrics.ascent(), c)
+            painter.end()
+            self.__glyphs[c] = glyph
+        return glyph
+
+
+class HudOverlay:
+    """
+    HudOverlay is the heads-up display drawn over the video surface: thruster bars, claw positions, depth,
+    heading and link status.
+
+    Everything that never changes (panels, frames, captions, scales) is drawn once per surface size into a
+    static layer. The HUD itself is a second, transparent layer; every paint blits just the element
+    rectangles from it. Setting a value only marks its element dirty if what is displayed changes, and paint()
+    repaints at most HUD_DRAW_BUDGET dirty elements per call, each by restoring its rectangle from the static
+    layer and drawing the new value with cached glyphs. Joystick ticks that change nothing cost nothing.
+
+    Methods:
+        resize(width, height):
+            Lays the HUD out for a new surface size and redraws the static layer.
+
+        set_thrusters(pulsewidths) / set_claws(trigger, bumper) / set_depth(meters) / set_heading(degrees):
+            Updates displayed values.
+
+        set_link(controller, telemetry_at):
+            Updates controller and telemetry link status.
+
+        paint(painter):
+            Redraws dirty elements within the draw budget and composites the HUD with `painter`.
+
+        stats():
+            Returns redraw counters.
+    """
+
+    def __init__(self):
+        self.__values = {"thrusters": (NEUTRAL_PULSEWIDTH,) * 4, "claws": (NEUTRAL_PULSEWIDTH,) * 2,
+                         "depth": None, "heading": None, "link": ("--", "--")}
+        # Dirty elements in the order they became dirty, so nothing waits for more than a few paints.
+        self.__dirty = list(self.__values)
+        self.__rects = {}
+        self.__static = None
+        self.__layer = None
+        self.__caption_font = QFont("monospace", 10)
+        self.__captions = GlyphCache(self.__caption_font, FRAME_COLOR)
+        self.__digits = GlyphCache(QFont("monospace", 16, QFont.Bold), TEXT_COLOR)
+        self.__link_glyphs = {state: GlyphCache(QFont("monospace", 12, QFont.Bold), color)
+                              for state, color in LINK_COLORS.items()}
+        self.__drawers = {"thrusters": self.__draw_thrusters, "claws": self.__draw_claws,
+                          "heading": self.__draw_heading, "depth": self.__draw_depth, "link": self.__draw_link}
+
+        self.__redrawn = 0
+        self.__deferred = 0
+        self.__render_time = 0.0
+        self.__renders = 0
+
+    def resize(self, width, height):
+        margin = 12
+        panel_h = max(90, height // 5)
+        top_h = self.__digits.height + self.__captions.height + 12
+        self.__rects = {
+            "thrusters": QRect(margin, height - panel_h - margin, 4 * 44 + 12, panel_h),
+            "claws": QRect(width - 236 - margin, height - 2 * top_h - margin, 236, 2 * top_h),
+            "heading": QRect((width - 120) // 2, margin, 120, top_h),
+            "depth": QRect(width - 140 - margin, margin, 140, top_h),
+            "link": QRect(width - 140 - margin, margin + top_h + 6, 140, top_h + self.__captions.height)
+        }
+        self.__layer = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        self.__layer.fill(Qt.transparent)
+        self.__static = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        self.__static.fill(Qt.transparent)
+        painter = QPainter(self.__static)
+        for name, rect in self.__rects.items():
+            painter.fillRect(rect, PANEL_COLOR)
+            painter.setPen(FRAME_COLOR)
+            painter.drawRect(rect.adjusted(0, 0, -1, -1))
+            self.__draw_static(painter, name, rect)
+        painter.end()
+        self.__dirty = list(self.__rects)
+
+    def set_thrusters(self, pulsewidths):
+        """
+        Args:
+            pulsewidths (list[int]): Left, right, top left and top right thruster pulse widths.
+        """
+        self.__set("thrusters", tuple(int(p) for p in pulsewidths))
+
+    def set_claws(self, trigger, bumper):
+        self.__set("claws", (int(trigger), int(bumper)))
+
+    def set_depth(self, meters):
+        self.__set("depth", None if meters is None else round(float(meters), 1))
+
+    def set_heading(self, degrees):
+        self.__set("heading", None if degrees is None else round(float(degrees)) % 360)
+
+    def set_link(self, controller, telemetry_at):
+        """
+        Args:
+            controller (bool | None): Whether a controller is connected. None if unknown.
+            telemetry_at (float | None): time.monotonic() of the latest telemetry, None if none arrived yet.
+        """
+        controller_state = "--" if controller is None else ("OK" if controller else "LOST")
+        if telemetry_at is None:
+            telemetry_state = "--"
+        else:
+            age = time.monotonic() - telemetry_at
+            telemetry_state = "OK" if age < LINK_STALE_AFTER else ("STALE" if age < LINK_LOST_AFTER else "LOST")
+        self.__set("link", (controller_state, telemetry_state))
+
+    def is_dirty(self):
+        return bool(self.__dirty) and self.__layer is not None
+
+    def paint(self, painter):
+        """
+        Redraws dirty elements within the draw budget, then blits every element's rectangle of the HUD
+        layer with `painter`. The space between elements is never touched.
+        """
+        if self.__layer is None:
+            return
+        if self.__dirty:
+            self.__render()
+        for rect in self.__rects.values():
+            painter.drawImage(rect.topLeft(), self.__layer, rect)
+
+    def __render(self):
+        start = time.perf_counter()
+        batch, self.__dirty = self.__dirty[:HUD_DRAW_BUDGET], self.__dirty[HUD_DRAW_BUDGET:]
+        painter = QPainter(self.__layer)
+        for name in batch:
+            rect = self.__rects[name]
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.drawImage(rect.topLeft(), self.__static, rect)
+            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+            self.__drawers[name](painter, rect, self.__values[name])
+        painter.end()
+        self.__redrawn += len(batch)
+        self.__deferred += len(self.__dirty)
+        self.__render_time += time.perf_counter() - start
+        self.__renders += 1
+
+    def stats(self):
+        return {
+            "redrawn": self.__redrawn,
+            "deferred": self.__deferred,
+            "render_ms_avg": self.__render_time / self.__renders * 1000 if self.__renders else 0.0
+        }
+
+    def __set(self, name, value):
+        if self.__values[name] == value:
+            return
+        self.__values[name] = value
+        if name not in self.__dirty:
+            self.__dirty.append(name)
+
+    def __draw_static(self, painter, name, rect):
+        painter.setFont(self.__caption_font)
+        caption_y = rect.top() + 4 + QFontMetrics(self.__caption_font).ascent()
+        match name:
+            case "thrusters":
+                for i, caption in enumerate(("L", "R", "TL", "TR")):
+                    bar = self.__thruster_bar(rect, i)
+                    painter.drawRect(bar.adjusted(0, 0, -1, -1))
+                    mid = bar.top() + bar.height() // 2
+                    painter.drawLine(bar.left() - 3, mid, bar.right() + 3, mid)
+                    painter.drawText(bar.left(), rect.bottom() - 4, caption)
+            case "claws":
+                for i, caption in enumerate(("CLAW", "CLAW 2")):
+                    bar = self.__claw_bar(rect, i)
+                    painter.drawText(rect.left() + 6, bar.top() - 4, caption)
+                    painter.drawRect(bar.adjusted(0, 0, -1, -1))
+            case "heading":
+                painter.drawText(rect.left() + 6, caption_y, "HEADING")
+            case "depth":
+                painter.drawText(rect.left() + 6, caption_y, "DEPTH")
+            case "link":
+                painter.drawText(rect.left() + 6, caption_y, "CONTROLLER")
+                painter.drawText(rect.left() + 6, caption_y + rect.height() // 2, "TELEMETRY")
+
+    def __thruster_bar(self, rect, index):
+        top = rect.top() + 8
+        bottom = rect.bottom() - self.__captions.height - 6
+        return QRect(rect.left() + 16 + index * 44, top, 20, bottom - top)
+
+    def __claw_bar(self, rect, index):
+        row = rect.height() // 2
+        return QRect(rect.left() + 6, rect.top() + index * row + row - 18, rect.width() - 12, 12)
+
+    def __draw_thrusters(self, painter, rect, values):
+        low, high = THRUSTER_RANGE
+        for i, value in enumerate(values):
+            bar = self.__thruster_bar(rect, i).adjusted(2, 2, -2, -2)
+            mid = bar.top() + bar.height() // 2
+            # Bars grow from the neutral line. A stick pushed forward reads -1, which is 1100 µs, so pulses
+            # below neutral grow up and those above it grow down.
+            value = min(max(value, low), high)
+            offset = (NEUTRAL_PULSEWIDTH - value) / (NEUTRAL_PULSEWIDTH - low) * (bar.height() // 2)
+            y1, y2 = sorted((mid, mid - int(offset)))
+            painter.fillRect(bar.left(), y1, bar.width(), max(1, y2 - y1), BAR_COLOR)
+
+    def __draw_claws(self, painter, rect, values):
+        low, high = CLAW_RANGE
+        for i, value in enumerate(values):
+            bar = self.__claw_bar(rect, i).adjusted(2, 2, -2, -2)
+            fill = int((min(max(value, low), high) - low) / (high - low) * bar.width())
+            painter.fillRect(bar.left(), bar.top(), max(1, fill), bar.height(), BAR_COLOR)
+            text = str(value)
+            self.__digits.draw(painter, rect.right() - 6 - self.__digits.width(text),
+                               bar.top() - self.__digits.height - 2, text)
+
+    def __draw_heading(self, painter, rect, value):
+        text = "---°" if value is None else f"{value:03d}°"
+        self.__digits.draw(painter, rect.left() + 6, rect.top() + self.__captions.height + 6, text)
+
+    def __draw_depth(self, painter, rect, value):
+        text = "--.- m" if value is None else f"{value:.1f} m"
+        self.__digits.draw(painter, rect.left() + 6, rect.top() + self.__captions.height + 6, text)
+
+    def __draw_link(self, painter, rect, value):
+        half = rect.height() // 2
+        for i, state in enumerate(value):
+            glyphs = self.__link_glyphs[state]
+            glyphs.draw(painter, rect.right() - 6 - glyphs.width(state), rect.top() + 4 + i * half, state)
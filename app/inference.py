@@ -0,0 +1,320 @@
+import cv2
+import numpy as np
+import threading
+import time
+import os
+from framemailbox import TripleBuffer
+from visionpipeline import Rect, VisionResult
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Side of the grayscale thumbnail used to decide whether a frame changed since the last inference.
+SIGNATURE_SIZE = 16
+
+
+class TFLiteDetector:
+    """
+    Object detector backed by a TFLite model, the lightweight path for CPU-only laptops.
+
+    Expects the standard TFLite detection signature: one image input, and boxes (ymin, xmin, ymax, xmax,
+    normalized), classes, scores and count as outputs. Quantized uint8/int8 models are fed raw pixels and
+    their outputs are dequantized with the parameters stored in the model.
+    """
+
+    def __init__(self, model_path, num_threads=2):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.__interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.__interpreter.allocate_tensors()
+        self.__input = self.__interpreter.get_input_details()[0]
+        self.__outputs = self.__interpreter.get_output_details()
+        self.input_size = (int(self.__input["shape"][2]), int(self.__input["shape"][1]))
+        self.__batch = 1
+        self.__fixed_batch = False
+
+    def detect(self, images):
+        """
+        Args:
+            images (numpy.ndarray): Batch of RGB uint8 images of shape (n, height, width, 3) at input_size.
+
+        Returns:
+            list: For every image, a list of (ymin, xmin, ymax, xmax, class_id, score) tuples.
+        """
+        if len(images) > 1 and self.__fixed_batch:
+            return [found for image in images for found in self.detect(image[np.newaxis])]
+        batch = self.__prepare(images)
+        if len(batch) != self.__batch:
+            try:
+                self.__interpreter.resize_tensor_input(self.__input["index"], batch.shape)
+                self.__interpreter.allocate_tensors()
+                self.__batch = len(batch)
+            except (ValueError, RuntimeError):
+                # The model only takes a batch of one; run the images one after another from now on.
+                self.__fixed_batch = True
+                return self.detect(images)
+        self.__interpreter.set_tensor(self.__input["index"], batch)
+        self.__interpreter.invoke()
+        boxes, classes, scores = (self.__output(i) for i in range(3))
+        return [[(*boxes[n][k], int(classes[n][k]), float(scores[n][k])) for k in range(len(scores[n]))]
+                for n in range(len(batch))]
+
+    def __prepare(self, images):
+        # Float models take [-1, 1]; quantized models take raw pixels, shifted for signed int8.
+        dtype = self.__input["dtype"]
+        if dtype == np.float32:
+            return (images.astype(np.float32) - 127.5) / 127.5
+        if dtype == np.int8:
+            return (images.astype(np.int16) - 128).astype(np.int8)
+        return images.astype(dtype, copy=False)
+
+    def __output(self, i):
+        detail = self.__outputs[i]
+        value = self.__interpreter.get_tensor(detail["index"])
+        scale, zero_point = detail.get("quantization", (0.0, 0))
+        if scale:
+            value = (value.astype(np.float32) - zero_point) * scale
+        return value
+
+
+class KerasDetector:
+    """
+    Object detector backed by a Keras model, for when a GPU or a fast CPU is available.
+
+    The model must take a float32 RGB batch scaled to [0, 1] and return (boxes, scores, classes), with
+    boxes as normalized (ymin, xmin, ymax, xmax).
+    """
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self.__model = tf.keras.models.load_model(model_path, compile=False)
+        shape = self.__model.input_shape
+        self.input_size = (int(shape[2]), int(shape[1]))
+
+    def detect(self, images):
+        boxes, scores, classes = (np.asarray(t) for t in self.__model(images.astype(np.float32) / 255.0, training=False))
+        return [[(*boxes[n][k], int(classes[n][k]), float(scores[n][k])) for k in range(len(scores[n]))]
+                for n in range(len(images))]
+
+
+def load_detector(model_path, num_threads=2):
+    """
+    Loads a detector for a model file, picking the backend from the extension.
+
+    Args:
+        model_path (str): A .tflite file, or a Keras .keras/.h5 file or SavedModel directory.
+        num_threads (int): CPU threads for the TFLite interpreter.
+
+    Returns:
+        TFLiteDetector | KerasDetector: The loaded detector.
+    """
+    if model_path.endswith(".tflite"):
+        return TFLiteDetector(model_path, num_threads)
+    return KerasDetector(model_path)
+
+
+class InferenceStage:
+    """
+    InferenceStage runs an object detector on one or more camera feeds on a dedicated worker thread.
+
+    Each feed gets a frame listener from listener_for(); it copies every `stride`-th frame into a per-feed
+    triple buffer and never waits. The worker collects the newest frame of every feed that has one, and runs
+    the detector once on the whole batch. Batches are formed across feeds only: an older frame of a feed would
+    be superseded before anyone saw its detections, so with a single feed every batch holds one frame. Frames
+    that barely differ from the frame last inferred for that feed are not re-run; their cached detections are
+    reused. The stride adapts so that capture-to-result
+    latency stays near `latency_target`, which keeps the GUI frame rate independent of model speed.
+
+    Methods:
+        start() / stop():
+            Loads the model and starts the worker, or stops it.
+
+        listener_for(source):
+            Returns a VideoThread frame listener that feeds this stage under the name `source`.
+
+        results(source):
+            Returns the latest detections of a feed as a VisionResult list for the overlay renderer.
+
+        stats():
+            Returns batch, cache, stride and latency counters.
+    """
+
+    def __init__(self, model_path, labels=None, score_threshold=0.5, latency_target=0.25,
+                 max_stride=10, change_threshold=4.0, num_threads=2):
+        """
+        Args:
+            model_path (str): Model file passed to load_detector().
+            labels (list[str] | None): Class names indexed by class id.
+            score_threshold (float): Detections below this score are discarded.
+            latency_target (float): Desired capture-to-result latency in seconds.
+            max_stride (int): Upper bound on the adaptive frame stride.
+            change_threshold (float): Mean absolute difference of the 16x16 grayscale signatures, in
+                                      gray levels, below which a frame counts as unchanged.
+            num_threads (int): CPU threads for the TFLite interpreter.
+        """
+        self.__model_path = model_path
+        self.__labels = labels or []
+        self.__score_threshold = score_threshold
+        self.__latency_target = latency_target
+        self.__max_stride = max_stride
+        self.__change_threshold = change_threshold
+        self.__num_threads = num_threads
+        self.__detector = None
+        self.__feeds = {}
+        self.__wake = threading.Event()
+        self.__run_flag = False
+        self.__thread = None
+        self.__stride = 1
+        self.__latency_ema = 0.0
+
+        self.__batches = 0
+        self.__inferred = 0
+        self.__cache_hits = 0
+        self.__infer_time = 0.0
+
+    def is_running(self):
+        return self.__run_flag
+
+    def start(self):
+        if self.__run_flag:
+            return True
+        if not os.path.exists(self.__model_path):
+            logger.error(f"Inference model not found: {self.__model_path}")
+            return False
+        try:
+            self.__detector = load_detector(self.__model_path, self.__num_threads)
+        except ImportError as e:
+            logger.error(f"Inference needs tensorflow or tflite_runtime: {e}")
+            return False
+        except Exception as e:
+            # A corrupt or incompatible model. This runs from a key press, where an exception aborts the app.
+            logger.error(f"Could not load inference model {self.__model_path}: {e}")
+            return False
+        self.__run_flag = True
+        self.__thread = threading.Thread(target=self.__work, name="inference", daemon=True)
+        self.__thread.start()
+        logger.info(f"Inference running with {self.__model_path}")
+        return True
+
+    def stop(self):
+        self.__run_flag = False
+        self.__wake.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def listener_for(self, source):
+        """
+        Returns a frame listener that feeds this stage.
+
+        Args:
+            source (str | int): Name of the feed; results are looked up under the same name.
+
+        Returns:
+            callable: A VideoThread frame listener.
+        """
+        feed = self.__feeds.setdefault(source, {
+            "frames": TripleBuffer(), "count": 0, "signature": None, "result": None
+        })
+
+        def listener(frame, captured_at):
+            feed["count"] += 1
+            if not self.__run_flag or feed["count"] % self.__stride:
+                return
+            feed["frames"].write(frame, captured_at)
+            self.__wake.set()
+        return listener
+
+    def results(self, source):
+        feed = self.__feeds.get(source)
+        if feed is None or feed["result"] is None:
+            return []
+        return [feed["result"]]
+
+    def stats(self):
+        return {
+            "batches": self.__batches,
+            "inferred": self.__inferred,
+            "frames_per_batch": self.__inferred / self.__batches if self.__batches else 0.0,
+            "cache_hits": self.__cache_hits,
+            "stride": self.__stride,
+            "latency_ms": self.__latency_ema * 1000,
+            "infer_ms_avg": self.__infer_time / self.__batches * 1000 if self.__batches else 0.0
+        }
+
+    def __work(self):
+        width, height = self.__detector.input_size
+        while self.__run_flag:
+            if not self.__wake.wait(timeout=0.5):
+                continue
+            self.__wake.clear()
+
+            batch_feeds = []
+            batch_images = []
+            for feed in self.__feeds.values():
+                newest = feed["frames"].read()
+                if newest is None:
+                    continue
+                frame, captured_at = newest
+                signature = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (SIGNATURE_SIZE, SIGNATURE_SIZE),
+                                       interpolation=cv2.INTER_AREA).astype(np.int16)
+                if (feed["result"] is not None and feed["signature"] is not None and
+                        np.abs(signature - feed["signature"]).mean() < self.__change_threshold):
+                    # Scene has not changed: keep the cached detections but mark them as current.
+                    feed["result"] = feed["result"]._replace(captured_at=captured_at)
+                    self.__cache_hits += 1
+                    continue
+                feed["signature"] = signature
+                image = cv2.cvtColor(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+                batch_feeds.append((feed, captured_at, (frame.shape[1], frame.shape[0])))
+                batch_images.append(image)
+
+            if not batch_images:
+                continue
+            start = time.perf_counter()
+            try:
+                detections = self.__detector.detect(np.stack(batch_images))
+            except Exception as e:
+                logger.error(f"Inference failed: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            self.__batches += 1
+            self.__inferred += len(batch_images)
+            self.__infer_time += elapsed
+
+            now = time.monotonic()
+            for (feed, captured_at, frame_size), found in zip(batch_feeds, detections):
+                feed["result"] = VisionResult("detector", captured_at, frame_size,
+                                              self.__to_overlays(found, frame_size), self.__to_data(found), elapsed)
+                self.__latency_ema = 0.8 * self.__latency_ema + 0.2 * (now - captured_at)
+            self.__adapt_stride()
+
+    def __adapt_stride(self):
+        if self.__latency_ema > self.__latency_target and self.__stride < self.__max_stride:
+            self.__stride += 1
+        elif self.__latency_ema < 0.7 * self.__latency_target and self.__stride > 1:
+            self.__stride -= 1
+
+    def __label(self, class_id):
+        return self.__labels[class_id] if 0 <= class_id < len(self.__labels) else str(class_id)
+
+    def __to_overlays(self, detections, frame_size):
+        width, height = frame_size
+        overlays = []
+        for ymin, xmin, ymax, xmax, class_id, score in detections:
+            if score < self.__score_threshold:
+                continue
+            x, y = int(xmin * width), int(ymin * height)
+            overlays.append(Rect(x, y, int((xmax - xmin) * width), int((ymax - ymin) * height),
+                                 (102, 217, 239), f"{self.__label(class_id)} {score:.2f}"))
+        return overlays
+
+    def __to_data(self, detections):
+        return {"detections": [{"label": self.__label(class_id), "score": round(score, 3),
+                                "box": [round(float(v), 4) for v in (ymin, xmin, ymax, xmax)]}
+                               for ymin, xmin, ymax, xmax, class_id, score in detections
+                               if score >= self.__score_threshold]}
@@ -2,7 +2,6 @@ from PyQt5.QtCore import pyqtSignal, QThread, QTimer, pyqtSlot
 import pygame
 import logging
 import coloredlogs
-import time
 
 coloredlogs.install(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -11,24 +10,24 @@ GREEN_TEXT_CSS = "color: green"
 RED_TEXT_CSS = "color: red"
 RESTING_PULSEWIDTH = 1500.00
 PWM_DEADZONE_MIN = 0.1
-ARDUINO_SEND_TIMER_MIN = 0.5
+SCREENSHOT_BUTTON = 3
+BURST_BUTTON = 2
+RECORD_BUTTON = 7
+REPLAY_BUTTON = 6
+BURST_FRAMES = 10
 
 class JoystickThread(QThread):
     joystick_change_signal = pyqtSignal(dict)
 
-    def __init__(self, forward_backward_thrust_label, left_right_thrust_label, vertical_thrust_label, pitch_thrust_label, status_bar, arduino_thread, video_thread):
+    def __init__(self, status_bar, arduino_thread, video_thread):
         super().__init__()
         logger.info("Joystick thread initialized")
         self.__run_flag = True
         self.__joystick = None
-        self.__forward_backward_thrust_label = forward_backward_thrust_label
-        self.__left_right_thrust_label = left_right_thrust_label
-        self.__vertical_thrust_label = vertical_thrust_label
-        self.__pitch_thrust_label = pitch_thrust_label
         self.__connection_status_bar = status_bar
+        self.__showing_disconnected = False
         self.__arduino_thread = arduino_thread
         self.__video_thread = video_thread
-        self.__last_sent_time = time.time()
         self.claw_pw = 1500
         self.claw2_pw = 1500
 
@@ -64,6 +63,7 @@ class JoystickThread(QThread):
         self.__joystick.init()
         logger.info(f"Joystick found! Name: {self.__joystick.get_name()}")
         self.__connection_status_bar.setText(f"Joystick ({self.__joystick.get_name()}) connected")
+        self.__showing_disconnected = False
         self.__connection_status_bar.setStyleSheet(GREEN_TEXT_CSS)
 
     @pyqtSlot(dict)
@@ -74,8 +74,11 @@ class JoystickThread(QThread):
     def check_joystick_input(self):
         if self.__joystick is None or pygame.joystick.get_count() == 0:
             self.joystick_change_signal.emit({"connected": False})
-            self.__connection_status_bar.setText("Joystick disconnected")
-            self.__connection_status_bar.setStyleSheet(RED_TEXT_CSS)
+            if not self.__showing_disconnected:
+                # Only restyle on the transition; this runs every tick while no joystick is attached.
+                self.__showing_disconnected = True
+                self.__connection_status_bar.setText("Joystick disconnected")
+                self.__connection_status_bar.setStyleSheet(RED_TEXT_CSS)
             self._wait_for_joystick()
             return
 
@@ -92,9 +95,7 @@ class JoystickThread(QThread):
         left_bumper = self.__joystick.get_button(4)
         right_bumper = self.__joystick.get_button(5)
 
-        for event in pygame.event.get():
-            if event.type == pygame.JOYBUTTONDOWN and event.button == 3:
-                self.__video_thread.save_screenshot()
+        pressed_buttons = [event.button for event in pygame.event.get() if event.type == pygame.JOYBUTTONDOWN]
 
         axis_info = {
             "horizontal": horizontal_base,
@@ -104,7 +105,6 @@ class JoystickThread(QThread):
         }
 
         pulsewidths = self.__calculate_pulsewidth(axis_info)
-        self.__update_thrust_labels(pulsewidths)
 
         to_arduino = {
             "axisInfo": [
@@ -119,6 +119,17 @@ class JoystickThread(QThread):
             "claw_bumper": self.claw2_pw
         }
 
+        # Screenshots only hand the request to the video thread; encoding happens elsewhere.
+        for button in pressed_buttons:
+            if button == SCREENSHOT_BUTTON:
+                self.__video_thread.save_screenshot(self.__screenshot_metadata(to_arduino), 1)
+            elif button == BURST_BUTTON:
+                self.__video_thread.save_screenshot(self.__screenshot_metadata(to_arduino), BURST_FRAMES)
+            elif button == RECORD_BUTTON:
+                self.__video_thread.toggle_recording()
+            elif button == REPLAY_BUTTON:
+                self.__video_thread.save_replay()
+
         CLAW_STEP = 7
         if left_trigger > 0.1:
             self.claw_pw = min(self.claw_pw + CLAW_STEP, 2100)
@@ -129,10 +140,8 @@ class JoystickThread(QThread):
         elif right_bumper:
             self.claw2_pw = max(self.claw2_pw - CLAW_STEP, 1100)
 
-        current_time = time.time()
-        if current_time - self.__last_sent_time > ARDUINO_SEND_TIMER_MIN:
-            self.__arduino_thread.handle_data(to_arduino)
-            self.__last_sent_time = current_time
+        # The control scheduler sends the newest setpoint on its next tick.
+        self.__arduino_thread.set_setpoint(to_arduino)
 
         axis_labels = {
             "Axis 0 (Left Stick X - Yaw)": h_discrete,
@@ -148,6 +157,19 @@ class JoystickThread(QThread):
             "claw_bumper": self.claw2_pw
         })
 
+    def __screenshot_metadata(self, to_arduino):
+        return {
+            "thrusters": {
+                "leftthruster": to_arduino["axisInfo"][0],
+                "rightthruster": to_arduino["axisInfo"][1],
+                "topleftthruster": to_arduino["axisInfo"][2],
+                "toprightthruster": to_arduino["axisInfo"][3]
+            },
+            "claw_trigger": to_arduino["claw_trigger"],
+            "claw_bumper": to_arduino["claw_bumper"],
+            "telemetry": self.__arduino_thread.latest_telemetry
+        }
+
     def __calculate_pulsewidth(self, axis_info):
         horizontal_base = self.__map_to_pwm(axis_info.get("horizontal"))
         vertical_base = self.__map_to_pwm(axis_info.get("vertical"))
@@ -189,16 +211,3 @@ class JoystickThread(QThread):
         if val is None or abs(val) < 0.05:
             return 0
         return self.__map_to_pwm(val) - 1500
-
-    def __update_thrust_labels(self, pulsewidths):
-
-
-        self.__left_right_thrust_label.setText(
-            f"Top Left Thruster: {pulsewidths.get('topleftthruster')}\n\nLeft Thruster: {pulsewidths.get('leftthruster')}"
-        )
-        self.__vertical_thrust_label.setText(
-            f"Top Right Thruster: {pulsewidths.get('toprightthruster')}\n\nRight Thruster: {pulsewidths.get('rightthruster')}"
-        )
-        
-      
-
@@ -0,0 +1,118 @@
+import numpy as np
+import json
+import os
+import time
+import logging
+import coloredlogs
+from screenshotwriter import screenshot_name
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in order. Every stage after "capture" is measured as time since capture.
+STAGES = ("capture", "convert", "deliver", "paint")
+
+
+class LatencyTracer:
+    """
+    LatencyTracer records how old each frame is at every stage between capture and paint.
+
+    Each stage owns a preallocated ring of the most recent latencies and event times and is written by
+    exactly one thread, so recording a sample is two array stores and needs no lock or allocation.
+    Percentiles and rates are only computed when someone asks for a snapshot.
+
+    Methods:
+        record(stage, captured_at, now=None):
+            Records that a frame captured at `captured_at` reached `stage`.
+
+        snapshot():
+            Returns p50/p95/p99 latency in milliseconds and the event rate for every stage.
+
+        export(path="./rov_latency/"):
+            Writes a snapshot plus the raw sample rings to a JSON file and returns its path.
+    """
+
+    def __init__(self, window=1024):
+        """
+        Args:
+            window (int): Number of recent samples kept per stage.
+        """
+        self.__window = window
+        self.__latencies = {stage: np.zeros(window) for stage in STAGES}
+        self.__times = {stage: np.zeros(window) for stage in STAGES}
+        self.__counts = dict.fromkeys(STAGES, 0)
+
+    def record(self, stage, captured_at, now=None):
+        """
+        Records that a frame reached `stage`.
+
+        Args:
+            stage (str): One of STAGES.
+            captured_at (float): time.monotonic() capture time of the frame.
+            now (float | None): time.monotonic() time the stage was reached. Defaults to now.
+        """
+        if now is None:
+            now = time.monotonic()
+        index = self.__counts[stage] % self.__window
+        self.__latencies[stage][index] = now - captured_at
+        self.__times[stage][index] = now
+        self.__counts[stage] += 1
+
+    def snapshot(self):
+        """
+        Returns the current latency statistics.
+
+        Returns:
+            dict: For every stage, the number of frames seen, p50/p95/p99 latency since capture in
+                  milliseconds, and frames per second over the samples held.
+        """
+        result = {}
+        for stage in STAGES:
+            count = min(self.__counts[stage], self.__window)
+            if count == 0:
+                result[stage] = {"frames": 0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "fps": 0.0}
+                continue
+            latencies = self.__latencies[stage][:count]
+            times = self.__times[stage][:count]
+            p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) * 1000
+            span = times.max() - times.min()
+            result[stage] = {
+                "frames": self.__counts[stage],
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "fps": (count - 1) / span if span > 0 else 0.0
+            }
+        return result
+
+    def format_overlay(self):
+        """
+        Returns the snapshot as a few lines of text for an on-screen overlay.
+        """
+        lines = []
+        for stage, stats in self.snapshot().items():
+            lines.append(f"{stage:<8} {stats['fps']:5.1f} fps  p50 {stats['p50_ms']:6.1f}  "
+                         f"p95 {stats['p95_ms']:6.1f}  p99 {stats['p99_ms']:6.1f} ms")
+        return "\n".join(lines)
+
+    def export(self, path="./rov_latency/"):
+        """
+        Writes the current statistics and raw samples to a JSON file.
+
+        Args:
+            path (str): Directory the file is written to. Created if it does not exist.
+
+        Returns:
+            str: The path of the written file.
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        full_path = os.path.join(path, screenshot_name("latency_") + ".json")
+        samples = {}
+        for stage in STAGES:
+            count = min(self.__counts[stage], self.__window)
+            samples[stage] = (self.__latencies[stage][:count] * 1000).round(3).tolist()
+        with open(full_path, "w") as f:
+            json.dump({"summary": self.snapshot(), "samples_ms": samples}, f)
+        logger.info(f"Latency trace saved: {full_path}")
+        return full_path
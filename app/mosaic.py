@@ -0,0 +1,309 @@
+import cv2
+import numpy as np
+import threading
+import time
+import os
+from collections import deque, namedtuple
+from framemailbox import TripleBuffer
+from screenshotwriter import screenshot_name
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Frames are downscaled to this width before features are extracted and they are composited.
+MOSAIC_WORK_WIDTH = 640
+# New frames are matched against the features of this many most recently placed tiles.
+MATCH_TILES = 4
+# Lowe's ratio test threshold and the fewest RANSAC inliers a placement needs.
+MATCH_RATIO = 0.75
+MIN_INLIERS = 20
+# A frame whose center moved less than this fraction of its width since the last tile adds nothing new.
+MIN_MOTION = 0.15
+# A placement that scales the tile by more than this factor either way is treated as a bad match.
+MAX_SCALE_CHANGE = 2.0
+# The canvas stops growing beyond this many pixels; tiles that would exceed it are rejected.
+MAX_CANVAS_PIXELS = 40_000_000
+# Size the preview is scaled down to fit in.
+PREVIEW_SIZE = (480, 270)
+
+# A frame placed on the canvas. `points` are its keypoints in canvas coordinates, computed once when placed.
+MosaicTile = namedtuple("MosaicTile", ["captured_at", "homography", "points", "descriptors"])
+
+
+class MosaicBuilder:
+    """
+    MosaicBuilder stitches a mosaic of the main feed while the ROV moves over a structure.
+
+    While running, submit(), registered as a VideoThread frame listener, copies one frame every `interval`
+    seconds into a triple buffer for the worker thread. The worker extracts ORB keypoints and descriptors
+    from each frame exactly once, matches them against the cached canvas-space features of the last few
+    placed tiles, and places the frame with a RANSAC homography. Each placed tile keeps its keypoints
+    already transformed into canvas coordinates, so later frames match against them without any re-detection
+    or re-projection. Only the region the new tile covers is warped into the canvas, which grows as needed,
+    and a downscaled preview is published after every tile.
+
+    Frames that barely moved since the last tile are skipped, and frames that cannot be placed reliably are
+    rejected rather than smeared into the mosaic.
+
+    Methods:
+        start() / stop():
+            Starts a new mosaic, or stops adding frames to the current one.
+
+        submit(frame, captured_at):
+            Frame listener feeding the worker.
+
+        preview():
+            Returns (sequence, preview image) for the latest state of the mosaic.
+
+        save(path="./rov_mosaics/"):
+            Writes the full-resolution mosaic on a background thread.
+
+        stats():
+            Returns tile and timing counters.
+    """
+
+    def __init__(self, interval=0.5, features=1500):
+        """
+        Args:
+            interval (float): Seconds between frames handed to the worker.
+            features (int): Most ORB keypoints extracted per frame.
+        """
+        self.__interval = interval
+        self.__orb = cv2.ORB_create(nfeatures=features)
+        self.__matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        self.__frames = TripleBuffer()
+        self.__frame_ready = threading.Event()
+        self.__next_due = 0.0
+        self.__run_flag = False
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.__reset()
+
+    def is_running(self):
+        return self.__run_flag
+
+    def start(self):
+        """
+        Starts a new mosaic, discarding the previous one.
+        """
+        if self.__run_flag:
+            return
+        self.__reset()
+        self.__run_flag = True
+        self.__thread = threading.Thread(target=self.__work, name="mosaic", daemon=True)
+        self.__thread.start()
+        logger.info("Mosaic started")
+
+    def stop(self):
+        """
+        Stops adding frames. The mosaic is kept for preview() and save().
+        """
+        self.__run_flag = False
+        self.__frame_ready.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        logger.info(f"Mosaic stopped: {self.stats()}")
+
+    def submit(self, frame, captured_at):
+        """
+        Frame listener. Copies a frame only once every `interval` seconds.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        if not self.__run_flag or captured_at < self.__next_due:
+            return
+        self.__next_due = captured_at + self.__interval
+        self.__frames.write(frame, captured_at)
+        self.__frame_ready.set()
+
+    def preview(self):
+        """
+        Returns:
+            tuple: (sequence, image). `sequence` changes whenever the preview does; `image` is a BGR array
+                   no larger than PREVIEW_SIZE, or None before the first tile.
+        """
+        with self.__lock:
+            return self.__preview_sequence, self.__preview
+
+    def save(self, path="./rov_mosaics/"):
+        """
+        Writes the current mosaic as a PNG on a background thread.
+
+        Args:
+            path (str): Directory the mosaic is written to. Created if it does not exist.
+        """
+        with self.__lock:
+            if self.__canvas is None:
+                logger.warning("Mosaic is empty, nothing to save")
+                return
+            canvas = self.__canvas.copy()
+        threading.Thread(target=self.__write, args=(canvas, path), name="mosaic-save", daemon=True).start()
+
+    def stats(self):
+        placed = len(self.__tiles)
+        return {
+            "tiles": placed,
+            "skipped": self.__skipped,
+            "rejected": self.__rejected,
+            "canvas": None if self.__canvas is None else (self.__canvas.shape[1], self.__canvas.shape[0]),
+            "features_ms_avg": self.__feature_time / self.__frames_seen * 1000 if self.__frames_seen else 0.0,
+            "place_ms_avg": self.__place_time / placed * 1000 if placed else 0.0
+        }
+
+    def __reset(self):
+        with self.__lock:
+            self.__tiles = []
+            self.__recent = deque(maxlen=MATCH_TILES)
+            self.__canvas = None
+            # Canvas coordinates of canvas pixel (0, 0); tiles are placed relative to the first one.
+            self.__origin = np.zeros(2)
+            self.__preview = None
+            self.__preview_sequence = 0
+        self.__skipped = 0
+        self.__rejected = 0
+        self.__frames_seen = 0
+        self.__feature_time = 0.0
+        self.__place_time = 0.0
+
+    def __work(self):
+        while self.__run_flag:
+            if not self.__frame_ready.wait(timeout=0.5):
+                continue
+            self.__frame_ready.clear()
+            newest = self.__frames.read()
+            if newest is None:
+                continue
+            frame, captured_at = newest
+            try:
+                self.__add(frame, captured_at)
+            except Exception as e:
+                logger.error(f"Mosaic failed to add a frame: {e}")
+
+    def __add(self, frame, captured_at):
+        scale = MOSAIC_WORK_WIDTH / frame.shape[1]
+        if scale < 1:
+            tile = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            tile = frame.copy()
+
+        start = time.perf_counter()
+        keypoints, descriptors = self.__orb.detectAndCompute(cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY), None)
+        self.__feature_time += time.perf_counter() - start
+        self.__frames_seen += 1
+        if descriptors is None or len(keypoints) < MIN_INLIERS:
+            self.__rejected += 1
+            return
+        points = np.float32([kp.pt for kp in keypoints])
+
+        start = time.perf_counter()
+        if not self.__tiles:
+            homography = np.eye(3)
+        else:
+            homography = self.__locate(points, descriptors, tile.shape)
+            if homography is None:
+                return
+        if not self.__composite(tile, homography):
+            self.__rejected += 1
+            return
+        placed = MosaicTile(captured_at, homography,
+                            cv2.perspectiveTransform(points.reshape(-1, 1, 2), homography).reshape(-1, 2), descriptors)
+        self.__tiles.append(placed)
+        self.__recent.append(placed)
+        self.__place_time += time.perf_counter() - start
+        self.__publish_preview()
+
+    def __locate(self, points, descriptors, shape):
+        # Match against the cached canvas-space features of the most recent tiles only.
+        index_points = np.concatenate([t.points for t in self.__recent])
+        index_descriptors = np.concatenate([t.descriptors for t in self.__recent])
+        pairs = self.__matcher.knnMatch(descriptors, index_descriptors, k=2)
+        good = [p[0] for p in pairs if len(p) == 2 and p[0].distance < MATCH_RATIO * p[1].distance]
+        if len(good) < MIN_INLIERS:
+            self.__rejected += 1
+            return None
+        source = points[[m.queryIdx for m in good]]
+        target = index_points[[m.trainIdx for m in good]]
+        homography, inliers = cv2.findHomography(source, target, cv2.RANSAC, 4.0)
+        if homography is None or int(inliers.sum()) < MIN_INLIERS:
+            self.__rejected += 1
+            return None
+        determinant = np.linalg.det(homography[:2, :2])
+        if not 1 / MAX_SCALE_CHANGE ** 2 < determinant < MAX_SCALE_CHANGE ** 2:
+            self.__rejected += 1
+            return None
+
+        height, width = shape[:2]
+        center = np.float32([[[width / 2, height / 2]]])
+        moved = np.linalg.norm(cv2.perspectiveTransform(center, homography) -
+                               cv2.perspectiveTransform(center, self.__recent[-1].homography))
+        if moved < MIN_MOTION * width:
+            self.__skipped += 1
+            return None
+        return homography
+
+    def __composite(self, tile, homography):
+        height, width = tile.shape[:2]
+        corners = cv2.perspectiveTransform(np.float32([[[0, 0]], [[width, 0]], [[width, height]], [[0, height]]]),
+                                           homography).reshape(-1, 2)
+        low = np.floor(corners.min(axis=0))
+        high = np.ceil(corners.max(axis=0))
+        if not self.__grow(low, high):
+            return False
+
+        # Warp only the bounding box the tile covers, then let the newest tile win where they overlap.
+        x, y = (low - self.__origin).astype(int)
+        box_w, box_h = (high - low).astype(int)
+        shift = np.array([[1, 0, -low[0]], [0, 1, -low[1]], [0, 0, 1]])
+        warp = shift @ homography
+        warped = cv2.warpPerspective(tile, warp, (box_w, box_h), flags=cv2.INTER_LINEAR)
+        mask = cv2.warpPerspective(np.full((height, width), 255, np.uint8), warp, (box_w, box_h), flags=cv2.INTER_NEAREST)
+        # Shrink the mask so the warped tile's interpolated border does not leave seams.
+        mask = cv2.erode(mask, np.ones((3, 3), np.uint8)) > 0
+        with self.__lock:
+            self.__canvas[y:y + box_h, x:x + box_w][mask] = warped[mask]
+        return True
+
+    def __grow(self, low, high):
+        if self.__canvas is None:
+            new_low, new_high = low, high
+        else:
+            new_low = np.minimum(low, self.__origin)
+            new_high = np.maximum(high, self.__origin + (self.__canvas.shape[1], self.__canvas.shape[0]))
+        new_w, new_h = (new_high - new_low).astype(int)
+        if new_w * new_h > MAX_CANVAS_PIXELS:
+            return False
+        if self.__canvas is not None and (new_w, new_h) == (self.__canvas.shape[1], self.__canvas.shape[0]):
+            return True
+        canvas = np.zeros((new_h, new_w, 3), np.uint8)
+        if self.__canvas is not None:
+            x, y = (self.__origin - new_low).astype(int)
+            old_h, old_w = self.__canvas.shape[:2]
+            canvas[y:y + old_h, x:x + old_w] = self.__canvas
+        with self.__lock:
+            self.__canvas = canvas
+            self.__origin = new_low
+        return True
+
+    def __publish_preview(self):
+        height, width = self.__canvas.shape[:2]
+        scale = min(PREVIEW_SIZE[0] / width, PREVIEW_SIZE[1] / height, 1.0)
+        preview = cv2.resize(self.__canvas, (max(1, round(width * scale)), max(1, round(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        with self.__lock:
+            self.__preview = preview
+            self.__preview_sequence += 1
+
+    def __write(self, canvas, path):
+        try:
+            if not os.path.exists(path):
+                os.makedirs(path, exist_ok=True)
+            full_path = os.path.join(path, screenshot_name("mosaic_") + ".png")
+            cv2.imwrite(full_path, canvas)
+            logger.info(f"Mosaic saved: {full_path} ({canvas.shape[1]}x{canvas.shape[0]})")
+        except Exception as e:
+            logger.error(f"Error saving mosaic: {e}")
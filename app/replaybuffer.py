@@ -0,0 +1,174 @@
+import cv2
+import numpy as np
+from PyQt5.QtCore import QThread
+from collections import deque
+from queue import Queue, Empty
+import os
+import threading
+import time
+import logging
+import coloredlogs
+from screenshotwriter import screenshot_name
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Encoder parameters for the supported in-memory codecs.
+CODEC_PARAMS = {
+    "jpg": cv2.IMWRITE_JPEG_QUALITY,
+    "webp": cv2.IMWRITE_WEBP_QUALITY
+}
+
+
+class ReplayBuffer(QThread):
+    """
+    ReplayBuffer keeps the last few seconds of video in memory, compressed, so a missed moment can be saved
+    after the fact.
+
+    submit(), registered as a VideoThread frame listener, copies frames into a handful of preallocated
+    buffers; this thread compresses them and appends them to a ring that is trimmed to both a duration and
+    a size cap, so memory use is bounded no matter how well the frames compress. dump() writes the ring to
+    a video file on a separate thread without touching capture or compression.
+
+    Methods:
+        start_buffering() / stop_buffering():
+            Starts or stops the compressor thread.
+
+        submit(frame, captured_at):
+            Frame listener that queues a frame for compression, or drops it if the compressor is behind.
+
+        dump(path="./rov_replays/"):
+            Writes the current contents of the ring to disk in the background.
+
+        stats():
+            Returns the number of frames, seconds and megabytes held, and how many frames were dropped.
+    """
+
+    def __init__(self, max_seconds=30, max_mb=128, codec="jpg", quality=80, queue_size=4):
+        """
+        Args:
+            max_seconds (float): Frames older than this, relative to the newest frame, are discarded.
+            max_mb (float): Upper bound on the compressed bytes held.
+            codec (str): In-memory image codec, one of CODEC_PARAMS.
+            quality (int): Codec quality, 0-100.
+            queue_size (int): Number of frames that may wait for the compressor before new frames are dropped.
+        """
+        super().__init__()
+        if codec not in CODEC_PARAMS:
+            raise ValueError(f"Unsupported replay codec: {codec}")
+        self.__max_seconds = max_seconds
+        self.__max_bytes = int(max_mb * 1024 * 1024)
+        self.__extension = "." + codec
+        self.__encode_params = [CODEC_PARAMS[codec], quality]
+        self.__queue_size = queue_size
+        # Unbounded: the free list is what limits it, and after a size change it briefly holds buffers of both sizes.
+        self.__pending = Queue()
+        self.__free = Queue()
+        self.__shape = None
+        self.__ring = deque()
+        self.__ring_bytes = 0
+        self.__lock = threading.Lock()
+        self.__run_flag = False
+        self.dropped = 0
+
+    def start_buffering(self):
+        if self.__run_flag:
+            return
+        self.__run_flag = True
+        self.start()
+
+    def stop_buffering(self):
+        self.__run_flag = False
+        self.wait()
+
+    def submit(self, frame, captured_at):
+        """
+        Queues a copy of a frame for compression. Never blocks.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        if not self.__run_flag:
+            return
+        if frame.shape != self.__shape:
+            self.__shape = frame.shape
+            free = Queue()
+            for _ in range(self.__queue_size):
+                free.put(np.empty(frame.shape, dtype=frame.dtype))
+            self.__free = free
+        try:
+            buffer = self.__free.get_nowait()
+        except Empty:
+            self.dropped += 1
+            return
+        np.copyto(buffer, frame)
+        self.__pending.put_nowait((buffer, captured_at))
+
+    def run(self):
+        while self.__run_flag:
+            try:
+                buffer, captured_at = self.__pending.get(timeout=0.1)
+            except Empty:
+                continue
+            ok, encoded = cv2.imencode(self.__extension, buffer, self.__encode_params)
+            if buffer.shape == self.__shape:
+                self.__free.put(buffer)
+            if not ok:
+                continue
+
+            with self.__lock:
+                self.__ring.append((captured_at, encoded))
+                self.__ring_bytes += encoded.nbytes
+                while self.__ring and (self.__ring_bytes > self.__max_bytes or
+                                       captured_at - self.__ring[0][0] > self.__max_seconds):
+                    _, oldest = self.__ring.popleft()
+                    self.__ring_bytes -= oldest.nbytes
+
+    def dump(self, path="./rov_replays/"):
+        """
+        Writes the frames currently held to a video file on a background thread.
+
+        Args:
+            path (str): Directory the replay is written to. Created if it does not exist.
+        """
+        with self.__lock:
+            frames = list(self.__ring)
+        if not frames:
+            logger.warning("Replay buffer is empty, nothing to save")
+            return
+        threading.Thread(target=self.__write, args=(frames, path), name="replay-dump", daemon=True).start()
+
+    def stats(self):
+        with self.__lock:
+            seconds = self.__ring[-1][0] - self.__ring[0][0] if self.__ring else 0.0
+            return {
+                "frames": len(self.__ring),
+                "seconds": seconds,
+                "mb": self.__ring_bytes / (1024 * 1024),
+                "dropped": self.dropped
+            }
+
+    def __write(self, frames, path):
+        try:
+            if not os.path.exists(path):
+                os.makedirs(path, exist_ok=True)
+            full_path = os.path.join(path, screenshot_name("replay_") + ".mp4")
+            duration = frames[-1][0] - frames[0][0]
+            fps = (len(frames) - 1) / duration if duration > 0 else 30.0
+            start = time.perf_counter()
+            writer = None
+            for _, encoded in frames:
+                image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+                if writer is None:
+                    height, width = image.shape[:2]
+                    writer = cv2.VideoWriter(full_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+                elif image.shape[:2] != (height, width):
+                    # The main camera changed during the replay window; keep the video a single size.
+                    image = cv2.resize(image, (width, height))
+                writer.write(image)
+            writer.release()
+            logger.info(f"Replay saved: {full_path} ({len(frames)} frames, {duration:.1f} s, "
+                        f"{time.perf_counter() - start:.1f} s to write)")
+        except Exception as e:
+            logger.error(f"Error saving replay: {e}")
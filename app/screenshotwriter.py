@@ -0,0 +1,147 @@
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from queue import Queue, Empty
+import itertools
+import json
+import os
+import threading
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+_sequence = itertools.count(1)
+
+
+def screenshot_name(prefix=""):
+    """
+    Returns a collision-free file stem made of the wall-clock time to the microsecond and a process-wide
+    sequence number, e.g. "20250412-153012-123456_0007".
+    """
+    return f"{prefix}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{next(_sequence):04d}"
+
+
+class ScreenshotWriter:
+    """
+    ScreenshotWriter saves frames as JPEGs with a JSON metadata sidecar, off the calling thread.
+
+    request() only records how many frames are wanted and the metadata to store with them, so the control
+    loop pays nothing but an attribute write. submit(), registered as a VideoThread frame listener, then
+    copies the next frames into preallocated buffers on the capture thread and hands them to a small pool
+    of encoder threads. A burst of N frames therefore captures N consecutive frames at the full frame rate.
+    When every buffer is still being encoded, frames are dropped and counted.
+
+    Methods:
+        request(metadata=None, count=1):
+            Asks for the next `count` captured frames to be saved with `metadata`.
+
+        submit(frame, captured_at):
+            Frame listener that takes the requested frames.
+
+        stats():
+            Returns counters for saved and dropped screenshots.
+
+        shutdown():
+            Waits for pending screenshots to be written.
+    """
+
+    def __init__(self, path="./rov_images/", quality=95, workers=2, buffers=8):
+        """
+        Args:
+            path (str): Directory screenshots are written to. Created if it does not exist.
+            quality (int): JPEG quality, 0-100.
+            workers (int): Number of encoder threads.
+            buffers (int): Number of frames that may wait for an encoder at once.
+        """
+        self.__path = path
+        self.__quality = quality
+        self.__buffer_count = buffers
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screenshot")
+        self.__free = Queue()
+        self.__shape = None
+        self.__lock = threading.Lock()
+        self.__remaining = 0
+        self.__count = 0
+        self.__metadata = None
+        self.__burst = None
+        self.saved = 0
+        self.dropped = 0
+
+    def request(self, metadata=None, count=1):
+        """
+        Asks for the next `count` captured frames to be saved. Returns immediately.
+
+        Args:
+            metadata (dict | None): JSON-serializable data written next to every frame of this request.
+            count (int): Number of consecutive frames to save.
+        """
+        with self.__lock:
+            self.__metadata = metadata or {}
+            self.__burst = screenshot_name()
+            self.__remaining = count
+            self.__count = count
+
+    def submit(self, frame, captured_at):
+        """
+        Frame listener. Copies the frame into a free buffer and queues it for encoding if a request is pending.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        if not self.__remaining:
+            return
+        with self.__lock:
+            if not self.__remaining:
+                return
+            index = self.__count - self.__remaining
+            self.__remaining -= 1
+            metadata = self.__metadata
+            burst = self.__burst
+
+        if frame.shape != self.__shape:
+            self.__shape = frame.shape
+            free = Queue()
+            for _ in range(self.__buffer_count):
+                free.put(np.empty(frame.shape, dtype=frame.dtype))
+            self.__free = free
+        try:
+            buffer = self.__free.get_nowait()
+        except Empty:
+            self.dropped += 1
+            logger.warning("Screenshot dropped, encoders are busy")
+            return
+        np.copyto(buffer, frame)
+        self.__executor.submit(self.__write, buffer, captured_at, metadata, burst, index)
+
+    def stats(self):
+        return {"saved": self.saved, "dropped": self.dropped, "pending": self.__remaining}
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=True)
+
+    def __write(self, buffer, captured_at, metadata, burst, index):
+        try:
+            if not os.path.exists(self.__path):
+                os.makedirs(self.__path, exist_ok=True)
+            stem = os.path.join(self.__path, screenshot_name())
+            cv2.imwrite(stem + ".jpg", buffer, [cv2.IMWRITE_JPEG_QUALITY, self.__quality])
+            sidecar = {
+                "burst": burst,
+                "burst_index": index,
+                "captured_at": captured_at,
+                "saved_at": datetime.now().isoformat(),
+                **metadata
+            }
+            with open(stem + ".json", "w") as f:
+                json.dump(sidecar, f, indent=2)
+            self.saved += 1
+            logger.info(f"Screenshot saved: {stem}.jpg")
+        except Exception as e:
+            logger.error(f"Error saving screenshot: {e}")
+        finally:
+            if buffer.shape == self.__shape:
+                self.__free.put(buffer)
@@ -0,0 +1,177 @@
+# Measures commands per second and round-trip time over the serial link at every supported baud rate.
+# Without --port it runs against FirmwareSimulator on a pty, so it works with no board connected.
+#
+#   python3 ./serialbench.py --seconds 3
+#   python3 ./serialbench.py --max-stable-baud 250000
+#   python3 ./serialbench.py --port /dev/ttyACM0
+#
+# It ends by timing the firmware's heartbeat failsafe: the host goes silent after a thrust command, and the
+# time until the firmware reports the link lost is the detection time.
+import argparse
+import statistics
+import threading
+import time
+from queue import Queue, Empty
+import serial
+from serialprotocol import (FrameDecoder, CONTROL_REPLIES, MSG_ACK, MSG_JSON, MSG_LINK_EVENT, DEFAULT_BAUD,
+                            BAUD_RATES, encode_command, encode_control, encode_json)
+from seriallink import LinkControl, PING_TIMEOUT, HEARTBEAT_TIMEOUT
+from firmwaresim import FirmwareSimulator, BITS_PER_BYTE
+from arduinothread import READ_TIMEOUT, HANDSHAKE_TIMEOUT
+
+NEUTRAL_COMMAND = {"axisInfo": [1500, 1500, 1500, 1500], "left_trigger": 0.0, "right_trigger": 0.0,
+                   "claw_trigger": 1500, "claw_bumper": 1500}
+THRUST_COMMAND = dict(NEUTRAL_COMMAND, axisInfo=[1700, 1700, 1700, 1700])
+
+
+class BenchReader:
+    """
+    Reads the port on a background thread: control replies go to LinkControl, acks release a send window,
+    and link events are queued with their arrival time.
+    """
+
+    def __init__(self, port, window):
+        self.port = port
+        self.decoder = FrameDecoder(binary=True)
+        self.control = Queue()
+        self.window = threading.Semaphore(window)
+        self.acks = 0
+        self.link_events = Queue()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="bench-reader", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            for message in self.decoder.feed(self.port.read(self.port.in_waiting or 1)):
+                if message.type in CONTROL_REPLIES:
+                    self.control.put(message)
+                elif message.type == MSG_LINK_EVENT:
+                    self.link_events.put((time.monotonic(), message.fields))
+                elif message.type in (MSG_ACK, MSG_JSON):
+                    self.acks += 1
+                    self.window.release()
+
+
+def command_rate(port, reader, encoded, seconds, window):
+    # Keeps up to `window` commands in flight, like a writer that never waits for the previous ack.
+    reader.window = threading.Semaphore(window)
+    start_acks = reader.acks
+    sent = 0
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        reader.window.acquire(timeout=PING_TIMEOUT)
+        port.write(encoded)
+        sent += 1
+    # Let the commands still in flight arrive and be acked before counting.
+    drain_until = time.monotonic() + PING_TIMEOUT + window * len(encoded) * BITS_PER_BYTE / port.baudrate * 2
+    while reader.acks - start_acks < sent and time.monotonic() < drain_until:
+        time.sleep(0.01)
+    acked = reader.acks - start_acks
+    return acked / seconds, sent - acked
+
+
+def round_trips(link, count):
+    times = [link.ping() for _ in range(count)]
+    received = sorted(t * 1000 for t in times if t is not None)
+    if not received:
+        return None, None, count
+    return statistics.median(received), received[int(len(received) * 0.95) - 1 or 0], count - len(received)
+
+
+def failsafe_detection(port, reader, link, trials, timeout, simulator=None):
+    # Each trial commands thrust, goes silent and waits for the firmware to report the link lost; then one
+    # keepalive brings it back. Detection is measured from the last byte written to the event's arrival.
+    if link.set_watchdog(timeout) is None:
+        print("failsafe           firmware has no heartbeat watchdog")
+        return
+    detections, silences, neutral = [], [], 0
+    for seq in range(trials):
+        applied = simulator.commands if simulator is not None else 0
+        port.write(encode_command(THRUST_COMMAND, seq=seq))
+        port.flush()
+        silent_from = time.monotonic()
+        try:
+            while True:
+                received_at, event = reader.link_events.get(timeout=timeout * 4)
+                if event["link"] == "lost":
+                    break
+        except Empty:
+            print(f"failsafe           no link event within {timeout * 4:.1f} s")
+            return
+        detections.append((received_at - silent_from) * 1000)
+        silences.append(event["silent_ms"])
+        # Only counts if the thrust command got there first, so the watchdog is what stopped it.
+        if simulator is not None and simulator.commands > applied and simulator.outputs[:4] == (1500,) * 4:
+            neutral += 1
+        port.write(encode_control({}, seq=seq))
+        try:
+            reader.link_events.get(timeout=timeout * 4)
+        except Empty:
+            pass
+    neutral_text = f", thrusters neutral {neutral}/{trials}" if simulator is not None else ""
+    print(f"failsafe @ {timeout * 1000:.0f} ms  detected after {statistics.median(detections):6.1f} ms median, "
+          f"{max(detections):6.1f} ms max on the host; firmware saw {max(silences)} ms silence{neutral_text}")
+
+
+def report(label, rate, lost, rtt):
+    median, p95, rtt_lost = rtt
+    rtt_text = "no replies" if median is None else f"{median:6.2f} ms median, {p95:6.2f} ms p95"
+    print(f"{label:<18} {rate:8.1f} cmd/s  ({lost} unacked)   RTT {rtt_text}  ({rtt_lost} lost)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure serial link throughput and round-trip time per baud rate.")
+    parser.add_argument("--port", help="serial port of the board; omitted, a simulated firmware on a pty is used")
+    parser.add_argument("--seconds", type=float, default=2.0, help="duration of each throughput run")
+    parser.add_argument("--pings", type=int, default=50, help="round trips measured at each rate")
+    parser.add_argument("--window", type=int, default=4, help="commands in flight during throughput runs")
+    parser.add_argument("--max-stable-baud", type=int, help="simulator only: corrupt bytes above this rate")
+    parser.add_argument("--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT,
+                        help="watchdog timeout the failsafe is timed with, in seconds")
+    parser.add_argument("--failsafe-trials", type=int, default=5, help="times the failsafe is tripped")
+    args = parser.parse_args()
+
+    simulator = None
+    if args.port is None:
+        simulator = FirmwareSimulator(max_stable_baud=args.max_stable_baud)
+        simulator.start()
+        args.port = simulator.port
+        print(f"Using simulated firmware on {args.port}")
+
+    port = serial.Serial(port=args.port, baudrate=DEFAULT_BAUD, timeout=READ_TIMEOUT, write_timeout=0, dsrdtr=True)
+    reader = BenchReader(port, args.window)
+    link = LinkControl(port, reader.control, lambda: reader.decoder.errors)
+    try:
+        if link.hello(HANDSHAKE_TIMEOUT) is None:
+            print("Firmware did not answer the binary protocol handshake")
+            return
+
+        # Legacy JSON at the default rate, as the baseline.
+        reader.decoder.binary = False
+        rate, lost = command_rate(port, reader, encode_json(NEUTRAL_COMMAND), args.seconds, args.window)
+        reader.decoder.binary = True
+        report(f"json @ {DEFAULT_BAUD}", rate, lost, round_trips(link, args.pings))
+
+        encoded = encode_command(NEUTRAL_COMMAND)
+        for baud in (DEFAULT_BAUD, *BAUD_RATES):
+            if baud != link.baud and not link.switch_baud(baud):
+                print(f"binary @ {baud:<9} unstable, not committed")
+                continue
+            errors = reader.decoder.errors
+            rate, lost = command_rate(port, reader, encoded, args.seconds, args.window)
+            report(f"binary @ {baud}", rate, lost, round_trips(link, args.pings))
+            if reader.decoder.errors != errors:
+                print(f"{'':<18} {reader.decoder.errors - errors} CRC errors")
+        failsafe_detection(port, reader, link, args.failsafe_trials, args.heartbeat_timeout, simulator)
+        link.switch_baud(DEFAULT_BAUD)
+    finally:
+        reader.running = False
+        reader.thread.join()
+        port.close()
+        if simulator is not None:
+            simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import time
+from queue import Empty
+from serialprotocol import (MSG_HELLO_ACK, MSG_BAUD_ACK, MSG_PONG, MSG_WATCHDOG_ACK, BAUD_SWITCHING, BAUD_COMMITTED,
+                            DEFAULT_BAUD, BAUD_RATES, encode_hello, encode_set_baud, encode_baud_commit, encode_ping,
+                            encode_set_watchdog, FRAME_DELIMITER)
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# How long to wait for the reply to a PING or a baud-rate request.
+PING_TIMEOUT = 0.2
+BAUD_ACK_TIMEOUT = 0.3
+# Requests that change the firmware's settings are sent up to this many times before giving up.
+REQUEST_ATTEMPTS = 3
+# The firmware goes back to its previous rate if a switch is not committed within this time. Mirrored in
+# arduino.ino as BAUD_CONFIRM_TIMEOUT_MS.
+BAUD_CONFIRM_TIMEOUT = 1.0
+# Firmware that has received no valid frame for this long drops back to DEFAULT_BAUD, so a host that reconnects
+# finds it where every connection starts even if the board did not reset. Mirrored as BAUD_IDLE_TIMEOUT_MS.
+BAUD_IDLE_TIMEOUT = 2.0
+# The firmware stops the thrusters when it has heard nothing from the host for this long. The default, which
+# the host can change with set_watchdog(); mirrored as DEFAULT_HEARTBEAT_TIMEOUT_MS.
+HEARTBEAT_TIMEOUT = 0.5
+# Time for both ends to reprogram their UARTs after a switch is acknowledged.
+BAUD_SETTLE = 0.01
+# A new rate is only committed after this many consecutive PINGs come back intact with no CRC errors.
+BAUD_PROBE_PINGS = 20
+# Runtime fallback: this many CRC errors within CRC_ERROR_WINDOW seconds steps the link down one rate.
+CRC_ERROR_LIMIT = 5
+CRC_ERROR_WINDOW = 2.0
+
+
+class LinkControl:
+    """
+    LinkControl runs the link's own exchanges with the firmware over an open serial port: the version
+    handshake, PING round trips, the heartbeat watchdog and baud-rate switching.
+
+    It only writes. Replies are read by whoever reads the port, ArduinoReadWorker in the app, and handed
+    over through the `replies` queue. Every method blocks until answered or timed out, and must be called
+    from the one thread that writes to the port.
+
+    A baud-rate switch is a two-phase commit, so a rate that turns out to be unusable never strands the two
+    ends on different rates. The host asks for the rate with SET_BAUD, both sides switch once the firmware
+    acknowledges (or, the acknowledgement lost, once it answers a PING at the new rate), and the host probes
+    the new rate with BAUD_PROBE_PINGS round trips. Only if every one
+    comes back clean does it send BAUD_COMMIT. Without a commit the firmware reverts on its own after
+    BAUD_CONFIRM_TIMEOUT, and the host goes back at once and PINGs until the firmware answers. The
+    firmware pauses its heartbeat watchdog while a switch is pending, so a rejected rate never stops the
+    thrusters. If the two ends lose each other anyway, resync() finds the firmware again by sending HELLO
+    at every rate.
+
+    Attributes:
+        baud (int): The rate the link currently runs at.
+
+    Methods:
+        hello(timeout, cancelled=None):
+            Runs the version handshake.
+
+        ping():
+            Measures one round trip.
+
+        set_watchdog(timeout):
+            Sets the firmware's heartbeat timeout.
+
+        step_up(ceiling=None):
+            Switches to the fastest rate that proves stable.
+
+        step_down():
+            Switches to the next slower rate if it proves stable, after errors.
+
+        check_errors(before_step=None):
+            Steps down when CRC errors rise, called periodically by the writer.
+    """
+
+    def __init__(self, serial_port, replies, error_count):
+        """
+        Args:
+            serial_port (serial.Serial): The open port. Its baudrate is changed in place.
+            replies (Queue): Receives the control replies (HELLO_ACK, BAUD_ACK, PONG, WATCHDOG_ACK) the
+                             reader decodes.
+            error_count (callable): Returns the reader's running count of undecodable frames.
+        """
+        self.serial_port = serial_port
+        self.baud = serial_port.baudrate
+        self.__replies = replies
+        self.__error_count = error_count
+        self.__token = 0
+        self.__baud_answered = True
+        self.__error_window_start = time.monotonic()
+        self.__error_window_count = error_count()
+
+    def hello(self, timeout, cancelled=None):
+        """
+        Sends HELLO until it is answered.
+
+        Args:
+            timeout (float): Seconds to keep trying.
+            cancelled (callable | None): Returns True to give up early, e.g. when the app is closing.
+
+        Returns:
+            int | None: The protocol version the firmware agreed to, or None if it never answered.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not (cancelled and cancelled()):
+            self.__send(encode_hello())
+            reply = self.__await(MSG_HELLO_ACK, min(PING_TIMEOUT, max(0.0, deadline - time.monotonic())))
+            if reply is not None:
+                return reply["hello"]
+        return None
+
+    def ping(self):
+        """
+        Returns:
+            float | None: Round-trip time in seconds, or None if the PING or its PONG was lost.
+        """
+        self.__token = (self.__token + 1) & 0xFFFF
+        token = self.__token
+        sent_at = time.perf_counter()
+        self.__send(encode_ping(token))
+        if self.__await(MSG_PONG, PING_TIMEOUT, lambda fields: fields["pong"] == token) is None:
+            return None
+        return time.perf_counter() - sent_at
+
+    def set_watchdog(self, timeout):
+        """
+        Sets how long the firmware waits for a frame from the host before it stops the thrusters.
+
+        Args:
+            timeout (float): Seconds; 0 disables the watchdog.
+
+        Returns:
+            float | None: The timeout the firmware applied, or None if it never answered, as firmware from
+                          before the watchdog does not.
+        """
+        for _ in range(REQUEST_ATTEMPTS):
+            self.__send(encode_set_watchdog(round(timeout * 1000)))
+            reply = self.__await(MSG_WATCHDOG_ACK, PING_TIMEOUT)
+            if reply is not None:
+                return reply["watchdog_ms"] / 1000
+        return None
+
+    def switch_baud(self, rate):
+        """
+        Moves the link to `rate` if, and only if, it proves clean there.
+
+        Returns:
+            bool: Whether the link now runs at `rate`. On failure it is back at the previous rate.
+        """
+        previous = self.baud
+        # A round trip first, so no reply to an earlier command is still on its way at the old rate.
+        if not self.__any_ping():
+            return False
+        for _ in range(REQUEST_ATTEMPTS):
+            self.__send(encode_set_baud(rate))
+            reply = self.__await(MSG_BAUD_ACK, BAUD_ACK_TIMEOUT)
+            if reply is not None:
+                if reply["phase"] != BAUD_SWITCHING or reply["baud"] != rate:
+                    return False
+                self.__set_port_baud(rate)
+                time.sleep(BAUD_SETTLE)
+                break
+            # The request or its answer was lost. A noisy link, the reason to step down, loses the answer
+            # after the firmware switched, and then only the new rate reaches it.
+            if self.__answers_at(rate, previous):
+                break
+        else:
+            # Unsupported, or every request was lost.
+            self.__baud_answered = False
+            self.__rejoin()
+            return False
+
+        if self.__probe() and self.__commit(rate):
+            self.__error_window_start = time.monotonic()
+            self.__error_window_count = self.__error_count()
+            logger.info(f"Serial link switched from {previous} to {rate} baud")
+            return True
+
+        logger.warning(f"Serial link is not stable at {rate} baud, staying at {previous}")
+        self.__set_port_baud(previous)
+        if not self.__rejoin():
+            self.resync()
+        return False
+
+    def step_up(self, ceiling=None):
+        """
+        Tries the supported rates from the fastest down and stays at the first that proves stable.
+
+        Args:
+            ceiling (int | None): Fastest rate to try.
+
+        Returns:
+            int: The rate the link runs at afterwards.
+        """
+        for rate in sorted(BAUD_RATES, reverse=True):
+            if rate <= self.baud:
+                break
+            if ceiling is not None and rate > ceiling:
+                continue
+            if self.switch_baud(rate):
+                break
+            if not self.__baud_answered:
+                logger.info(f"Firmware does not answer baud-rate requests, staying at {self.baud} baud")
+                break
+        return self.baud
+
+    def step_down(self):
+        """
+        Tries the next slower rate only, so one step keeps the writer off the link for a single switch. If
+        errors go on, the next check_errors() steps down again.
+
+        Returns:
+            int: The rate the link runs at afterwards.
+        """
+        slower = [rate for rate in (DEFAULT_BAUD, *BAUD_RATES) if rate < self.baud]
+        if slower and not self.switch_baud(max(slower)):
+            logger.warning(f"Serial link could not step down from {self.baud} to {max(slower)} baud")
+        return self.baud
+
+    def check_errors(self, before_step=None):
+        """
+        Steps the link down one rate when CRC errors exceed CRC_ERROR_LIMIT within CRC_ERROR_WINDOW.
+
+        Args:
+            before_step (callable | None): Called right before stepping down. No setpoint goes out until the
+                                           step is over, while the PINGs keep the watchdog fed, so the writer
+                                           uses it to stop the thrusters rather than leave them on a command
+                                           the pilot cannot change.
+
+        Returns:
+            bool: Whether the link stepped down.
+        """
+        now = time.monotonic()
+        if now - self.__error_window_start < CRC_ERROR_WINDOW:
+            return False
+        errors = self.__error_count() - self.__error_window_count
+        self.__error_window_start = now
+        self.__error_window_count = self.__error_count()
+        if errors < CRC_ERROR_LIMIT or self.baud <= DEFAULT_BAUD:
+            return False
+        logger.warning(f"{errors} CRC errors in {CRC_ERROR_WINDOW:.0f}s at {self.baud} baud, stepping down")
+        if before_step is not None:
+            before_step()
+        previous = self.baud
+        self.step_down()
+        # Errors from probing a rate that was rejected say nothing about the one the link stayed at.
+        self.__error_window_start = time.monotonic()
+        self.__error_window_count = self.__error_count()
+        return self.baud < previous
+
+    def resync(self):
+        """
+        Finds the firmware after the two ends lost each other, by sending HELLO at every rate.
+
+        Returns:
+            int | None: The rate the firmware answered at, or None if it answered at none.
+        """
+        for rate in (DEFAULT_BAUD, *sorted(BAUD_RATES, reverse=True)):
+            self.__set_port_baud(rate)
+            time.sleep(BAUD_SETTLE)
+            if self.hello(PING_TIMEOUT * 2) is not None:
+                logger.info(f"Serial link resynchronized at {rate} baud")
+                return rate
+        logger.error("Serial link lost the firmware at every rate")
+        self.__set_port_baud(DEFAULT_BAUD)
+        return None
+
+    def __probe(self):
+        # The first round trip may lose its reply to bytes that straddled the switch; after that, none may.
+        if not self.__any_ping():
+            return False
+        errors = self.__error_count()
+        return all(self.ping() is not None for _ in range(BAUD_PROBE_PINGS)) and self.__error_count() == errors
+
+    def __rejoin(self):
+        # After a switch that was not committed: PINGs at the rate the host went back to until the firmware
+        # answers there. Its watchdog is paused until it reverts and restarted when it does, so the first PING
+        # it hears afterwards keeps the thrusters running, and the host returns as soon as the link is back
+        # rather than after a fixed wait.
+        deadline = time.monotonic() + BAUD_CONFIRM_TIMEOUT + 2 * PING_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.ping() is not None:
+                return True
+        return False
+
+    def __answers_at(self, rate, previous):
+        self.__set_port_baud(rate)
+        time.sleep(BAUD_SETTLE)
+        if self.ping() is not None:
+            return True
+        self.__set_port_baud(previous)
+        time.sleep(BAUD_SETTLE)
+        # The firmware heard that PING as garbage with no end, which a delimiter supplies before the next request.
+        self.__send(bytes((FRAME_DELIMITER,)))
+        return False
+
+    def __any_ping(self, attempts=3):
+        return any(self.ping() is not None for _ in range(attempts))
+
+    def __commit(self, rate):
+        deadline = time.monotonic() + BAUD_CONFIRM_TIMEOUT / 2
+        while time.monotonic() < deadline:
+            self.__send(encode_baud_commit(rate))
+            reply = self.__await(MSG_BAUD_ACK, PING_TIMEOUT)
+            if reply is not None and reply["phase"] == BAUD_COMMITTED and reply["baud"] == rate:
+                return True
+        return False
+
+    def __set_port_baud(self, rate):
+        self.serial_port.baudrate = rate
+        self.baud = rate
+
+    def __send(self, frame):
+        self.serial_port.write(frame)
+        self.serial_port.flush()
+
+    def __await(self, msg_type, timeout, accept=None):
+        # Replies are matched by type, and by `accept` where a stale one could be mistaken for the answer.
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                message = self.__replies.get(timeout=remaining)
+            except Empty:
+                return None
+            if message.type == msg_type and (accept is None or accept(message.fields)):
+                return message.fields
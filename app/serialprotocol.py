@@ -0,0 +1,368 @@
+import json
+import struct
+from collections import namedtuple
+
+# Highest binary protocol version this side speaks. The firmware answers HELLO with the version both use.
+# Version 2 adds a sequence number to COMMAND, UPDATE and KEEPALIVE, which the firmware echoes in the ACK.
+PROTOCOL_VERSION = 2
+# The link's own control messages do not depend on the version and are framed as version 1, so firmware of
+# any version reads them. The firmware frames every reply with the version of the frame it answers.
+CONTROL_VERSION = 1
+# Every frame is COBS-encoded and terminated by this byte, which COBS guarantees never occurs inside a frame.
+FRAME_DELIMITER = 0
+# Longest frame and JSON line accepted; anything longer is garbage and is discarded up to the next delimiter.
+MAX_FRAME_BYTES = 64
+MAX_LINE_BYTES = 512
+
+# Message types. Host to firmware below 0x80, firmware to host from 0x80. Firmware ignores types it does
+# not know, so new types are added without a version bump and the host treats silence as "unsupported".
+MSG_JSON = 0x00  # Not on the wire: marks a message that arrived as a legacy JSON line.
+MSG_HELLO = 0x01
+MSG_SET_BAUD = 0x02
+MSG_BAUD_COMMIT = 0x03
+MSG_PING = 0x04
+MSG_KEEPALIVE = 0x05
+MSG_SET_WATCHDOG = 0x06
+MSG_COMMAND = 0x10
+MSG_UPDATE = 0x11
+MSG_HELLO_ACK = 0x81
+MSG_BAUD_ACK = 0x82
+MSG_PONG = 0x84
+MSG_WATCHDOG_ACK = 0x86
+MSG_ACK = 0x90
+MSG_LINK_EVENT = 0x91
+# Replies that answer the link's own control messages rather than carry telemetry for the GUI.
+CONTROL_REPLIES = frozenset((MSG_HELLO_ACK, MSG_BAUD_ACK, MSG_PONG, MSG_WATCHDOG_ACK))
+
+# COMMAND payload: four thruster and two claw pulse widths in microseconds, and the two triggers in
+# thousandths, little-endian. 16 bytes against roughly 120 for the same command as JSON.
+COMMAND_FORMAT = struct.Struct("<4H2h2H")
+# UPDATE payload: a mask byte, then only the fields whose bit is set, in this order and with the same
+# encoding as in COMMAND. Bit 0 covers all four thrusters, since the JSON protocol sends them as one array.
+UPDATE_FIELDS = (("axisInfo", "<4H"), ("left_trigger", "<h"), ("right_trigger", "<h"), ("claw_trigger", "<H"),
+                 ("claw_bumper", "<H"))
+HELLO_FORMAT = struct.Struct("<B")
+HELLO_ACK_FORMAT = struct.Struct("<BB")
+ACK_FORMAT = struct.Struct("<B")
+ACK_STATUS_OK = 0
+# From version 2: the sequence number leading COMMAND, UPDATE and KEEPALIVE payloads, and the ACK that echoes it.
+SEQUENCE_FORMAT = struct.Struct("<H")
+SEQUENCED_ACK_FORMAT = struct.Struct("<BH")
+# SET_BAUD and BAUD_COMMIT carry the rate; BAUD_ACK echoes the rate and the phase it acknowledges.
+BAUD_FORMAT = struct.Struct("<I")
+BAUD_ACK_FORMAT = struct.Struct("<IB")
+BAUD_SWITCHING = 0
+BAUD_COMMITTED = 1
+BAUD_REJECTED = 2
+PING_FORMAT = struct.Struct("<H")
+# SET_WATCHDOG carries the heartbeat timeout in milliseconds, 0 to disable; WATCHDOG_ACK echoes the one applied.
+WATCHDOG_FORMAT = struct.Struct("<H")
+# LINK_EVENT: the firmware's watchdog tripped (LINK_LOST) or the host came back (LINK_RESTORED), with how long
+# the host had been silent in milliseconds.
+LINK_EVENT_FORMAT = struct.Struct("<BI")
+LINK_LOST = 0
+LINK_RESTORED = 1
+LINK_EVENTS = ("lost", "restored")  # Names of the events above, as reported to the GUI.
+
+# Every serial link starts at DEFAULT_BAUD; BAUD_RATES are the faster rates the host may switch to, all
+# exact or within 2% on the Mega's 16 MHz clock. Mirrored in arduino.ino.
+DEFAULT_BAUD = 9600
+BAUD_RATES = (57_600, 115_200, 250_000, 500_000, 1_000_000)
+
+# A decoded firmware message: its type and fields, already in the dict shape the JSON protocol uses.
+Message = namedtuple("Message", ["type", "fields"])
+
+
+class ProtocolError(ValueError):
+    """
+    Raised for a frame that cannot be decoded: bad COBS, bad CRC, unknown version or type, wrong length.
+    """
+
+
+def _crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16(data):
+    """
+    CRC-16/CCITT-FALSE (polynomial 0x1021, initial value 0xFFFF), the same CRC the firmware computes.
+    """
+    crc = 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def cobs_encode(data):
+    """
+    Consistent Overhead Byte Stuffing: removes every zero byte from `data` at a cost of one byte per 254.
+    """
+    out = bytearray([0])
+    code_index = 0
+    code = 1
+    for byte in data:
+        if byte:
+            out.append(byte)
+            code += 1
+        if not byte or code == 0xFF:
+            out[code_index] = code
+            code_index = len(out)
+            out.append(0)
+            code = 1
+    out[code_index] = code
+    return bytes(out)
+
+
+def cobs_decode(data):
+    """
+    Reverses cobs_encode(). `data` excludes the frame delimiter.
+
+    Raises:
+        ProtocolError: If `data` is not valid COBS.
+    """
+    out = bytearray()
+    index = 0
+    while index < len(data):
+        code = data[index]
+        if code == 0 or index + code > len(data):
+            raise ProtocolError("bad COBS encoding")
+        out += data[index + 1:index + code]
+        index += code
+        if code != 0xFF and index < len(data):
+            out.append(0)
+    return bytes(out)
+
+
+def encode_frame(msg_type, payload=b"", version=PROTOCOL_VERSION):
+    """
+    Builds a complete frame: version, type, payload and CRC, COBS-encoded and delimited.
+    """
+    body = bytes((version, msg_type)) + payload
+    body += struct.pack("<H", crc16(body))
+    return cobs_encode(body) + bytes((FRAME_DELIMITER,))
+
+
+def encode_hello():
+    return encode_frame(MSG_HELLO, HELLO_FORMAT.pack(PROTOCOL_VERSION), CONTROL_VERSION)
+
+
+def encode_set_baud(baud):
+    return encode_frame(MSG_SET_BAUD, BAUD_FORMAT.pack(baud), CONTROL_VERSION)
+
+
+def encode_baud_commit(baud):
+    return encode_frame(MSG_BAUD_COMMIT, BAUD_FORMAT.pack(baud), CONTROL_VERSION)
+
+
+def encode_ping(token):
+    return encode_frame(MSG_PING, PING_FORMAT.pack(token & 0xFFFF), CONTROL_VERSION)
+
+
+def encode_set_watchdog(timeout_ms):
+    return encode_frame(MSG_SET_WATCHDOG, WATCHDOG_FORMAT.pack(timeout_ms), CONTROL_VERSION)
+
+
+def _trigger(value):
+    return max(-32767, min(32767, round(value * 1000)))
+
+
+def _sequenced(payload, version, seq):
+    return SEQUENCE_FORMAT.pack(seq & 0xFFFF) + payload if version >= 2 else payload
+
+
+def encode_command(data, version=PROTOCOL_VERSION, seq=0):
+    """
+    Encodes a command dict, as built by JoystickThread for the JSON protocol, as a binary COMMAND frame.
+
+    Args:
+        data (dict): "axisInfo" with four thruster pulse widths, "left_trigger" and "right_trigger" in
+                     [-1, 1], and the "claw_trigger" and "claw_bumper" pulse widths.
+        version (int): Protocol version negotiated with the firmware.
+        seq (int): Sequence number the ACK will echo. Ignored before version 2.
+
+    Returns:
+        bytes: The delimited frame.
+    """
+    thrusters = [int(p) for p in data["axisInfo"]]
+    triggers = [_trigger(data.get(key, 0.0)) for key in ("left_trigger", "right_trigger")]
+    payload = COMMAND_FORMAT.pack(*thrusters, *triggers, int(data["claw_trigger"]), int(data["claw_bumper"]))
+    return encode_frame(MSG_COMMAND, _sequenced(payload, version, seq), version)
+
+
+def encode_update(data, version=PROTOCOL_VERSION, seq=0):
+    """
+    Encodes the fields of a command that changed as an UPDATE frame, leaving the others as they are.
+
+    Args:
+        data (dict): Any subset of the keys encode_command() takes.
+        version (int): Protocol version negotiated with the firmware.
+        seq (int): Sequence number the ACK will echo. Ignored before version 2.
+
+    Returns:
+        bytes: The delimited frame.
+    """
+    mask = 0
+    payload = bytearray(1)
+    for bit, (key, layout) in enumerate(UPDATE_FIELDS):
+        if key not in data:
+            continue
+        mask |= 1 << bit
+        value = data[key]
+        if key == "axisInfo":
+            payload += struct.pack(layout, *(int(p) for p in value))
+        elif key in ("left_trigger", "right_trigger"):
+            payload += struct.pack(layout, _trigger(value))
+        else:
+            payload += struct.pack(layout, int(value))
+    payload[0] = mask
+    return encode_frame(MSG_UPDATE, _sequenced(bytes(payload), version, seq), version)
+
+
+def encode_control(data, version=PROTOCOL_VERSION, seq=0):
+    """
+    Encodes what the control scheduler hands the writer: a full command, the fields that changed, or an
+    empty dict for a keepalive.
+    """
+    if not data:
+        return encode_frame(MSG_KEEPALIVE, _sequenced(b"", version, seq), version)
+    if all(key in data for key, _ in UPDATE_FIELDS):
+        return encode_command(data, version, seq)
+    return encode_update(data, version, seq)
+
+
+def encode_json(data):
+    """
+    Encodes a command for firmware that only speaks the JSON protocol.
+    """
+    return json.dumps(data).encode("utf-8") + b"\0"
+
+
+def split_frame(frame):
+    """
+    Checks one frame and splits it into its parts, whichever direction it travelled.
+
+    Args:
+        frame (bytes): The COBS-encoded frame without its delimiter.
+
+    Returns:
+        tuple: (version, message type, payload bytes).
+
+    Raises:
+        ProtocolError: If the frame is corrupt or its version is not spoken here.
+    """
+    body = cobs_decode(frame)
+    if len(body) < 4:
+        raise ProtocolError("frame too short")
+    if struct.unpack_from("<H", body, len(body) - 2)[0] != crc16(body[:-2]):
+        raise ProtocolError("CRC mismatch")
+    version, msg_type = body[0], body[1]
+    if not 1 <= version <= PROTOCOL_VERSION:
+        raise ProtocolError(f"unsupported protocol version {version}")
+    return version, msg_type, body[2:-2]
+
+
+def decode_frame(frame):
+    """
+    Decodes one frame received from the firmware.
+
+    Args:
+        frame (bytes): The COBS-encoded frame without its delimiter.
+
+    Returns:
+        Message: The message type and its fields.
+
+    Raises:
+        ProtocolError: If the frame is corrupt or not understood.
+    """
+    version, msg_type, payload = split_frame(frame)
+    try:
+        if msg_type == MSG_HELLO_ACK:
+            agreed, capabilities = HELLO_ACK_FORMAT.unpack(payload)
+            return Message(msg_type, {"hello": agreed, "capabilities": capabilities})
+        if msg_type == MSG_ACK:
+            if version >= 2:
+                status, seq = SEQUENCED_ACK_FORMAT.unpack(payload)
+            else:
+                (status,), seq = ACK_FORMAT.unpack(payload), None
+            fields = {"status": "OK" if status == ACK_STATUS_OK else f"ERROR {status}"}
+            if seq is not None:
+                fields["seq"] = seq
+            return Message(msg_type, fields)
+        if msg_type == MSG_BAUD_ACK:
+            baud, phase = BAUD_ACK_FORMAT.unpack(payload)
+            return Message(msg_type, {"baud": baud, "phase": phase})
+        if msg_type == MSG_PONG:
+            token, = PING_FORMAT.unpack(payload)
+            return Message(msg_type, {"pong": token})
+        if msg_type == MSG_WATCHDOG_ACK:
+            timeout_ms, = WATCHDOG_FORMAT.unpack(payload)
+            return Message(msg_type, {"watchdog_ms": timeout_ms})
+        if msg_type == MSG_LINK_EVENT:
+            event, silent_ms = LINK_EVENT_FORMAT.unpack(payload)
+            if event >= len(LINK_EVENTS):
+                raise ProtocolError(f"unknown link event {event}")
+            return Message(msg_type, {"link": LINK_EVENTS[event], "silent_ms": silent_ms})
+    except struct.error as e:
+        raise ProtocolError(f"bad payload for message type {msg_type:#04x}: {e}")
+    raise ProtocolError(f"unknown message type {msg_type:#04x}")
+
+
+class FrameDecoder:
+    """
+    Splits a received byte stream into messages.
+
+    In binary mode the stream is cut at every FRAME_DELIMITER and each piece decoded as a frame; in JSON
+    mode it is cut at newlines and each line parsed as JSON. Partial input is kept until the rest arrives.
+    Corrupt frames and oversized garbage are dropped and counted, never raised, so one bad byte only costs
+    the frame it landed in.
+
+    Attributes:
+        binary (bool): Whether the stream carries binary frames rather than JSON lines.
+        errors (int): Number of frames or lines that could not be decoded.
+    """
+
+    def __init__(self, binary=True):
+        self.binary = binary
+        self.errors = 0
+        self.__buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Args:
+            data (bytes): Newly received bytes.
+
+        Returns:
+            list[Message]: Every complete message in the order received. JSON lines have type MSG_JSON.
+        """
+        self.__buffer += data
+        delimiter, limit = (FRAME_DELIMITER, MAX_FRAME_BYTES) if self.binary else (ord("\n"), MAX_LINE_BYTES)
+        messages = []
+        while True:
+            end = self.__buffer.find(delimiter)
+            if end < 0:
+                if len(self.__buffer) > limit:
+                    # No delimiter in sight: this is noise, not a frame in progress.
+                    self.__buffer.clear()
+                    self.errors += 1
+                return messages
+            piece = bytes(self.__buffer[:end])
+            del self.__buffer[:end + 1]
+            try:
+                if len(piece) > limit:
+                    raise ProtocolError("frame too long")
+                if self.binary:
+                    if piece:
+                        messages.append(decode_frame(piece))
+                elif piece.strip():
+                    messages.append(Message(MSG_JSON, json.loads(piece.decode("utf-8"))))
+            except (ProtocolError, ValueError):
+                self.errors += 1
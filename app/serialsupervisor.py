@@ -0,0 +1,210 @@
+import platform
+import threading
+import time
+from collections import deque
+import numpy as np
+import serial.tools.list_ports as ports
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# USB IDs of the Mega 2560: both revisions of the genuine board, the arduino.org one, and the CH340 on clones.
+KNOWN_BOARDS = ((0x2341, 0x0010), (0x2341, 0x0042), (0x2A03, 0x0042), (0x1A86, 0x7523))
+# Fallback when no port carries a known USB ID, e.g. a clone with another USB chip.
+PORT_PREFIXES = {"Darwin": "/dev/cu.usb", "Linux": "/dev/ttyACM", "Windows": "COM"}
+# While connected, the ports are rescanned this often to notice the board going away.
+POLL_INTERVAL = 0.5
+# While the board is missing or fails to open, it is looked for again after this long, doubling up to the maximum.
+RECONNECT_BACKOFF_MIN = 0.25
+RECONNECT_BACKOFF_MAX = 2.0
+# Number of recent reconnects kept for the time-to-recover statistics.
+RECOVERY_HISTORY = 50
+
+# What link_state() reports for the current connection.
+LINK_CONNECTING = "connecting"
+LINK_UP = "up"
+LINK_LOST = "lost"
+
+
+def fingerprint(info):
+    """
+    Returns:
+        tuple: The USB vendor ID, product ID and serial number of a port, which identify the board behind it
+               whatever device path it was given this time.
+    """
+    return info.vid, info.pid, info.serial_number
+
+
+def find_board(port_infos, board=None, previous=None):
+    """
+    Args:
+        port_infos (list): ListPortInfo of every serial port, as returned by serial.tools.list_ports.comports().
+        board (dict | None): Any of "port", "vid", "pid" and "serial_number"; a port has to match all of
+                             them. None matches the known Mega boards by USB ID, then the platform's usual
+                             port name.
+        previous (tuple | None): Fingerprint of the board connected before, preferred over any other match.
+
+    Returns:
+        ListPortInfo | None: The port of the board, or None when it is not plugged in.
+    """
+    if board:
+        candidates = [info for info in port_infos
+                      if all(getattr(info, "device" if key == "port" else key) == value for key, value in board.items())]
+    else:
+        candidates = [info for info in port_infos if (info.vid, info.pid) in KNOWN_BOARDS]
+        if not candidates:
+            prefix = PORT_PREFIXES.get(platform.system())
+            candidates = [info for info in port_infos if prefix and prefix in info.device]
+    for info in candidates:
+        if previous is not None and fingerprint(info) == previous:
+            return info
+    return candidates[0] if candidates else None
+
+
+class SerialSupervisor:
+    """
+    SerialSupervisor finds the board, keeps it connected and reconnects it when it goes away.
+
+    The owner supplies three callables: `connect(device)` opens the port and starts its workers,
+    `disconnect()` stops them and closes the port, and `link_state()` reports whether the current connection
+    is still negotiating, up, or lost. The board is matched by USB ID or serial number rather than by
+    device path, which can change on every replug. While connected the supervisor rescans the ports every
+    POLL_INTERVAL; when the board's port disappears, or the owner reports the link lost (the board reset,
+    or the tether dropped while the port stayed), the connection is torn down and the board looked for
+    again with exponential backoff. It prefers the board it had before, by fingerprint, over any other
+    match.
+
+    Each reconnect records its time to recover, from the moment the loss was noticed until the new
+    connection reports the link up again.
+
+    Methods:
+        run():
+            The supervision loop; returns once stop() is called, after disconnecting.
+
+        stop():
+            Ends run().
+
+        stats():
+            Returns the connection state, reconnect counts and time-to-recover statistics.
+    """
+
+    def __init__(self, connect, disconnect, link_state, board=None, list_ports=ports.comports):
+        """
+        Args:
+            connect (callable): Opens the device path it is given and starts the workers; raises on failure.
+            disconnect (callable): Stops the workers and closes the port.
+            link_state (callable): Returns LINK_CONNECTING, LINK_UP or LINK_LOST for the current connection.
+            board (dict | None): Which board to connect to; see find_board().
+            list_ports (callable): Returns the ListPortInfo of every serial port. Tests pass their own to
+                                   offer pty pairs, which the system's enumeration does not list.
+        """
+        self.__connect = connect
+        self.__disconnect = disconnect
+        self.__link_state = link_state
+        self.__board = board
+        self.__list_ports = list_ports
+        self.__stopped = threading.Event()
+        self.__lock = threading.Lock()
+        self.__device = None
+        self.__fingerprint = None
+        self.__state = "searching"
+        self.__reported_missing = False
+        self.__lost_at = None
+        self.__lost_reason = None
+        self.__connects = 0
+        self.__disconnects = 0
+        self.__recoveries = deque(maxlen=RECOVERY_HISTORY)
+
+    def run(self):
+        backoff = RECONNECT_BACKOFF_MIN
+        while not self.__stopped.is_set():
+            if self.__device is None:
+                if self.__try_connect():
+                    backoff = RECONNECT_BACKOFF_MIN
+                else:
+                    self.__stopped.wait(backoff)
+                    backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+                continue
+            self.__stopped.wait(POLL_INTERVAL)
+            self.__supervise()
+        if self.__device is not None:
+            self.__disconnect()
+            self.__device = None
+
+    def stop(self):
+        self.__stopped.set()
+
+    def stats(self):
+        """
+        Returns:
+            dict: The state ("searching", "connecting", "up", "lost"), the device path, connections made, losses
+                  noticed, and the time to recover of the last and of recent reconnects, in seconds.
+        """
+        with self.__lock:
+            recoveries = np.array([seconds for _, seconds in self.__recoveries])
+            return {
+                "state": self.__state,
+                "port": self.__device,
+                "connects": self.__connects,
+                "disconnects": self.__disconnects,
+                "recoveries": list(self.__recoveries),
+                "recovery_s_last": float(recoveries[-1]) if len(recoveries) else None,
+                "recovery_s_avg": float(recoveries.mean()) if len(recoveries) else None,
+                "recovery_s_max": float(recoveries.max()) if len(recoveries) else None
+            }
+
+    def __scan(self):
+        try:
+            return list(self.__list_ports())
+        except Exception as e:
+            logger.error(f"Error listing serial ports: {e}")
+            return []
+
+    def __try_connect(self):
+        info = find_board(self.__scan(), self.__board, self.__fingerprint)
+        if info is None:
+            if not self.__reported_missing:
+                logger.critical("Arduino port not found! Ensure proper connection.")
+                self.__reported_missing = True
+            return False
+        try:
+            self.__connect(info.device)
+        except Exception as e:
+            logger.error(f"Error opening Arduino port {info.device}: {e}")
+            return False
+        with self.__lock:
+            self.__device = info.device
+            self.__fingerprint = fingerprint(info)
+            self.__state = LINK_CONNECTING
+            self.__connects += 1
+        self.__reported_missing = False
+        logger.info(f"Arduino connected on {info.device}")
+        return True
+
+    def __supervise(self):
+        state = self.__link_state()
+        now = time.monotonic()
+        with self.__lock:
+            self.__state = state
+            if state == LINK_UP and self.__lost_at is not None:
+                # The time to recover runs from the loss to the first connection that gets back up, across
+                # however many attempts it took.
+                seconds = now - self.__lost_at
+                self.__recoveries.append((self.__lost_reason, seconds))
+                self.__lost_at = None
+                logger.info(f"Arduino link recovered after {seconds:.2f} s ({self.__lost_reason})")
+        present = any(info.device == self.__device and fingerprint(info) == self.__fingerprint
+                      for info in self.__scan())
+        if present and state != LINK_LOST:
+            return
+        reason = "port removed" if not present else "link lost"
+        logger.warning(f"Arduino {reason} on {self.__device}, reconnecting")
+        self.__disconnect()
+        with self.__lock:
+            if self.__lost_at is None:
+                self.__lost_at, self.__lost_reason = now, reason
+            self.__device = None
+            self.__state = "searching"
+            self.__disconnects += 1
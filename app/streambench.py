@@ -0,0 +1,78 @@
+# Localhost load test for the stream server: capture rate with and without many (partly slow) clients.
+#
+#   python3 ./streambench.py --clients 50 --slow 10 --seconds 10
+import argparse
+import asyncio
+import re
+import time
+from videothread import VideoThread
+from capturesource import TestPatternSource
+from streamserver import StreamServer
+
+
+async def mjpeg_client(port, seconds, delay, counts, index):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET / HTTP/1.0\r\n\r\n")
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = int(re.search(rb"Content-Length: (\d+)", headers).group(1))
+        await reader.readexactly(length + 2)
+        counts[index] += 1
+        if delay:
+            await asyncio.sleep(delay)
+    writer.close()
+
+
+async def run_clients(port, clients, slow, seconds):
+    counts = [0] * clients
+    # The first `slow` clients read about two frames per second.
+    await asyncio.gather(*(mjpeg_client(port, seconds, 0.5 if i < slow else 0, counts, i) for i in range(clients)))
+    return counts
+
+
+def capture_rate(thread, seconds, work=None):
+    start_frames = thread.frame_stats()["frames"]
+    start = time.monotonic()
+    result = work() if work else time.sleep(seconds)
+    return (thread.frame_stats()["frames"] - start_frames) / (time.monotonic() - start), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the MJPEG stream server on localhost.")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=5, help="how many of the clients read slowly")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--fps", type=float, default=30, help="capture rate; 0 is unthrottled")
+    args = parser.parse_args()
+
+    thread = VideoThread(640, 480, source=TestPatternSource(1280, 720, args.fps))
+    server = StreamServer(host="127.0.0.1", http_port=args.port, ws_port=None, max_fps=args.fps)
+    thread.add_frame_listener(server.submit)
+    thread.start()
+    server.start_server()
+    time.sleep(1.0)
+
+    idle_rate, _ = capture_rate(thread, args.seconds)
+    loaded_rate, counts = capture_rate(
+        thread, args.seconds, lambda: asyncio.run(run_clients(args.port, args.clients, args.slow, args.seconds)))
+
+    server.stop_server()
+    thread.stop()
+
+    fast = counts[args.slow:]
+    slow = counts[:args.slow]
+    print(f"Capture without clients:  {idle_rate:.1f} fps")
+    print(f"Capture with {args.clients} clients: {loaded_rate:.1f} fps")
+    if fast:
+        print(f"Fast clients received:    {min(fast) / args.seconds:.1f}-{max(fast) / args.seconds:.1f} fps")
+    if slow:
+        print(f"Slow clients received:    {min(slow) / args.seconds:.1f}-{max(slow) / args.seconds:.1f} fps")
+    print(f"Server:                   {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
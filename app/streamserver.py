@@ -0,0 +1,266 @@
+import cv2
+import asyncio
+import threading
+import time
+from PyQt5.QtCore import QThread
+from framemailbox import TripleBuffer
+import logging
+import coloredlogs
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+MJPEG_BOUNDARY = b"frame"
+# Bytes a client's socket may have buffered before it counts as slow and frames are skipped for it.
+CLIENT_WRITE_LIMIT = 256 * 1024
+# Seconds clients get to finish on their own when the server stops.
+SHUTDOWN_TIMEOUT = 1.0
+
+
+class StreamServer(QThread):
+    """
+    StreamServer shares the main video feed with other stations over HTTP MJPEG and WebSocket.
+
+    submit(), registered as a VideoThread frame listener, does nothing unless a client is connected and the
+    configured frame rate allows another frame; otherwise it copies the frame into a triple buffer. A single
+    encoder thread JPEG-encodes each new frame once and publishes the bytes to every client. Clients only
+    remember the last frame they were sent, so a slow client simply skips to the newest frame once its
+    socket drains, and no per-client frame queue ever builds up.
+
+    Endpoints:
+        http://<host>:<http_port>/            multipart/x-mixed-replace MJPEG stream, viewable in a browser.
+        ws://<host>:<ws_port>/                one binary JPEG message per frame (needs `websockets`).
+
+    Methods:
+        start_server() / stop_server():
+            Starts or stops the network and encoder threads.
+
+        submit(frame, captured_at):
+            Frame listener feeding the encoder.
+
+        stats():
+            Returns client, encode and delivery counters.
+    """
+
+    def __init__(self, host="0.0.0.0", http_port=8080, ws_port=8081, quality=70, max_fps=15):
+        """
+        Args:
+            host (str): Interface to listen on.
+            http_port (int | None): Port for the MJPEG endpoint. None disables it.
+            ws_port (int | None): Port for the WebSocket endpoint. None disables it.
+            quality (int): JPEG quality, 0-100.
+            max_fps (float): Upper bound on the streamed frame rate. 0 streams every captured frame.
+        """
+        super().__init__()
+        self.__host = host
+        self.__http_port = http_port
+        self.__ws_port = ws_port
+        self.__encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.__frame_interval = 1.0 / max_fps if max_fps else 0.0
+        self.__frames = TripleBuffer()
+        self.__frame_ready = threading.Event()
+        self.__next_due = 0.0
+        self.__run_flag = False
+        self.__loop = None
+        self.__stopped = None
+        self.__next_frame = None
+        self.__latest = b""
+        self.__sequence = 0
+
+        self.__clients = 0
+        self.__encoded = 0
+        self.__encode_time = 0.0
+        self.__sent = 0
+        self.__skipped = 0
+
+    def is_serving(self):
+        return self.__run_flag
+
+    def start_server(self):
+        if self.__run_flag:
+            return
+        # A server that failed to bind may still be closing its loop.
+        self.wait()
+        self.__run_flag = True
+        self.__encoder = threading.Thread(target=self.__encode_frames, name="stream-encoder", daemon=True)
+        self.__encoder.start()
+        self.start()
+
+    def stop_server(self):
+        if not self.__run_flag:
+            return
+        self.__run_flag = False
+        self.__frame_ready.set()
+        # If the loop is not published yet, run() sees the cleared flag once it is and stops by itself.
+        self.__call_on_loop(lambda: self.__stopped.set())
+        self.__encoder.join()
+        self.wait()
+
+    def submit(self, frame, captured_at):
+        """
+        Frame listener. Cheap when nobody is watching: it returns before touching the frame.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        # Due times advance on a fixed grid with a quarter frame of slack, so capture jitter does not skip
+        # frames when the camera runs right at max_fps.
+        slack = self.__frame_interval / 4
+        if not self.__clients or captured_at < self.__next_due - slack:
+            return
+        self.__next_due = max(self.__next_due, captured_at - slack) + self.__frame_interval
+        self.__frames.write(frame, captured_at)
+        self.__frame_ready.set()
+
+    def stats(self):
+        return {
+            "clients": self.__clients,
+            "encoded": self.__encoded,
+            "encode_ms_avg": self.__encode_time / self.__encoded * 1000 if self.__encoded else 0.0,
+            "sent": self.__sent,
+            "skipped": self.__skipped,
+            "capture_dropped": self.__frames.dropped
+        }
+
+    def __encode_frames(self):
+        while self.__run_flag:
+            if not self.__frame_ready.wait(timeout=0.5):
+                continue
+            self.__frame_ready.clear()
+            frame = self.__frames.read()
+            if frame is None or self.__loop is None:
+                continue
+            start = time.perf_counter()
+            ok, encoded = cv2.imencode(".jpg", frame[0], self.__encode_params)
+            self.__encode_time += time.perf_counter() - start
+            if ok:
+                self.__encoded += 1
+                self.__call_on_loop(self.__publish, encoded.tobytes())
+
+    def __call_on_loop(self, callback, *args):
+        # Schedules a callback from another thread. Does nothing before the loop exists or after it closed.
+        loop = self.__loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass
+
+    def __publish(self, data):
+        # Runs on the event loop. Wakes every client waiting for a frame.
+        if self.__next_frame.done():
+            # Shutting down: __serve() already released the waiting clients.
+            return
+        self.__latest = data
+        self.__sequence += 1
+        waiting, self.__next_frame = self.__next_frame, self.__loop.create_future()
+        waiting.set_result(None)
+
+    async def __wait_for_frame(self, sent_sequence):
+        while self.__run_flag and self.__sequence == sent_sequence:
+            # Shielded, so a client disconnecting cannot cancel the future every other client waits on.
+            await asyncio.shield(self.__next_frame)
+        if self.__sequence - sent_sequence > 1 and sent_sequence:
+            self.__skipped += self.__sequence - sent_sequence - 1
+        return self.__sequence, self.__latest
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        # Everything other threads schedule onto the loop exists before the loop is published to them.
+        self.__stopped = asyncio.Event()
+        self.__next_frame = loop.create_future()
+        self.__loop = loop
+        if not self.__run_flag:
+            # stop_server() ran before the loop was published, so it could not signal it.
+            self.__stopped.set()
+        try:
+            loop.run_until_complete(self.__serve())
+        except OSError as e:
+            # Typically a port already in use. An exception escaping a QThread aborts the whole application.
+            logger.error(f"Stream server could not start: {e}")
+            # Nothing is served, so the encoder stops too and is_serving() says so.
+            self.__run_flag = False
+            self.__frame_ready.set()
+            self.__encoder.join()
+        finally:
+            self.__loop = None
+            loop.close()
+
+    async def __serve(self):
+        servers = []
+        try:
+            if self.__http_port:
+                servers.append(await asyncio.start_server(self.__handle_http, self.__host, self.__http_port))
+                logger.info(f"MJPEG stream on http://{self.__host}:{self.__http_port}/")
+            if self.__ws_port:
+                if websockets is None:
+                    logger.warning("websockets is not installed, WebSocket streaming disabled")
+                else:
+                    servers.append(await websockets.serve(self.__handle_ws, self.__host, self.__ws_port,
+                                                          write_limit=CLIENT_WRITE_LIMIT, compression=None))
+                    logger.info(f"WebSocket stream on ws://{self.__host}:{self.__ws_port}/")
+
+            await self.__stopped.wait()
+        finally:
+            # Also reached when the second bind fails, so the first server does not keep its port.
+            for server in servers:
+                server.close()
+        # Released from their wait with the flag cleared, clients finish on their own; only those stuck
+        # writing to a stalled socket are cancelled.
+        self.__next_frame.set_result(None)
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if tasks:
+            _, stuck = await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT)
+            for task in stuck:
+                task.cancel()
+            await asyncio.gather(*stuck, return_exceptions=True)
+        logger.info(f"Stream server stopped: {self.stats()}")
+
+    async def __handle_http(self, reader, writer):
+        self.__clients += 1
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.transport.set_write_buffer_limits(high=CLIENT_WRITE_LIMIT)
+            writer.write(b"HTTP/1.0 200 OK\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         b"Content-Type: multipart/x-mixed-replace; boundary=" + MJPEG_BOUNDARY + b"\r\n\r\n")
+            sequence = 0
+            while self.__run_flag:
+                sequence, data = await self.__wait_for_frame(sequence)
+                if not self.__run_flag:
+                    break
+                writer.write(b"--" + MJPEG_BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                             + str(len(data)).encode() + b"\r\n\r\n")
+                writer.write(data)
+                writer.write(b"\r\n")
+                # Only returns once the socket is below its limit; frames published meanwhile are skipped.
+                await writer.drain()
+                self.__sent += 1
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self.__clients -= 1
+            writer.close()
+
+    async def __handle_ws(self, websocket):
+        self.__clients += 1
+        try:
+            sequence = 0
+            while self.__run_flag:
+                sequence, data = await self.__wait_for_frame(sequence)
+                if not self.__run_flag:
+                    break
+                await websocket.send(data)
+                self.__sent += 1
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.__clients -= 1
@@ -0,0 +1,51 @@
+# Benchmarks the video path (capture, scale, convert, hand-off) without a GUI.
+#
+#   python3 ./videobench.py --source test --seconds 10
+#   python3 ./videobench.py --source file --path dive.mp4
+#   python3 ./videobench.py --source v4l2 --device 0 --fourcc YUYV
+import argparse
+import time
+from videothread import VideoThread
+from capturesource import create_capture_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure video pipeline throughput.")
+    parser.add_argument("--source", choices=["v4l2", "gstreamer", "file", "test"], default="test")
+    parser.add_argument("--device", default=0)
+    parser.add_argument("--path", help="video file for --source file")
+    parser.add_argument("--pipeline", help="pipeline string for --source gstreamer")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=0, help="0 runs synthetic sources unthrottled")
+    parser.add_argument("--fourcc", default="MJPG")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    match args.source:
+        case "v4l2":
+            device = int(args.device) if str(args.device).isdigit() else args.device
+            config = {"type": "v4l2", "device": device, "width": args.width, "height": args.height,
+                      "fps": args.fps or 30, "fourcc": args.fourcc}
+        case "gstreamer":
+            config = {"type": "gstreamer", "pipeline": args.pipeline}
+        case "file":
+            config = {"type": "file", "path": args.path, "realtime": args.fps > 0}
+        case _:
+            config = {"type": "test", "width": args.width, "height": args.height, "fps": args.fps}
+
+    # Same display size MainWindow uses.
+    thread = VideoThread(640, 480, source=create_capture_source(config))
+    thread.start()
+    time.sleep(args.seconds)
+    thread.stop()
+
+    stats = thread.frame_stats()
+    print(f"Negotiated:            {thread.negotiated_format()}")
+    print(f"Frames:                {stats['frames']} ({stats['frames'] / args.seconds:.1f} fps)")
+    print(f"Buffer allocations:    {stats['allocations']} total, {stats['allocations_per_frame']:.3f} per frame")
+    print(f"Mailbox:               {stats['mailbox']}")
+
+
+if __name__ == "__main__":
+    main()
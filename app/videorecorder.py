@@ -0,0 +1,231 @@
+import cv2
+import numpy as np
+from PyQt5.QtCore import pyqtSignal, QThread
+from queue import Queue, Empty
+from datetime import datetime
+import os
+import time
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# How often recording statistics are emitted, in seconds.
+STATS_INTERVAL = 1.0
+
+
+class VideoRecorder(QThread):
+    """
+    VideoRecorder encodes captured frames to disk on its own thread, in fixed-length segments.
+
+    Frames are handed over with submit(), which is meant to be registered as a VideoThread frame listener.
+    It copies the frame into one of a fixed number of preallocated buffers and queues it for the writer.
+    When every buffer is in use because the disk or the encoder is too slow, the frame is dropped and
+    counted instead of blocking, so recording can never slow down capture or display. Each segment is a
+    complete file that is closed before the next one starts, so a crash loses at most the open segment.
+
+    Attributes:
+        stats_signal (pyqtSignal): Emitted about once per second with the recording statistics.
+
+    Methods:
+        start_recording():
+            Starts the writer thread.
+
+        stop_recording():
+            Stops accepting frames, writes out everything queued and closes the open segment.
+
+        submit(frame, captured_at):
+            Queues a copy of a frame for encoding, or drops it if the queue is full.
+
+        set_timestamps(enabled):
+            Writes each frame's capture time to a CSV next to its segment.
+
+        stats():
+            Returns the recording statistics as a dictionary.
+    """
+    stats_signal = pyqtSignal(dict)
+
+    def __init__(self, path="./rov_videos/", segment_seconds=60, fps=30.0, fourcc="mp4v", extension="mp4", queue_size=30):
+        """
+        Args:
+            path (str): Directory segments are written to. Created if it does not exist.
+            segment_seconds (float): Length of each segment, measured by frame capture time.
+            fps (float): Frame rate written into the segment files.
+            fourcc (str): Codec passed to cv2.VideoWriter.
+            extension (str): File extension matching the codec's container.
+            queue_size (int): Number of frames that may wait for the encoder before new frames are dropped.
+        """
+        super().__init__()
+        self.__path = path
+        self.__segment_seconds = segment_seconds
+        self.__fps = fps
+        self.__fourcc = fourcc
+        self.__extension = extension
+        self.__queue_size = queue_size
+        # Unbounded: the free list is what limits it, and after a size change it briefly holds buffers of both sizes.
+        self.__pending = Queue()
+        self.__free = Queue()
+        self.__shape = None
+        self.__segment_shape = None
+        self.__run_flag = False
+        self.__timestamps = False
+        self.__timestamp_file = None
+
+        self.__submitted = 0
+        self.__dropped = 0
+        self.__written = 0
+        self.__segments = 0
+        self.__encode_total = 0.0
+        self.__encode_max = 0.0
+        self.__encode_frames = 0
+        self.__last_encode_avg = 0.0
+        self.__last_encode_max = 0.0
+
+    def is_recording(self):
+        return self.__run_flag
+
+    def set_fps(self, fps):
+        """
+        Sets the frame rate written into segments opened from now on.
+        """
+        if fps and fps > 0:
+            self.__fps = fps
+
+    def set_timestamps(self, enabled):
+        """
+        Writes the capture time of every frame to a .csv next to each segment opened from now on. Needed to
+        recover the real timeline when frames are gated and the segment no longer has a constant frame rate.
+        """
+        self.__timestamps = enabled
+
+    def start_recording(self):
+        if self.__run_flag:
+            return
+        if not os.path.exists(self.__path):
+            os.makedirs(self.__path)
+        self.__run_flag = True
+        self.start()
+        logger.info(f"Recording started in {self.__path}")
+
+    def stop_recording(self):
+        if not self.__run_flag:
+            return
+        self.__run_flag = False
+        self.wait()
+        logger.info(f"Recording stopped: {self.stats()}")
+
+    def submit(self, frame, captured_at):
+        """
+        Queues a copy of a frame for the writer. Never blocks.
+
+        Args:
+            frame (numpy.ndarray): BGR frame. It is copied, so the caller may reuse the buffer.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        if not self.__run_flag:
+            return
+        self.__submitted += 1
+        if frame.shape != self.__shape:
+            # First frame, or the source changed size. Buffers of the old size are discarded on return.
+            self.__shape = frame.shape
+            free = Queue()
+            for _ in range(self.__queue_size):
+                free.put(np.empty(frame.shape, dtype=frame.dtype))
+            self.__free = free
+        try:
+            buffer = self.__free.get_nowait()
+        except Empty:
+            self.__dropped += 1
+            return
+        np.copyto(buffer, frame)
+        self.__pending.put_nowait((buffer, captured_at))
+
+    def run(self):
+        writer = None
+        segment_start = 0.0
+        segment_frame = 0
+        next_stats = time.monotonic() + STATS_INTERVAL
+        while self.__run_flag or not self.__pending.empty():
+            if time.monotonic() >= next_stats:
+                self.__publish_stats()
+                next_stats += STATS_INTERVAL
+            try:
+                buffer, captured_at = self.__pending.get(timeout=0.1)
+            except Empty:
+                continue
+
+            if writer is None or captured_at - segment_start >= self.__segment_seconds or buffer.shape != self.__segment_shape:
+                if writer is not None:
+                    self.__close_segment(writer)
+                writer = self.__open_segment(buffer.shape)
+                segment_start = captured_at
+                segment_frame = 0
+            if self.__timestamp_file is not None:
+                self.__timestamp_file.write(f"{segment_frame},{captured_at - segment_start:.4f}\n")
+            segment_frame += 1
+
+            start = time.perf_counter()
+            writer.write(buffer)
+            elapsed = time.perf_counter() - start
+            self.__written += 1
+            self.__encode_total += elapsed
+            self.__encode_frames += 1
+            self.__encode_max = max(self.__encode_max, elapsed)
+
+            if buffer.shape == self.__shape:
+                self.__free.put(buffer)
+
+        if writer is not None:
+            self.__close_segment(writer)
+        self.__publish_stats()
+
+    def stats(self):
+        """
+        Returns the recording statistics.
+
+        Returns:
+            dict: Whether recording is on, frames submitted, written and dropped, segments started,
+                  current queue depth and the average and worst encode time in milliseconds over the
+                  last stats interval.
+        """
+        return {
+            "recording": self.__run_flag,
+            "submitted": self.__submitted,
+            "written": self.__written,
+            "dropped": self.__dropped,
+            "segments": self.__segments,
+            "queue_depth": self.__pending.qsize(),
+            "encode_ms_avg": self.__last_encode_avg * 1000,
+            "encode_ms_max": self.__last_encode_max * 1000
+        }
+
+    def __open_segment(self, shape):
+        self.__segments += 1
+        self.__segment_shape = shape
+        file_name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{self.__segments:03d}.{self.__extension}"
+        full_path = os.path.join(self.__path, file_name)
+        height, width = shape[:2]
+        writer = cv2.VideoWriter(full_path, cv2.VideoWriter_fourcc(*self.__fourcc), self.__fps, (width, height))
+        if not writer.isOpened():
+            logger.error(f"Could not open video writer for {full_path} with codec {self.__fourcc}")
+        if self.__timestamps:
+            self.__timestamp_file = open(os.path.splitext(full_path)[0] + ".csv", "w")
+            self.__timestamp_file.write("frame,seconds\n")
+        logger.info(f"Recording segment: {full_path}")
+        return writer
+
+    def __close_segment(self, writer):
+        writer.release()
+        if self.__timestamp_file is not None:
+            self.__timestamp_file.close()
+            self.__timestamp_file = None
+
+    def __publish_stats(self):
+        if self.__encode_frames:
+            self.__last_encode_avg = self.__encode_total / self.__encode_frames
+            self.__last_encode_max = self.__encode_max
+        self.__encode_total = 0.0
+        self.__encode_max = 0.0
+        self.__encode_frames = 0
+        self.stats_signal.emit(self.stats())
@@ -0,0 +1,148 @@
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtCore import Qt, QSize, QRect, QPoint, QTimer, pyqtSignal
+from PyQt5.QtGui import QPainter, QPen, QColor
+from visionpipeline import Rect, Circle, Line, Polygon, Text
+
+# How long the surface size must stay unchanged before the capture thread is asked for the new size.
+RESIZE_SETTLE_MS = 100
+# Smallest size the video surface can be shrunk to.
+MINIMUM_SURFACE_SIZE = (320, 180)
+
+
+class VideoSurface(QWidget):
+    """
+    VideoSurface paints the main video feed itself instead of going through a scaled QLabel.
+
+    Frames arrive already scaled to the surface's size by the capture thread, in a buffer the capture
+    thread does not touch again until the next frame replaces this one, so the surface paints straight from
+    it. Painting is a single unscaled blit centered in the widget, with the vision overlays drawn on top in
+    the same pass. The surface only repaints when set_frame() hands it a new frame (or the window system
+    asks for it). An optional HudOverlay is composited last.
+
+    When the surface is resized, display_size_changed is emitted once the size has settled, so the capture
+    thread does one resize per frame at the new size. Frames still in flight at the old size are stretched
+    into place until then.
+
+    Attributes:
+        display_size_changed (pyqtSignal): Emitted with (width, height) when the settled surface size changes.
+
+    Methods:
+        set_frame(image, captured_at, tracer, results):
+            Shows a new frame with the vision results to draw over it and schedules one repaint.
+
+        set_hud(hud):
+            Sets the heads-up display drawn over the video.
+    """
+    display_size_changed = pyqtSignal(int, int)
+
+    def __init__(self, width, height, parent=None):
+        """
+        Args:
+            width (int): Preferred width of the surface.
+            height (int): Preferred height of the surface.
+            parent (QWidget | None): Parent widget.
+        """
+        super().__init__(parent)
+        self.__size_hint = QSize(width, height)
+        self.setMinimumSize(*MINIMUM_SURFACE_SIZE)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        # Every pixel is painted in paintEvent, so Qt does not need to clear the background first.
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.__image = None
+        self.__results = []
+        self.__captured_at = None
+        self.__tracer = None
+        self.__hud = None
+        self.__settle_timer = QTimer(self)
+        self.__settle_timer.setSingleShot(True)
+        self.__settle_timer.timeout.connect(self.__emit_display_size)
+
+    def sizeHint(self):
+        return self.__size_hint
+
+    def set_hud(self, hud):
+        """
+        Args:
+            hud (HudOverlay | None): Heads-up display composited over every paint.
+        """
+        self.__hud = hud
+        if hud is not None:
+            hud.resize(self.width(), self.height())
+
+    def refresh_hud(self):
+        """
+        Repaints for a HUD change when no new frame is coming to carry it, e.g. with the camera unplugged.
+        """
+        if self.__hud is not None and self.__hud.is_dirty():
+            self.update()
+
+    def set_frame(self, image, captured_at, tracer, results=()):
+        """
+        Args:
+            image (QImage): Display-ready frame. It references a capture buffer that stays leased to the
+                            GUI until the next frame is taken from the mailbox, so it is kept without a copy.
+            captured_at (float): time.monotonic() capture time of the frame.
+            tracer (LatencyTracer): Tracer that records when the frame was painted.
+            results (list[VisionResult]): Vision results to draw over the frame.
+        """
+        self.__image = image
+        self.__results = results
+        self.__captured_at = captured_at
+        self.__tracer = tracer
+        self.update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.__hud is not None:
+            self.__hud.resize(self.width(), self.height())
+        self.__settle_timer.start(RESIZE_SETTLE_MS)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self.__image is not None:
+            target = self.__target_rect()
+            if target.size() == self.__image.size():
+                painter.drawImage(target.topLeft(), self.__image)
+            else:
+                painter.drawImage(target, self.__image)
+            if self.__results:
+                self.__draw_overlays(painter, target)
+        if self.__hud is not None:
+            self.__hud.paint(painter)
+        painter.end()
+        if self.__captured_at is not None:
+            self.__tracer.record("paint", self.__captured_at)
+            # Only the first paint of a frame counts; later ones are plain repaints.
+            self.__captured_at = None
+
+    def __target_rect(self):
+        # Letterbox the frame: fit it inside the widget, keeping its aspect ratio, and center it.
+        size = self.__image.size().scaled(self.size(), Qt.KeepAspectRatio)
+        return QRect(QPoint((self.width() - size.width()) // 2, (self.height() - size.height()) // 2), size)
+
+    def __emit_display_size(self):
+        self.display_size_changed.emit(self.width(), self.height())
+
+    def __draw_overlays(self, painter, target):
+        painter.translate(target.topLeft())
+        for result in self.__results:
+            # Processors report source-frame coordinates; the frame is already scaled for display.
+            sx = target.width() / result.frame_size[0]
+            sy = target.height() / result.frame_size[1]
+            for item in result.overlays:
+                painter.setPen(QPen(QColor(*item.color), 2))
+                if isinstance(item, Rect):
+                    painter.drawRect(int(item.x * sx), int(item.y * sy), int(item.w * sx), int(item.h * sy))
+                    if item.label:
+                        painter.drawText(int(item.x * sx), int(item.y * sy) - 4, item.label)
+                elif isinstance(item, Circle):
+                    painter.drawEllipse(QPoint(int(item.x * sx), int(item.y * sy)), int(item.r * sx), int(item.r * sy))
+                elif isinstance(item, Line):
+                    painter.drawLine(int(item.x1 * sx), int(item.y1 * sy), int(item.x2 * sx), int(item.y2 * sy))
+                elif isinstance(item, Polygon):
+                    points = [QPoint(int(x * sx), int(y * sy)) for x, y in item.points]
+                    painter.drawPolygon(*points)
+                elif isinstance(item, Text):
+                    painter.drawText(int(item.x * sx), int(item.y * sy), item.text)
+        painter.resetTransform()
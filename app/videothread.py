@@ -1,72 +1,122 @@
 import cv2
-import numpy as np
-from PyQt5.QtCore import pyqtSignal, QThread
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import QThread
 from PyQt5 import QtGui
-from PyQt5.QtCore import Qt
 import logging
 import coloredlogs
 import os
-import random
-import string
+import time
+from collections import namedtuple
+from framepool import FramePool
+from framemailbox import FrameMailbox
+from capturesource import V4L2Source
+from screenshotwriter import screenshot_name
+from latencytracer import LatencyTracer
 
 coloredlogs.install(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Number of buffers in each pool. The GUI holds one output buffer and the mailbox another while the third is filled.
+FRAME_POOL_SIZE = 3
+# Number of frames over which allocations per frame are averaged.
+FRAME_STATS_WINDOW = 300
+
+# A display-ready frame. `image` paints straight from `buffer`, which the capture thread leaves alone until
+# the frame mailbox releases it.
+DisplayFrame = namedtuple("DisplayFrame", ["image", "captured_at", "buffer"])
+
 
 class VideoThread(QThread):
     """
     VideoThread is a QThread subclass designed to handle video capture and processing in a separate thread. 
-    It emits a signal with the captured video frames and provides utility methods for converting frames 
-    to QPixmap and saving screenshots.
+    It captures into preallocated buffers, scales and color-converts each frame once on the capture thread,
+    and posts a ready-to-paint QImage backed by a pooled buffer to a latest-wins mailbox, so steady-state
+    capture allocates nothing and a stalled GUI never builds up a backlog of frames.
 
     Attributes:
-        change_pixmap_signal (pyqtSignal): Signal emitted with a numpy array representing the video frame.
+        frame_mailbox (FrameMailbox): Single-slot mailbox holding the newest DisplayFrame.
+        latency_tracer (LatencyTracer): Per-stage frame age from capture to paint.
+        allocations_per_frame (float): Frame buffer allocations per frame over the last stats window.
         __run_flag (bool): Internal flag to control the thread's execution.
-        __display_width (int): Width of the display for scaling the video frames.
-        __display_height (int): Height of the display for scaling the video frames.
+        __display_size (tuple): Width and height of the display for scaling the video frames.
+        __decimation (int): Only every n-th captured frame is decoded and converted.
+        __paused (bool): When set, frames are grabbed to keep the stream fresh but never decoded.
+        __frame_listeners (list): Callables that receive every decoded BGR frame and its capture time.
         __recent_frame (np.ndarray): Stores the most recent video frame captured.
 
     Methods:
-        __init__(width, height):
-            Initializes the VideoThread with the specified display width and height.
+        __init__(width, height, source=None):
+            Initializes the VideoThread with the specified display width, height and capture source.
 
         run():
-            Starts the video capture loop, emitting frames via the change_pixmap_signal.
-            Captures video from the default webcam (device 0).
+            Starts the video capture loop, posting frames to the frame_mailbox.
+            Captures video from the configured source, by default the V4L2 webcam 0.
+
+        negotiated_format():
+            Returns the resolution, frame rate and pixel format the capture source actually negotiated.
+
+        set_display_size(width, height):
+            Changes the size frames are scaled to.
+
+        set_interpolation(interpolation):
+            Chooses the OpenCV interpolation used for that single resize.
+
+        set_decimation(n):
+            Decodes and converts only every n-th frame.
+
+        set_paused(paused):
+            Stops decoding frames while keeping the device open.
+
+        add_frame_listener(listener) / remove_frame_listener(listener):
+            Registers or removes a callable that is handed every decoded frame on the capture thread.
 
         stop():
             Stops the video capture loop and waits for the thread to finish.
 
         convert_cv_qt(cv_img):
-            Converts an OpenCV image (numpy array) to a QPixmap for display in a PyQt application.
+            Scales and converts an OpenCV image into a leased buffer and wraps it in a QImage.
+
+        frame_stats():
+            Returns frame and allocation counters for the capture pipeline.
 
         save_screenshot(path="./rov_images/"):
             Saves the most recent video frame as a screenshot to the specified directory.
             Creates the directory if it does not exist.
     """
-    change_pixmap_signal = pyqtSignal(np.ndarray)
-
-    def __init__(self, width, height):
+    def __init__(self, width, height, source=None):
         """
         Initializes the VideoThread object with specified display dimensions.
 
         Args:
             width (int): The width of the display.
             height (int): The height of the display.
+            source (CaptureSource): Where frames come from. Defaults to webcam 0 through V4L2 with MJPG.
         """
         super().__init__()
+        self.__source = source if source is not None else V4L2Source(0)
         self.__run_flag = True
-        self.__display_width = height
-        self.__display_height = width
+        self.__display_size = (width, height)
+        self.__interpolation = None
+        self.__decimation = 1
+        self.__paused = False
+        self.__frame_listeners = []
         self.__recent_frame = None
+        self.frame_mailbox = FrameMailbox(release=self.__release_frame)
+        self.latency_tracer = LatencyTracer()
+        self.__capture_pool = FramePool(FRAME_POOL_SIZE)
+        self.__scaled_pool = FramePool(FRAME_POOL_SIZE)
+        # Output buffers are painted from directly, so one is not reused before the GUI is done with it.
+        self.__output_pool = FramePool(FRAME_POOL_SIZE, leased=True)
+        self.__frame_count = 0
+        self.__window_allocations = 0
+        self.allocations_per_frame = 0.0
 
     def run(self):
         """
         Executes the video capture thread.
 
-        This method captures video frames from the default webcam (device 0) and emits
-        the frames using the `change_pixmap_signal` signal for further processing or display.
+        This method captures video frames from the configured capture source into pooled
+        buffers, converts them for display and posts the result to `frame_mailbox`, overwriting
+        any frame the GUI has not picked up yet.
         It continuously reads frames while the `__run_flag` is set to True. If the camera
         input cannot be read, an error is logged. The video capture system is properly
         released when the thread stops.
@@ -74,26 +124,118 @@ class VideoThread(QThread):
         Raises:
             RuntimeError: If no camera is connected or the camera input cannot be read.
 
-        Emits:
-            change_pixmap_signal: A signal that emits the captured video frame (`cv_img`).
+        Posts:
+            frame_mailbox: A DisplayFrame with the display-ready QImage and its time.monotonic()
+                           capture time.
 
         Notes:
             - Ensure that a camera is connected to the system before running this method.
             - OpenCV does not provide a direct way to check the number of connected cameras.
         """
-        # Capture from webcam 0. Device 0 is generally the only camera plugged in, but this will error if there are no cameras plugged in.
+        # The default source is webcam 0. Device 0 is generally the only camera plugged in, but this will error if there are no cameras plugged in.
         # Sadly, OpenCV doesn't provide a straightforward way to get the number of cameras present.
-        cap = cv2.VideoCapture(0)
+        if not self.__source.open():
+            logger.error(f"Could not open {self.__source.describe()}. Verify that the camera is connected and restart the application.")
+            return
+        frame_shape = self.__source.frame_shape()
+        frame_index = 0
         while self.__run_flag:
-            ret, cv_img = cap.read()
+            frame_index += 1
+            if self.__paused or frame_index % self.__decimation:
+                # Keep draining the device so the next decoded frame is current, but skip the decode.
+                if not self.__source.skip():
+                    logger.error(f"Error reading {self.__source.describe()}.")
+                continue
+            buffer = self.__capture_pool.acquire(frame_shape)
+            ret, cv_img = self.__source.read(buffer)
             if ret:
-                self.change_pixmap_signal.emit(cv_img)
+                captured_at = time.monotonic()
+                self.latency_tracer.record("capture", captured_at, captured_at)
+                if cv_img is not buffer:
+                    self.__capture_pool.adopt(cv_img)
+                    frame_shape = cv_img.shape
                 self.__recent_frame = cv_img
+                for listener in self.__frame_listeners:
+                    listener(cv_img, captured_at)
+                qt_img, output = self.convert_cv_qt(cv_img)
+                self.latency_tracer.record("convert", captured_at)
+                self.frame_mailbox.post(DisplayFrame(qt_img, captured_at, output))
+                self.__count_frame()
             else:
                 logger.error(
                     "Error reading camera input. Verify that the camera is connected and restart the application.")
         # shut down capture system
-        cap.release()
+        self.__source.release()
+
+    def negotiated_format(self):
+        """
+        Returns the format the capture source actually negotiated.
+
+        Returns:
+            dict: The width, height, fps and fourcc reported by the source. All zero before the thread runs.
+        """
+        return dict(self.__source.negotiated)
+
+    def set_display_size(self, width, height):
+        """
+        Changes the size frames are scaled to. Takes effect from the next converted frame.
+
+        Args:
+            width (int): The width of the display.
+            height (int): The height of the display.
+        """
+        self.__display_size = (width, height)
+
+    def set_interpolation(self, interpolation):
+        """
+        Chooses how frames are resized for display. Takes effect from the next converted frame.
+
+        Args:
+            interpolation (int | None): An OpenCV flag such as cv2.INTER_LINEAR. None uses INTER_AREA
+                                        when shrinking and INTER_LINEAR when enlarging.
+        """
+        self.__interpolation = interpolation
+
+    def set_decimation(self, n):
+        """
+        Decodes and converts only every n-th captured frame. Skipped frames are grabbed but not decoded.
+
+        Args:
+            n (int): Decimation factor. 1 processes every frame.
+        """
+        self.__decimation = max(1, int(n))
+
+    def set_paused(self, paused):
+        """
+        Pauses or resumes frame processing without closing the capture device, so resuming is instant.
+
+        Args:
+            paused (bool): True to stop decoding frames.
+        """
+        self.__paused = paused
+
+    def add_frame_listener(self, listener):
+        """
+        Registers a callable that is handed every decoded frame.
+
+        The listener runs on the capture thread as `listener(frame, captured_at)`, where `frame` is the BGR
+        frame in a pooled buffer and `captured_at` is its time.monotonic() capture time. Listeners must
+        copy what they keep and return quickly, since anything slow here stalls the video.
+
+        Args:
+            listener (callable): The frame listener.
+        """
+        # Replace rather than mutate the list so the capture loop can iterate without a lock.
+        self.__frame_listeners = self.__frame_listeners + [listener]
+
+    def remove_frame_listener(self, listener):
+        """
+        Removes a listener registered with add_frame_listener(). Unknown listeners are ignored.
+
+        Args:
+            listener (callable): The frame listener.
+        """
+        self.__frame_listeners = [l for l in self.__frame_listeners if l != listener]
 
     # Sets run flag to False and waits for thread to finish
     def stop(self):
@@ -108,29 +250,65 @@ class VideoThread(QThread):
 
     def convert_cv_qt(self, cv_img):
         """
-        Converts an OpenCV image to a QPixmap for display in a PyQt application.
+        Converts an OpenCV image to a QImage for display in a PyQt application.
 
-        This method takes an image in OpenCV format (BGR) and converts it to a 
-        QPixmap object, which can be used for rendering in PyQt widgets. The 
-        conversion includes changing the color format from BGR to RGB, resizing 
-        the image to fit the specified display dimensions, and maintaining the 
-        aspect ratio.
+        The frame is resized once to fit the display dimensions while maintaining the aspect ratio and is
+        then expanded from BGR to 32-bit BGRX, which is the memory layout of QImage.Format_RGB32 and
+        can be painted without any further conversion. Both steps write into pooled buffers.
 
         Args:
             cv_img (numpy.ndarray): The input image in OpenCV format (BGR).
 
         Returns:
-            QPixmap: The converted image as a QPixmap object, ready for display.
-        """
-        """Convert from an opencv image to QPixmap"""
-        rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        convert_to_Qt_format = QtGui.QImage(
-            rgb_image.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
-        p = convert_to_Qt_format.scaled(
-            self.__display_width, self.__display_height, Qt.KeepAspectRatio)
-        return QPixmap.fromImage(p)
+            tuple: The converted QImage and the leased output buffer it references. The buffer is not
+                   handed out again until it is released back to the output pool.
+        """
+        h, w = cv_img.shape[:2]
+        display_width, display_height = self.__display_size
+        scale = min(display_width / w, display_height / h)
+        out_w, out_h = max(1, round(w * scale)), max(1, round(h * scale))
+
+        if (out_w, out_h) == (w, h):
+            scaled = cv_img
+        else:
+            scaled = self.__scaled_pool.acquire((out_h, out_w, 3))
+            interpolation = self.__interpolation
+            if interpolation is None:
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            cv2.resize(cv_img, (out_w, out_h), dst=scaled, interpolation=interpolation)
+        output = self.__output_pool.acquire((out_h, out_w, 4))
+        cv2.cvtColor(scaled, cv2.COLOR_BGR2BGRA, dst=output)
+        return QtGui.QImage(output.data, out_w, out_h, output.strides[0], QtGui.QImage.Format_RGB32), output
+
+    def frame_stats(self):
+        """
+        Returns counters describing the capture pipeline.
+
+        Returns:
+            dict: The number of frames captured, the total number of frame buffers allocated and the
+                  allocations per frame over the last stats window (zero in steady state), plus the
+                  frame mailbox counters. The GUI paints from the leased output buffers without copying
+                  them, so the count covers every frame buffer from capture to paint.
+        """
+        return {
+            "frames": self.__frame_count,
+            "allocations": self.__total_allocations(),
+            "allocations_per_frame": self.allocations_per_frame,
+            "mailbox": self.frame_mailbox.stats()
+        }
+
+    def __total_allocations(self):
+        return self.__capture_pool.allocations + self.__scaled_pool.allocations + self.__output_pool.allocations
+
+    def __release_frame(self, frame):
+        self.__output_pool.release(frame.buffer)
+
+    def __count_frame(self):
+        self.__frame_count += 1
+        if self.__frame_count % FRAME_STATS_WINDOW == 0:
+            allocations = self.__total_allocations()
+            self.allocations_per_frame = (allocations - self.__window_allocations) / FRAME_STATS_WINDOW
+            self.__window_allocations = allocations
 
     def save_screenshot(self, path="./rov_images/"):
         """
@@ -142,22 +320,21 @@ class VideoThread(QThread):
 
         Behavior:
             - If the specified directory does not exist, it will be created.
-            - A random file name consisting of 6 uppercase letters and digits 
-              will be generated for the screenshot.
+            - A timestamped, collision-free file name is generated for the screenshot.
             - The screenshot will be saved as a JPEG file in the specified directory.
             - Logs the full path of the saved screenshot.
 
         Note:
             - The method does nothing if there is no recent frame available.
+            - This encodes synchronously on the calling thread. The GUI uses ScreenshotWriter instead.
         """
         if not os.path.exists(path):
             os.mkdir(path)
 
-        # Generate random file name
         if self.__recent_frame is not None:
-            file_name = ''.join(random.SystemRandom().choice(
-                string.ascii_uppercase + string.digits) for _ in range(6))
+            file_name = screenshot_name()
 
             full_path = path + file_name + ".jpg"
-            cv2.imwrite(full_path, self.__recent_frame)
+            # The frame lives in a pooled buffer, so take a private copy before the capture loop reuses it.
+            cv2.imwrite(full_path, self.__recent_frame.copy())
             logger.info(f"Screenshot saved: {full_path}")
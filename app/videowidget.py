@@ -1,116 +1,452 @@
-from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PyQt5.QtCore import pyqtSlot
-import numpy as np
-from videothread import VideoThread
+from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout
+from PyQt5.QtCore import pyqtSlot, pyqtSignal, QTimer
+from PyQt5.QtGui import QPixmap, QImage
+from cameramanager import CameraManager, THUMBNAIL_SIZE
+from videorecorder import VideoRecorder
+from screenshotwriter import ScreenshotWriter
+from replaybuffer import ReplayBuffer
+from streamserver import StreamServer
+from inference import InferenceStage
+from framebus import FrameBusPublisher
+from visionpipeline import VisionPipeline, ColorSegmentationProcessor, ShapeCountProcessor
+from videosurface import VideoSurface
+from hud import HudOverlay
+from mosaic import MosaicBuilder
+from changegate import ChangeGate
+import time
 import coloredlogs, logging
+import os
 
 coloredlogs.install(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# How often the widget pulls the newest frame from the video thread, in milliseconds.
+REPAINT_INTERVAL_MS = 15
+# How often the HUD re-evaluates link status, in milliseconds.
+HUD_LINK_INTERVAL_MS = 250
+# How often the latency overlay is refreshed while it is shown, in milliseconds.
+LATENCY_OVERLAY_INTERVAL_MS = 500
+# Detector used by the inference stage; a .tflite file keeps it usable on CPU-only laptops.
+INFERENCE_MODEL_PATH = "./models/detector.tflite"
+INFERENCE_LABELS_PATH = "./models/labels.txt"
+# Also run the detector on the background cameras, batched with the main feed. Off by default: it keeps their
+# detections ready for a camera switch, but costs inference time on feeds nobody is looking at.
+INFERENCE_ALL_CAMERAS = False
+# Shared memory name other processes attach to with framebus.FrameBusConsumer.
+FRAME_BUS_NAME = "rov_main"
+
+ACTIVE_THUMBNAIL_CSS = "border: 2px solid #61afef;"
+INACTIVE_THUMBNAIL_CSS = "border: 2px solid transparent;"
+
+
+class ThumbnailLabel(QLabel):
+    clicked = pyqtSignal(int)
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.__index = index
+        self.setFixedSize(*THUMBNAIL_SIZE)
+        self.setScaledContents(True)
+
+    def mousePressEvent(self, event):
+        self.clicked.emit(self.__index)
+        super().mousePressEvent(event)
+
+
 class VideoWidget(QWidget):
-    def __init__(self, width, height):
+    def __init__(self, width, height, camera_configs=None):
         super().__init__()
         # Transparent background for a modern look.
         self.setStyleSheet("background-color: transparent;")
         
-        # Label for displaying the video feed.
-        self.__image_label = QLabel(self)
-        self.__image_label.setFixedSize(1280, 720)
-        self.__image_label.setScaledContents(True)
+        # Surface painting the main feed; it starts at width x height and follows the window from there.
+        self.__video_surface = VideoSurface(width, height, self)
+        # Camera whose frame the surface is painting; that frame's buffer is released by the camera's next take().
+        self.__surface_camera = None
+
+        # Heads-up display of thrusters, claws, depth, heading and link status drawn over the video.
+        self.__hud = HudOverlay()
+        self.__video_surface.set_hud(self.__hud)
+        self.__controller_connected = None
+        self.__telemetry_at = None
+        self.__link_stats = None
+        self.__hud_link_timer = QTimer(self)
+        self.__hud_link_timer.timeout.connect(self.__update_hud_link)
+        self.__hud_link_timer.start(HUD_LINK_INTERVAL_MS)
+
+        # Optional per-stage latency overlay drawn over the top-left corner of the video.
+        self.__latency_overlay = QLabel(self.__video_surface)
+        self.__latency_overlay.setStyleSheet(
+            "font-family: monospace; font-size: 14px; color: #00E676; background-color: rgba(0, 0, 0, 160); padding: 6px;"
+        )
+        self.__latency_overlay.move(10, 10)
+        self.__latency_overlay.setVisible(False)
+        self.__latency_timer = QTimer(self)
+        self.__latency_timer.timeout.connect(self.__update_latency_overlay)
         
-        # Start the video thread.
-        self.__video_thread = VideoThread(width, height)
-        self.__video_thread.change_pixmap_signal.connect(self.update_image)
-        self.__video_thread.start()
+        # Start one video thread per camera.
+        self.__camera_manager = CameraManager(width, height, camera_configs)
+        self.__camera_manager.active_camera_changed.connect(self.__highlight_thumbnail)
+        self.__camera_manager.active_camera_changed.connect(self.__follow_active_camera)
+        self.__camera_manager.start()
+        self.__video_surface.display_size_changed.connect(self.__camera_manager.set_display_size)
+        self.__main_feed_thread = self.__camera_manager.active_thread()
+        self.__main_feed_listeners = []
+
+        # Records the main feed in the background; fed from the capture thread's frame listeners.
+        self.__recorder = VideoRecorder()
+        self.__recorder.stats_signal.connect(self.__update_recording_info)
+        # Optionally drops unchanged frames before they reach the recorder; passes everything until toggled.
+        self.__recording_gate = ChangeGate(self.__recorder.submit)
+
+        # Saves screenshots of the main feed on encoder threads.
+        self.__screenshot_writer = ScreenshotWriter()
+        self.add_main_feed_listener(self.__screenshot_writer.submit)
+
+        # Always keeps the last seconds of the main feed compressed in memory for instant replay.
+        self.__replay_buffer = ReplayBuffer()
+        self.__replay_buffer.start_buffering()
+        self.__replay_gate = ChangeGate(self.__replay_buffer.submit)
+        self.add_main_feed_listener(self.__replay_gate.submit)
+
+        # Optional MJPEG/WebSocket stream of the main feed for other stations; off until toggled.
+        self.__stream_server = StreamServer()
+
+        # Optional vision processors on the main feed; off until toggled.
+        self.__vision = VisionPipeline([
+            ColorSegmentationProcessor("red", (0, 120, 70), (10, 255, 255)),
+            ShapeCountProcessor()
+        ])
+
+        # Optional object detection on the main feed, or every camera with INFERENCE_ALL_CAMERAS; off until toggled.
+        labels = None
+        if os.path.exists(INFERENCE_LABELS_PATH):
+            with open(INFERENCE_LABELS_PATH) as f:
+                labels = [line.strip() for line in f]
+        self.__inference = InferenceStage(INFERENCE_MODEL_PATH, labels)
+        if INFERENCE_ALL_CAMERAS:
+            self.__inference_listeners = [self.__inference.listener_for(index)
+                                          for index in range(len(self.__camera_manager.threads))]
+        else:
+            self.__inference_listener = self.__inference.listener_for("main")
+
+        # Optional live mosaic of the main feed; off until toggled. The preview sits at the end of the thumbnail row.
+        self.__mosaic = MosaicBuilder()
+        self.__mosaic_sequence = 0
+
+        # Optional shared-memory bus publishing the main feed to other processes; off until toggled.
+        self.__frame_bus = None
+
+        # Clickable thumbnails of every camera, only shown when there is more than one.
+        self.__thumbnails = []
+        thumbnail_layout = QHBoxLayout()
+        for index in range(len(self.__camera_manager.threads)):
+            thumbnail = ThumbnailLabel(index, self)
+            thumbnail.clicked.connect(self.__camera_manager.switch_to)
+            thumbnail_layout.addWidget(thumbnail)
+            self.__thumbnails.append(thumbnail)
+        thumbnail_layout.addStretch()
+        self.__mosaic_preview = QLabel(self)
+        self.__mosaic_preview.setVisible(False)
+        thumbnail_layout.addWidget(self.__mosaic_preview)
+        if len(self.__thumbnails) < 2:
+            for thumbnail in self.__thumbnails:
+                thumbnail.setVisible(False)
+            self.__camera_manager.set_thumbnails_visible(False)
+        self.__highlight_thumbnail(self.__camera_manager.active_index())
+
+        # Pull the newest frame on our own tick instead of queueing every frame in the event loop.
+        self.__repaint_timer = QTimer(self)
+        self.__repaint_timer.timeout.connect(self.update_image)
+        self.__repaint_timer.start(REPAINT_INTERVAL_MS)
         
-        # Label to display detailed joystick axis info.
-        self.__axis_label = QLabel("Joystick Axis Info: Not Updated", self)
-        self.__axis_label.setStyleSheet(
-            "font-size: 32px; font-weight: bold; color: #00E676; background-color: transparent; padding: 10px;"
+        # Label to display recording state and encoder health.
+        self.__recording_label = QLabel("", self)
+        self.__recording_label.setStyleSheet(
+            "font-size: 20px; font-weight: bold; color: #e06c75; background-color: transparent; padding: 4px;"
         )
-        
+        self.__recording_label.setVisible(False)
+
         # Arrange them in a vertical layout.
         layout = QVBoxLayout()
-        layout.addWidget(self.__image_label)
-        layout.addWidget(self.__axis_label)
+        layout.addWidget(self.__video_surface)
+        layout.addLayout(thumbnail_layout)
+        layout.addWidget(self.__recording_label)
         self.setLayout(layout)
     
-    @pyqtSlot(np.ndarray)
-    def update_image(self, cv_img):
-        qt_img = self.__video_thread.convert_cv_qt(cv_img)
-        self.__image_label.setPixmap(qt_img)
-    
-    def update_axis_info(self, axis_info, full_data):
+    @pyqtSlot()
+    def update_image(self):
+        active = self.__camera_manager.active_index()
+        for index, thread in enumerate(self.__camera_manager.threads):
+            if index != active and index == self.__surface_camera:
+                # Just switched away from: its thumbnail waits until the new camera's first frame takes over
+                # the surface, so the frame still on it is not released while it may be repainted.
+                continue
+            frame = thread.frame_mailbox.take()
+            if frame is None:
+                if index == active:
+                    self.__video_surface.refresh_hud()
+                continue
+            qt_img, captured_at = frame.image, frame.captured_at
+            # Already scaled to the surface and in the native RGB32 layout, so it is blitted without conversion.
+            if index == active:
+                thread.latency_tracer.record("deliver", captured_at)
+                results = []
+                if self.__vision.is_running():
+                    results += self.__vision.results()
+                if self.__inference.is_running():
+                    results += self.__inference.results(index if INFERENCE_ALL_CAMERAS else "main")
+                self.__video_surface.set_frame(qt_img, captured_at, thread.latency_tracer, results)
+                self.__surface_camera = index
+            else:
+                # fromImage() shares the buffer, which stays leased to the label until the next take().
+                self.__thumbnails[index].setPixmap(QPixmap.fromImage(qt_img))
+        if self.__mosaic.is_running():
+            self.__update_mosaic_preview()
+
+    def toggle_latency_overlay(self):
+        if self.__latency_overlay.isVisible():
+            self.__latency_timer.stop()
+            self.__latency_overlay.setVisible(False)
+        else:
+            self.__update_latency_overlay()
+            self.__latency_overlay.setVisible(True)
+            self.__latency_timer.start(LATENCY_OVERLAY_INTERVAL_MS)
+
+    def export_latency(self):
+        return self.get_video_thread().latency_tracer.export()
+
+    def toggle_vision(self):
+        if self.__vision.is_running():
+            self.remove_main_feed_listener(self.__vision.submit)
+            self.__vision.stop()
+        else:
+            self.__vision.start()
+            self.add_main_feed_listener(self.__vision.submit)
+
+    def vision_results(self):
+        return self.__vision.results()
+
+    def toggle_mosaic(self):
         """
-        Expects `axis_info` to be a dictionary with:
-          - "Axis 0 (Left Stick X - Yaw)"
-          - "Axis 4 (Right Stick X - Vertical)"
-        Also, full_data may contain the keys "claw_trigger" and "claw_bumper".
-        
-        For display:
-          • Axis 0 shows yaw (positive means turning right, negative means turning left).
-          • Axis 4 is inverted (so positive means ascending, negative means descending).
-          • Claw info is displayed with new names.
-        """
-        threshold = 0.05
-        # lines = ["joystick axis details: "]
-        lines = [
-            "\nJOYSTICK MAPPING\n"
-            "Left joystick:\n"
-            "Axis 0 → Left/Right movement (X-axis)\n"
-            "Axis 1 → Up/Down movement (Y-axis)\n"
-            "Right joystick:\n"
-            "Axis 3 → Left/Right movement (X-axis)\n"
-            "Axis 4 → Up/Down movement (Y-axis)\n\n"
-            "THRUSTER INFO\n"
-            "NEUTRAL: 1500 | FORWARD: 1100 | BACKWARDS: 1900\n"
-            "\n------------------------------------------------------------------------------------\n\n\n"
-            "CONTROLLER DEBUG INFORMATION"
-        ]
-
-        for axis, value in axis_info.items():
-            detail = ""
-            if axis == "Axis 0 (Left Stick X - Yaw)":
-                if value > threshold:
-                    detail = "Turning Right (Increase right thruster offset)"
-                elif value < -threshold:
-                    detail = "Turning Left (Increase left thruster offset)"
-                else:
-                    detail = "Neutral (No yaw command)"
-            elif axis == "Axis 4 (Right Stick X - Vertical)":
-                if value > threshold:
-                    detail = "Ascending (Provide vertical lift)"
-                elif value < -threshold:
-                    detail = "Descending (Reduce vertical lift)"
-                else:
-                    detail = "Neutral (No vertical change)"
-            lines.append(f"{axis}: {round(value, 2)}  → {detail}")
-        
-        if "claw_trigger" in full_data:
-            claw_val = full_data["claw_trigger"]
-            if claw_val >= 2100:
-                claw_state = "Max Open (Fully released)"
-            elif claw_val <= 1100:
-                claw_state = "Max Closed (Fully gripped)"
-            elif claw_val <= 1550 and claw_val >= 1450:
-                claw_state = "Neutral grip"
+        Starts a new mosaic of the main feed, or stops adding to the current one so it can be saved.
+        """
+        if self.__mosaic.is_running():
+            self.remove_main_feed_listener(self.__mosaic.submit)
+            self.__mosaic.stop()
+        else:
+            self.__mosaic_sequence = 0
+            self.__mosaic.start()
+            self.add_main_feed_listener(self.__mosaic.submit)
+
+    def save_mosaic(self):
+        """
+        Writes the current mosaic to disk in the background.
+        """
+        self.__mosaic.save()
+
+    def __update_mosaic_preview(self):
+        sequence, preview = self.__mosaic.preview()
+        if sequence == self.__mosaic_sequence or preview is None:
+            return
+        self.__mosaic_sequence = sequence
+        height, width = preview.shape[:2]
+        # The preview is a fresh array per update, so it is safe to reference until the copy into the pixmap.
+        image = QImage(preview.data, width, height, preview.strides[0], QImage.Format_BGR888)
+        self.__mosaic_preview.setPixmap(QPixmap.fromImage(image))
+        self.__mosaic_preview.setVisible(True)
+
+    def toggle_frame_bus(self):
+        if self.__frame_bus is not None:
+            self.close_frame_bus()
+            return
+        try:
+            self.__frame_bus = FrameBusPublisher(FRAME_BUS_NAME)
+        except FileExistsError as e:
+            logger.error(e)
+            return
+        self.add_main_feed_listener(self.__frame_bus.submit)
+
+    def close_frame_bus(self):
+        # The segment outlives the process unless it is removed, so this also runs when the window closes.
+        if self.__frame_bus is None:
+            return
+        self.remove_main_feed_listener(self.__frame_bus.submit)
+        self.__frame_bus.close()
+        self.__frame_bus = None
+
+    def toggle_inference(self):
+        if self.__inference.is_running():
+            if INFERENCE_ALL_CAMERAS:
+                for thread, listener in zip(self.__camera_manager.threads, self.__inference_listeners):
+                    thread.remove_frame_listener(listener)
             else:
-                claw_state = "Intermediate (Partial grip)"
-            lines.append(f"Claw Trigger: {claw_val}  → {claw_state}")
-        
-        if "claw_bumper" in full_data:
-            claw2_val = full_data["claw_bumper"]
-            if claw2_val >= 2100:
-                claw2_state = "Max Open (Fully released)"
-            elif claw2_val <= 1100:
-                claw2_state = "Max Closed (Fully gripped)"
-            elif claw2_val <= 1550 and claw2_val >= 1450:
-                claw2_state = "Neutral grip"
+                self.remove_main_feed_listener(self.__inference_listener)
+            self.__inference.stop()
+        elif self.__inference.start():
+            if INFERENCE_ALL_CAMERAS:
+                for thread, listener in zip(self.__camera_manager.threads, self.__inference_listeners):
+                    thread.add_frame_listener(listener)
             else:
-                claw2_state = "Intermediate (Partial grip)"
-            lines.append(f"Claw Bumper: {claw2_val}  → {claw2_state}")
-        
-        self.__axis_label.setText("\n".join(lines))
+                self.add_main_feed_listener(self.__inference_listener)
+
+    def __update_latency_overlay(self):
+        text = self.get_video_thread().latency_tracer.format_overlay()
+        if self.__vision.is_running():
+            text += "\n" + self.__vision.format_stats()
+        hud = self.__hud.stats()
+        text += f"\nhud      {hud['render_ms_avg']:6.2f} ms avg  {hud['redrawn']} redrawn  {hud['deferred']} deferred"
+        if self.__recording_gate.enabled:
+            record, replay = self.__recording_gate.stats(), self.__replay_gate.stats()
+            text += (f"\ngate     record {record['gated_ratio'] * 100:5.1f}% gated  "
+                     f"replay {replay['gated_ratio'] * 100:5.1f}% gated  {record['keyframes']} keyframes")
+        if self.__mosaic.is_running():
+            stats = self.__mosaic.stats()
+            text += (f"\nmosaic   {stats['place_ms_avg']:6.1f} ms/tile  {stats['tiles']} tiles  "
+                     f"{stats['skipped']} skipped  {stats['rejected']} rejected")
+        if self.__inference.is_running():
+            stats = self.__inference.stats()
+            text += (f"\ndetector {stats['infer_ms_avg']:6.1f} ms/batch  {stats['frames_per_batch']:.1f} frames/batch  "
+                     f"latency {stats['latency_ms']:6.1f} ms  stride {stats['stride']}  cached {stats['cache_hits']}")
+        if self.__link_stats is not None:
+            link = self.__link_stats()
+            control, channel = link["control"], link["channel"]
+            text += (f"\ncontrol  {control['rate_hz']:4.0f} Hz  jitter {control['jitter_ms_avg']:5.2f} ms avg  "
+                     f"{control['jitter_ms_max']:5.2f} ms max  {control['missed']} missed")
+            text += (f"\nlink     {link['protocol']} @ {link['baud']}  backlog {channel['backlog_bytes']} B  "
+                     f"{channel['coalesced']} coalesced  {channel['dropped']} dropped")
+            commands = link["commands"]
+            if commands:
+                text += (f"\nacks     rtt {commands['rtt_ms_p50']:5.1f}/{commands['rtt_ms_p95']:5.1f} ms p50/p95  "
+                         f"{commands['in_flight']} in flight  loss {commands['loss_recent'] * 100:4.1f}%  "
+                         f"{commands['reordered']} reordered")
+            connection = link["connection"]
+            text += f"\nserial   {connection['state']} {connection['port'] or ''}  {connection['disconnects']} lost"
+            if connection["recovery_s_last"] is not None:
+                text += (f"  recovered in {connection['recovery_s_last']:.2f} s last, "
+                         f"{connection['recovery_s_max']:.2f} s max")
+            failsafe = link["failsafe"]
+            watchdog = "off" if failsafe["watchdog_s"] is None else f"{failsafe['watchdog_s'] * 1000:.0f} ms"
+            text += f"\nfailsafe watchdog {watchdog}  {failsafe['trips']} trips"
+            if failsafe["silent_ms"] is not None:
+                text += f"  tripped after {failsafe['silent_ms']} ms silence"
+            if control["stale"]:
+                text += "  PILOT INPUT STALE"
+        self.__latency_overlay.setText(text)
+        self.__latency_overlay.adjustSize()
+
+    def __highlight_thumbnail(self, active):
+        for index, thumbnail in enumerate(self.__thumbnails):
+            thumbnail.setStyleSheet(ACTIVE_THUMBNAIL_CSS if index == active else INACTIVE_THUMBNAIL_CSS)
+
+    def switch_camera(self, index):
+        self.__camera_manager.switch_to(index)
+
+    def toggle_recording(self):
+        if self.__recorder.is_recording():
+            self.remove_main_feed_listener(self.__recording_gate.submit)
+            self.__recorder.stop_recording()
+            self.__recording_label.setVisible(False)
+        else:
+            self.__recorder.set_fps(self.get_video_thread().negotiated_format()["fps"])
+            self.__recorder.set_timestamps(self.__recording_gate.enabled)
+            self.__recorder.start_recording()
+            self.add_main_feed_listener(self.__recording_gate.submit)
+            self.__recording_label.setText("REC")
+            self.__recording_label.setVisible(True)
+
+    def toggle_change_gate(self):
+        """
+        Turns change gating of the recorder and the replay buffer on or off. Takes effect at the next
+        recording for the recorder's timestamp sidecar, immediately for the frames themselves.
+        """
+        enabled = not self.__recording_gate.enabled
+        self.__recording_gate.enabled = enabled
+        self.__replay_gate.enabled = enabled
+        logger.info(f"Change gating {'on' if enabled else 'off'}")
+
+    def add_main_feed_listener(self, listener):
+        """
+        Registers a VideoThread frame listener that follows whichever camera is the main feed.
+        """
+        self.__main_feed_listeners.append(listener)
+        self.__main_feed_thread.add_frame_listener(listener)
+
+    def remove_main_feed_listener(self, listener):
+        if listener in self.__main_feed_listeners:
+            self.__main_feed_listeners.remove(listener)
+        self.__main_feed_thread.remove_frame_listener(listener)
+
+    def __follow_active_camera(self, index):
+        # The recorder starts a new segment when the frame size changes with the camera.
+        for listener in self.__main_feed_listeners:
+            self.__main_feed_thread.remove_frame_listener(listener)
+        self.__main_feed_thread = self.__camera_manager.threads[index]
+        for listener in self.__main_feed_listeners:
+            self.__main_feed_thread.add_frame_listener(listener)
+
+    def __update_recording_info(self, stats):
+        if not stats["recording"]:
+            return
+        self.__recording_label.setText(
+            f"REC{' (gated)' if self.__recording_gate.enabled else ''}  segment {stats['segments']} | written {stats['written']} | dropped {stats['dropped']} | "
+            f"queue {stats['queue_depth']} | encode {stats['encode_ms_avg']:.1f} ms (max {stats['encode_ms_max']:.1f})"
+        )
+
+    def save_screenshot(self, metadata=None, count=1):
+        """
+        Saves the next `count` frames of the main feed with a JSON sidecar holding `metadata`.
+        Returns immediately; encoding happens on the screenshot writer's threads.
+        """
+        self.__screenshot_writer.request(metadata, count)
     
+    def toggle_streaming(self):
+        if self.__stream_server.is_serving():
+            self.remove_main_feed_listener(self.__stream_server.submit)
+            self.__stream_server.stop_server()
+        else:
+            self.__stream_server.start_server()
+            self.add_main_feed_listener(self.__stream_server.submit)
+
+    def save_replay(self):
+        """
+        Writes the instant-replay buffer to disk in the background.
+        """
+        logger.info(f"Saving replay: {self.__replay_buffer.stats()}")
+        self.__replay_buffer.dump()
+
+    def update_controls(self, data):
+        """
+        Shows the controller state on the HUD. Expects the JoystickThread.joystick_change_signal payload.
+        """
+        self.__controller_connected = bool(data.get("connected"))
+        if "axisInfo" in data:
+            self.__hud.set_thrusters(data["axisInfo"])
+        if "claw_trigger" in data and "claw_bumper" in data:
+            self.__hud.set_claws(data["claw_trigger"], data["claw_bumper"])
+
+    def update_telemetry(self, data):
+        """
+        Shows Arduino telemetry on the HUD. Depth (meters) and heading (degrees) are shown when reported.
+        """
+        self.__telemetry_at = time.monotonic()
+        if "depth" in data:
+            self.__hud.set_depth(data["depth"])
+        if "heading" in data:
+            self.__hud.set_heading(data["heading"])
+
+    def set_link_stats(self, source):
+        """
+        Args:
+            source (callable | None): Returns ArduinoThread.link_stats(), shown in the latency overlay.
+        """
+        self.__link_stats = source
+
+    def __update_hud_link(self):
+        self.__hud.set_link(self.__controller_connected, self.__telemetry_at)
+
     def get_video_thread(self):
-        return self.__video_thread
+        return self.__camera_manager.active_thread()
+
+    def get_camera_manager(self):
+        return self.__camera_manager
@@ -0,0 +1,271 @@
+import cv2
+import numpy as np
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+import logging
+import coloredlogs
+
+coloredlogs.install(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Overlay primitives returned by processors. Coordinates are in source frame pixels, colors are (r, g, b).
+Rect = namedtuple("Rect", ["x", "y", "w", "h", "color", "label"])
+Circle = namedtuple("Circle", ["x", "y", "r", "color"])
+Line = namedtuple("Line", ["x1", "y1", "x2", "y2", "color"])
+Polygon = namedtuple("Polygon", ["points", "color"])
+Text = namedtuple("Text", ["x", "y", "text", "color"])
+
+# What a processor produced for one frame. `frame_size` is (width, height) of the frame it looked at.
+VisionResult = namedtuple("VisionResult", ["name", "captured_at", "frame_size", "overlays", "data", "elapsed"])
+
+
+class Processor(ABC):
+    """
+    Base class for vision processors.
+
+    Subclasses implement process(), which receives a read-only BGR frame and returns a list of overlay
+    primitives and a JSON-serializable dict of structured results. process() runs on a worker thread and
+    may be as slow as it needs to be; the pipeline skips frames for it rather than queueing them.
+    """
+    name = "processor"
+
+    @abstractmethod
+    def process(self, frame):
+        pass
+
+
+class ColorSegmentationProcessor(Processor):
+    """
+    Finds blobs within an HSV color range, e.g. a red or blue target, and reports their count and areas.
+    """
+
+    def __init__(self, name, lower_hsv, upper_hsv, min_area=400, scale=0.5, color=(255, 80, 80)):
+        """
+        Args:
+            name (str): Name shown in results and stats.
+            lower_hsv (tuple): Inclusive lower HSV bound (OpenCV ranges: H 0-179, S and V 0-255).
+            upper_hsv (tuple): Inclusive upper HSV bound.
+            min_area (int): Smallest blob area, in source frame pixels, that is reported.
+            scale (float): Frames are downscaled by this factor before segmentation.
+            color (tuple): Overlay color.
+        """
+        self.name = name
+        self.__lower = np.array(lower_hsv, dtype=np.uint8)
+        self.__upper = np.array(upper_hsv, dtype=np.uint8)
+        self.__min_area = min_area
+        self.__scale = scale
+        self.__color = color
+        self.__kernel = np.ones((5, 5), np.uint8)
+
+    def process(self, frame):
+        small = cv2.resize(frame, None, fx=self.__scale, fy=self.__scale, interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, self.__lower, self.__upper)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.__kernel)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        overlays = []
+        areas = []
+        inverse = 1.0 / self.__scale
+        for contour in contours:
+            area = cv2.contourArea(contour) * inverse * inverse
+            if area < self.__min_area:
+                continue
+            x, y, w, h = (int(v * inverse) for v in cv2.boundingRect(contour))
+            areas.append(round(area))
+            overlays.append(Rect(x, y, w, h, self.__color, f"{self.name} {len(areas)}"))
+        return overlays, {"count": len(areas), "areas": areas}
+
+
+class ShapeCountProcessor(Processor):
+    """
+    Counts triangles, rectangles and circles in the frame by polygon approximation of dark outlines.
+    """
+    name = "shapes"
+
+    def __init__(self, min_area=600, scale=0.5):
+        self.__min_area = min_area
+        self.__scale = scale
+
+    def process(self, frame):
+        small = cv2.resize(frame, None, fx=self.__scale, fy=self.__scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        counts = {"triangle": 0, "rectangle": 0, "circle": 0}
+        overlays = []
+        inverse = 1.0 / self.__scale
+        for contour in contours:
+            area = cv2.contourArea(contour) * inverse * inverse
+            if area < self.__min_area:
+                continue
+            perimeter = cv2.arcLength(contour, True)
+            approx = cv2.approxPolyDP(contour, 0.03 * perimeter, True)
+            circularity = 4 * np.pi * cv2.contourArea(contour) / (perimeter * perimeter) if perimeter else 0
+            if len(approx) == 3:
+                shape = "triangle"
+            elif len(approx) == 4:
+                shape = "rectangle"
+            elif circularity > 0.8:
+                shape = "circle"
+            else:
+                continue
+            counts[shape] += 1
+            points = [(int(p[0][0] * inverse), int(p[0][1] * inverse)) for p in approx]
+            overlays.append(Polygon(points, (255, 209, 102)))
+            overlays.append(Text(points[0][0], points[0][1] - 6, shape, (255, 209, 102)))
+        return overlays, counts
+
+
+class VisionPipeline:
+    """
+    VisionPipeline runs vision processors on the main feed without ever slowing it down.
+
+    Each processor has its own worker thread. submit(), registered as a VideoThread frame listener, returns
+    immediately unless at least one worker is idle; then it copies the frame once into a shared read-only
+    buffer and wakes the idle workers, which all look at the same copy. A busy worker simply picks up the
+    newest frame when it is done, so a slow processor runs at whatever rate it can manage and the frames it
+    missed are counted as skipped. The latest result of every processor is kept for the GUI to draw.
+
+    Methods:
+        start() / stop():
+            Starts or stops the worker threads.
+
+        submit(frame, captured_at):
+            Frame listener feeding the workers.
+
+        results():
+            Returns the newest VisionResult of every processor, in processor order.
+
+        stats():
+            Returns per-processor frame counts and timing.
+
+        format_stats():
+            Returns the per-processor stats as text lines for an overlay.
+    """
+
+    def __init__(self, processors):
+        """
+        Args:
+            processors (list[Processor]): Processors to run, in the order their results are drawn.
+        """
+        self.__processors = list(processors)
+        self.__cond = threading.Condition()
+        # Each slot is [frame, captured_at, readers]. Slots are only rewritten when no worker reads them.
+        self.__slots = []
+        self.__latest = None
+        self.__sequence = 0
+        self.__idle = 0
+        self.__run_flag = False
+        self.__threads = []
+        self.__results = [None] * len(self.__processors)
+        self.__stats = [{"processed": 0, "skipped": 0, "total_ms": 0.0, "max_ms": 0.0} for _ in self.__processors]
+        self.capture_skipped = 0
+
+    def start(self):
+        if self.__run_flag:
+            return
+        self.__run_flag = True
+        self.__threads = [threading.Thread(target=self.__work, args=(index,), name=f"vision-{p.name}", daemon=True)
+                          for index, p in enumerate(self.__processors)]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        with self.__cond:
+            self.__run_flag = False
+            self.__cond.notify_all()
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+
+    def is_running(self):
+        return self.__run_flag
+
+    def submit(self, frame, captured_at):
+        """
+        Frame listener. Returns without copying if every worker is still busy with an earlier frame.
+
+        Args:
+            frame (numpy.ndarray): BGR frame.
+            captured_at (float): time.monotonic() capture time of the frame.
+        """
+        if not self.__idle:
+            self.capture_skipped += 1
+            return
+        with self.__cond:
+            index = next((i for i, s in enumerate(self.__slots) if s[2] == 0 and i != self.__latest), None)
+            if index is None:
+                index = len(self.__slots)
+                self.__slots.append([None, 0.0, 0])
+            slot = self.__slots[index]
+
+        # No reader can pick this slot up until it is published below, so it is safe to fill without the lock.
+        if slot[0] is None or slot[0].shape != frame.shape:
+            slot[0] = np.empty_like(frame)
+        slot[0].flags.writeable = True
+        np.copyto(slot[0], frame)
+        slot[0].flags.writeable = False
+        slot[1] = captured_at
+
+        with self.__cond:
+            self.__latest = index
+            self.__sequence += 1
+            self.__cond.notify_all()
+
+    def results(self):
+        return [result for result in self.__results if result is not None]
+
+    def stats(self):
+        stats = {}
+        for processor, s in zip(self.__processors, self.__stats):
+            stats[processor.name] = {
+                "processed": s["processed"],
+                "skipped": s["skipped"],
+                "avg_ms": s["total_ms"] / s["processed"] if s["processed"] else 0.0,
+                "max_ms": s["max_ms"]
+            }
+        return stats
+
+    def format_stats(self):
+        return "\n".join(f"{name:<8} {s['avg_ms']:6.1f} ms avg  {s['max_ms']:6.1f} max  {s['skipped']} skipped"
+                         for name, s in self.stats().items())
+
+    def __work(self, index):
+        processor = self.__processors[index]
+        stats = self.__stats[index]
+        last_sequence = 0
+        while True:
+            with self.__cond:
+                self.__idle += 1
+                while self.__run_flag and self.__sequence == last_sequence:
+                    self.__cond.wait(timeout=0.5)
+                self.__idle -= 1
+                if not self.__run_flag:
+                    return
+                slot = self.__slots[self.__latest]
+                slot[2] += 1
+                sequence = self.__sequence
+
+            if last_sequence:
+                stats["skipped"] += sequence - last_sequence - 1
+            last_sequence = sequence
+            frame, captured_at = slot[0], slot[1]
+            try:
+                start = time.perf_counter()
+                overlays, data = processor.process(frame)
+                elapsed = time.perf_counter() - start
+                self.__results[index] = VisionResult(processor.name, captured_at, (frame.shape[1], frame.shape[0]),
+                                                     overlays, data, elapsed)
+                stats["processed"] += 1
+                stats["total_ms"] += elapsed * 1000
+                stats["max_ms"] = max(stats["max_ms"], elapsed * 1000)
+            except Exception as e:
+                logger.error(f"Vision processor {processor.name} failed: {e}")
+            finally:
+                with self.__cond:
+                    slot[2] -= 1
@@ -1,5 +1,5 @@
-#include <ArduinoJson.h>
 #include <Servo.h>
+#include "serialprotocol.h"
 
 // Defining servos for discrete thruster control
 Servo leftThruster;
@@ -12,7 +12,7 @@ Servo claw;         // This servo is controlled by "claw_trigger"
 const byte clawPin = 29; // J9
 
 Servo claw2;        // This servo is controlled by "claw_bumper"
-const byte claw2Pin = 25; 
+const byte claw2Pin = 25;
 
 // Explicit thruster pin assignments
 const byte leftThrusterPin = 26;
@@ -20,8 +20,272 @@ const byte rightThrusterPin = 24;
 const byte leftUpThrusterPin = 22;
 const byte rightUpThrusterPin = 28;
 
+// Messages are split, checked and decoded byte by byte by FrameParser as they arrive; see serialprotocol.h.
+FrameParser parser;
+// Upper bound on the bytes parsed in one loop(), so a burst cannot hold up the rest of the loop. The Mega's
+// receive buffer holds 64; anything left is parsed on the next pass.
+const uint8_t MAX_BYTES_PER_LOOP = 32;
+
+// The link starts at DEFAULT_BAUD. The host may move it to any of BAUD_RATES: it sends SET_BAUD, both ends
+// switch after the BAUD_ACK, and the host probes the new rate with PINGs before sending BAUD_COMMIT. If no
+// commit arrives within BAUD_CONFIRM_TIMEOUT_MS the firmware goes back to the previous rate, so a rate the
+// tether cannot carry never strands the link. With no valid frame for BAUD_IDLE_TIMEOUT_MS the firmware
+// also drops back to DEFAULT_BAUD, where a host that reconnects starts looking for it.
+const uint32_t DEFAULT_BAUD = 9600;
+const uint32_t BAUD_RATES[] = { 9600, 57600, 115200, 250000, 500000, 1000000 };
+const unsigned long BAUD_CONFIRM_TIMEOUT_MS = 1000;
+const unsigned long BAUD_IDLE_TIMEOUT_MS = 2000;
+
+uint8_t replyVersion = 1;
+
+uint32_t currentBaud = DEFAULT_BAUD;
+uint32_t previousBaud = DEFAULT_BAUD;
+bool baudPending = false;
+unsigned long baudSwitchedAt = 0;
+unsigned long lastFrameAt = 0;
+
+// Heartbeat watchdog. Every valid message from the host is a heartbeat, and the host sends at least a
+// KEEPALIVE every 100 ms. When none arrives for heartbeatTimeoutMs the thrusters go to neutral and a
+// LINK_EVENT reports it; the next heartbeat reports the link restored. The thrusters stay neutral until the
+// host commands them again. The host sets the timeout with SET_WATCHDOG, 0 disabling it. It is armed by the
+// first heartbeat, so a board waiting for its host on the bench never trips. While a baud switch waits for
+// its commit the two ends may be on different rates, so the watchdog is paused and BAUD_CONFIRM_TIMEOUT_MS
+// bounds the silence instead; after a revert the host gets a full timeout at the rate it is back on.
+const unsigned long DEFAULT_HEARTBEAT_TIMEOUT_MS = 500;
+unsigned long heartbeatTimeoutMs = DEFAULT_HEARTBEAT_TIMEOUT_MS;
+bool heartbeatSeen = false;
+bool linkLost = false;
+// Whether the host speaks legacy JSON, so link events are sent to it as JSON too.
+bool jsonHost = false;
+
+void sendFrame(uint8_t type, const uint8_t *payload, size_t length) {
+  uint8_t body[MAX_FRAME_BYTES];
+  uint8_t encoded[MAX_FRAME_BYTES + 2];
+  body[0] = replyVersion;
+  body[1] = type;
+  memcpy(body + 2, payload, length);
+  uint16_t crc = crc16(body, length + 2);
+  body[length + 2] = crc & 0xFF;
+  body[length + 3] = crc >> 8;
+  size_t encodedLength = cobsEncode(body, length + 4, encoded);
+  encoded[encodedLength++] = 0;
+  Serial.write(encoded, encodedLength);
+}
+
+void sendAck(uint8_t status, bool sequenced, uint16_t seq) {
+  uint8_t reply[3] = { status, (uint8_t)(seq & 0xFF), (uint8_t)(seq >> 8) };
+  sendFrame(MSG_ACK, reply, sequenced ? 3 : 1);
+}
+
+void sendBaudAck(uint32_t baud, uint8_t phase) {
+  uint8_t reply[5];
+  writeU32(reply, baud);
+  reply[4] = phase;
+  sendFrame(MSG_BAUD_ACK, reply, sizeof(reply));
+}
+
+void sendLinkEvent(uint8_t event, unsigned long silentMs) {
+  if (jsonHost) {
+    char text[48];
+    snprintf(text, sizeof(text), "{\"link\":\"%s\",\"silent_ms\":%lu}\n", event == LINK_LOST ? "lost" : "restored",
+             silentMs);
+    Serial.print(text);
+    return;
+  }
+  uint8_t payload[5];
+  payload[0] = event;
+  writeU32(payload + 1, silentMs);
+  sendFrame(MSG_LINK_EVENT, payload, sizeof(payload));
+}
+
+bool isSupportedBaud(uint32_t baud) {
+  for (size_t i = 0; i < sizeof(BAUD_RATES) / sizeof(BAUD_RATES[0]); i++) {
+    if (BAUD_RATES[i] == baud) return true;
+  }
+  return false;
+}
+
+void switchBaud(uint32_t baud) {
+  Serial.flush();  // Let the acknowledgement leave at the old rate first.
+  Serial.end();
+  Serial.begin(baud);
+  currentBaud = baud;
+}
+
+void applyOutputs(uint16_t left, uint16_t right, uint16_t leftUp, uint16_t rightUp, uint16_t clawPw, uint16_t claw2Pw) {
+  leftThruster.writeMicroseconds(left);
+  rightThruster.writeMicroseconds(right);
+  leftUpThruster.writeMicroseconds(leftUp);
+  rightUpThruster.writeMicroseconds(rightUp);
+  claw.writeMicroseconds(clawPw);
+  claw2.writeMicroseconds(claw2Pw);
+}
+
+void neutralThrusters() {
+  leftThruster.writeMicroseconds(1500);
+  rightThruster.writeMicroseconds(1500);
+  leftUpThruster.writeMicroseconds(1500);
+  rightUpThruster.writeMicroseconds(1500);
+}
+
+void heartbeat(bool json) {
+  unsigned long now = millis();
+  jsonHost = json;
+  if (linkLost) {
+    linkLost = false;
+    sendLinkEvent(LINK_RESTORED, now - lastFrameAt);
+  }
+  heartbeatSeen = true;
+  lastFrameAt = now;
+}
+
+void checkHeartbeat() {
+  if (!heartbeatSeen || linkLost || heartbeatTimeoutMs == 0 || baudPending) return;
+  unsigned long silentMs = millis() - lastFrameAt;
+  if (silentMs < heartbeatTimeoutMs) return;
+  linkLost = true;
+  neutralThrusters();
+  sendLinkEvent(LINK_LOST, silentMs);
+}
+
+// Applies the fields present in an UPDATE. Returns false, touching nothing, if the length does not match the mask.
+bool applyUpdate(const uint8_t *payload, size_t length) {
+  if (length < 1) return false;
+  uint8_t mask = payload[0];
+  size_t expected = 1 + ((mask & UPDATE_THRUSTERS) ? 8 : 0) + ((mask & UPDATE_LEFT_TRIGGER) ? 2 : 0) +
+                    ((mask & UPDATE_RIGHT_TRIGGER) ? 2 : 0) + ((mask & UPDATE_CLAW) ? 2 : 0) + ((mask & UPDATE_CLAW2) ? 2 : 0);
+  if (length != expected) return false;
+
+  const uint8_t *field = payload + 1;
+  if (mask & UPDATE_THRUSTERS) {
+    leftThruster.writeMicroseconds(readU16(field));
+    rightThruster.writeMicroseconds(readU16(field + 2));
+    leftUpThruster.writeMicroseconds(readU16(field + 4));
+    rightUpThruster.writeMicroseconds(readU16(field + 6));
+    field += 8;
+  }
+  // Triggers drive nothing yet, as in COMMAND.
+  if (mask & UPDATE_LEFT_TRIGGER) field += 2;
+  if (mask & UPDATE_RIGHT_TRIGGER) field += 2;
+  if (mask & UPDATE_CLAW) {
+    claw.writeMicroseconds(readU16(field));
+    field += 2;
+  }
+  if (mask & UPDATE_CLAW2) {
+    claw2.writeMicroseconds(readU16(field));
+  }
+  return true;
+}
+
+// Handles a frame that FrameParser has already decoded and checked: version, type and payload.
+void handleFrame(const uint8_t *body, size_t bodyLength) {
+  if (body[0] < 1 || body[0] > PROTOCOL_VERSION) return;
+
+  const uint8_t *payload = body + 2;
+  size_t payloadLength = bodyLength - 2;
+  uint8_t type = body[1];
+  replyVersion = body[0];
+  heartbeat(false);
+  bool sequenced = body[0] >= 2 && (type == MSG_COMMAND || type == MSG_UPDATE || type == MSG_KEEPALIVE);
+  uint16_t seq = 0;
+  if (sequenced) {
+    if (payloadLength < 2) return;
+    seq = readU16(payload);
+    payload += 2;
+    payloadLength -= 2;
+  }
+
+  switch (type) {
+    case MSG_HELLO: {
+      // Agree on the highest version both sides speak.
+      uint8_t reply[2] = { payloadLength >= 1 && payload[0] < PROTOCOL_VERSION ? payload[0] : PROTOCOL_VERSION, 0 };
+      sendFrame(MSG_HELLO_ACK, reply, sizeof(reply));
+      break;
+    }
+    case MSG_PING: {
+      if (payloadLength != 2) return;
+      sendFrame(MSG_PONG, payload, payloadLength);
+      break;
+    }
+    case MSG_SET_BAUD: {
+      if (payloadLength != 4) return;
+      uint32_t baud = readU32(payload);
+      if (!isSupportedBaud(baud)) {
+        sendBaudAck(currentBaud, BAUD_REJECTED);
+        return;
+      }
+      sendBaudAck(baud, BAUD_SWITCHING);
+      // A second request before the first is committed still reverts to the last committed rate.
+      if (!baudPending) previousBaud = currentBaud;
+      switchBaud(baud);
+      baudPending = true;
+      baudSwitchedAt = millis();
+      break;
+    }
+    case MSG_BAUD_COMMIT: {
+      if (payloadLength != 4 || readU32(payload) != currentBaud) return;
+      // Answered even when already committed, in case the host lost the first acknowledgement.
+      baudPending = false;
+      sendBaudAck(currentBaud, BAUD_COMMITTED);
+      break;
+    }
+    case MSG_SET_WATCHDOG: {
+      if (payloadLength != 2) return;
+      heartbeatTimeoutMs = readU16(payload);
+      sendFrame(MSG_WATCHDOG_ACK, payload, payloadLength);
+      break;
+    }
+    case MSG_KEEPALIVE: {
+      sendAck(ACK_STATUS_OK, sequenced, seq);
+      break;
+    }
+    case MSG_UPDATE: {
+      if (!applyUpdate(payload, payloadLength)) return;
+      sendAck(ACK_STATUS_OK, sequenced, seq);
+      break;
+    }
+    case MSG_COMMAND: {
+      if (payloadLength != COMMAND_PAYLOAD_BYTES) return;
+      // Triggers (payload bytes 8-11) are carried for parity with the JSON command but drive nothing yet.
+      applyOutputs(readU16(payload), readU16(payload + 2), readU16(payload + 4), readU16(payload + 6),
+                   readU16(payload + 12), readU16(payload + 14));
+      sendAck(ACK_STATUS_OK, sequenced, seq);
+      break;
+    }
+  }
+}
+
+// Handles a legacy JSON command. Only the few keys the host sends are looked up, straight in the text, so
+// no document is built.
+void handleJson(const char *json, size_t length) {
+  // A command cut short, e.g. by a host that went away mid-write, is not applied.
+  if (json[length - 1] != '}') return;
+  heartbeat(true);
+
+  // Set thruster outputs from the "axisInfo" array, if available.
+  long axis[4];
+  if (jsonIntegers(json, "axisInfo", axis, 4) == 4) {
+    leftThruster.writeMicroseconds(axis[0]);
+    rightThruster.writeMicroseconds(axis[1]);
+    leftUpThruster.writeMicroseconds(axis[2]);
+    rightUpThruster.writeMicroseconds(axis[3]);
+  }
+
+  // Use new key names for claw control.
+  long value;
+  if (jsonIntegers(json, "claw_trigger", &value, 1)) {
+    claw.writeMicroseconds(value);
+  }
+
+  if (jsonIntegers(json, "claw_bumper", &value, 1)) {
+    claw2.writeMicroseconds(value);
+  }
+
+  Serial.print("{\"status\":\"OK\"}\n");
+}
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(DEFAULT_BAUD);
 
   // Attach each thruster individually
   leftThruster.attach(leftThrusterPin);
@@ -47,32 +311,28 @@ void setup() {
 }
 
 void loop() {
-  if (!Serial.available()) return;
-
-  String json = Serial.readStringUntil('\0');
-  StaticJsonDocument<300> doc;
-  if (deserializeJson(doc, json)) return;
-
-  // Set thruster outputs from the "axisInfo" array, if available.
-  JsonArray axis = doc["axisInfo"];
-  if (axis.size() >= 4) { 
-    leftThruster.writeMicroseconds(axis[0]);
-    rightThruster.writeMicroseconds(axis[1]);
-    leftUpThruster.writeMicroseconds(axis[2]);
-    rightUpThruster.writeMicroseconds(axis[3]);
+  if (baudPending && millis() - baudSwitchedAt >= BAUD_CONFIRM_TIMEOUT_MS) {
+    baudPending = false;
+    switchBaud(previousBaud);
+    lastFrameAt = millis();
   }
-  
-  // Use new key names for claw control.
-  if (doc.containsKey("claw_trigger")) {
-    claw.writeMicroseconds(doc["claw_trigger"]);
+  if (!baudPending && currentBaud != DEFAULT_BAUD && millis() - lastFrameAt >= BAUD_IDLE_TIMEOUT_MS) {
+    switchBaud(DEFAULT_BAUD);
   }
+  checkHeartbeat();
 
-  if (doc.containsKey("claw_bumper")) {  
-    claw2.writeMicroseconds(doc["claw_bumper"]);
+  // Never waits for the rest of a message: whatever has arrived is parsed, and a partial message is
+  // completed on a later pass.
+  for (uint8_t i = 0; i < MAX_BYTES_PER_LOOP && Serial.available() > 0; i++) {
+    switch (parser.feed(Serial.read())) {
+      case FrameParser::FRAME:
+        handleFrame(parser.body(), parser.length());
+        break;
+      case FrameParser::JSON:
+        handleJson((const char *)parser.body(), parser.length());
+        break;
+      default:
+        break;
+    }
   }
-
-  StaticJsonDocument<50> ack;
-  ack["status"] = "OK";
-  serializeJson(ack, Serial);
-  Serial.print('\n');
 }
@@ -0,0 +1,43 @@
+// Just enough of the Arduino core to build arduino.ino as a native program, for the tests and benchmark in
+// this folder. Serial is fed and read back by the test, and time only moves when the test moves it.
+#pragma once
+
+#include <stddef.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+#include <deque>
+#include <vector>
+
+typedef uint8_t byte;
+
+class MockSerial {
+public:
+  void begin(unsigned long rate) { baud = rate; }
+  void end() {}
+  void flush() {}
+  int available() { return (int)input.size(); }
+  int read() {
+    if (input.empty()) return -1;
+    uint8_t value = input.front();
+    input.pop_front();
+    return value;
+  }
+  size_t write(const uint8_t *data, size_t length) {
+    output.insert(output.end(), data, data + length);
+    return length;
+  }
+  size_t print(const char *text) { return write((const uint8_t *)text, strlen(text)); }
+
+  // Test side: bytes waiting to be read, bytes the firmware wrote, and the rate it last began at.
+  void inject(const uint8_t *data, size_t length) { input.insert(input.end(), data, data + length); }
+  std::deque<uint8_t> input;
+  std::vector<uint8_t> output;
+  unsigned long baud = 0;
+};
+
+extern MockSerial Serial;
+extern unsigned long mockMillis;
+
+inline unsigned long millis() { return mockMillis; }
+inline void delay(unsigned long ms) { mockMillis += ms; }
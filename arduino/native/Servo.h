@@ -0,0 +1,11 @@
+// Servo stand-in for the native build: remembers the pin and the last pulse width written.
+#pragma once
+
+class Servo {
+public:
+  void attach(int attachedPin) { pin = attachedPin; }
+  void writeMicroseconds(int value) { microseconds = value; }
+
+  int pin = -1;
+  int microseconds = 0;
+};
@@ -0,0 +1,116 @@
+// Measures the firmware's serial handling natively, built with `make bench`: parse time per byte, with and
+// without applying the commands, and the worst-case time of one loop() while the receive buffer is kept
+// as full as the Mega's. Native timings are far below an ATmega2560's; they are for comparing changes,
+// not absolute budgets.
+#include <stdio.h>
+#include <algorithm>
+#include <chrono>
+#include <random>
+#include "firmware.h"
+
+// Size of the Mega's hardware serial receive buffer: the most loop() can find waiting.
+const size_t RX_BUFFER_BYTES = 64;
+const size_t STREAM_MESSAGES = 200000;
+const size_t LOOP_SAMPLES = 1000000;
+
+typedef std::chrono::steady_clock Clock;
+
+static double nanoseconds(Clock::duration duration) {
+  return std::chrono::duration<double, std::nano>(duration).count();
+}
+
+// What the host sends at 50 Hz: mostly keepalives and small updates, a full command now and then.
+static std::vector<uint8_t> traffic(size_t messages, std::mt19937 &random) {
+  std::vector<uint8_t> stream;
+  for (size_t i = 0; i < messages; i++) {
+    uint16_t seq = i & 0xFFFF;
+    std::vector<uint8_t> payload = u16(seq);
+    std::vector<uint8_t> frame;
+    switch (random() % 4) {
+      case 0:
+        frame = hostFrame(2, MSG_KEEPALIVE, payload);
+        break;
+      case 1:
+      case 2:
+        payload.push_back(UPDATE_THRUSTERS);
+        for (int t = 0; t < 4; t++) {
+          std::vector<uint8_t> width = u16(1100 + random() % 800);
+          payload.insert(payload.end(), width.begin(), width.end());
+        }
+        frame = hostFrame(2, MSG_UPDATE, payload);
+        break;
+      default:
+        for (int t = 0; t < 8; t++) {
+          std::vector<uint8_t> field = u16(1100 + random() % 800);
+          payload.insert(payload.end(), field.begin(), field.end());
+        }
+        frame = hostFrame(2, MSG_COMMAND, payload);
+        break;
+    }
+    stream.insert(stream.end(), frame.begin(), frame.end());
+  }
+  return stream;
+}
+
+static void parseOnly(const std::vector<uint8_t> &stream) {
+  FrameParser bench;
+  size_t frames = 0;
+  Clock::time_point start = Clock::now();
+  for (uint8_t value : stream) frames += bench.feed(value) == FrameParser::FRAME;
+  double total = nanoseconds(Clock::now() - start);
+  printf("parse only       %7.2f ns/byte  %7.1f ns/frame  (%zu frames, %u dropped)\n", total / stream.size(),
+         total / frames, frames, (unsigned)bench.errors());
+}
+
+static void parseAndApply(const std::vector<uint8_t> &stream) {
+  Serial.input.assign(stream.begin(), stream.end());
+  size_t loops = 0;
+  Clock::time_point start = Clock::now();
+  while (Serial.available()) {
+    loop();
+    loops++;
+    Serial.output.clear();
+  }
+  double total = nanoseconds(Clock::now() - start);
+  printf("loop, applied    %7.2f ns/byte  %7.1f ns/loop   (%zu loops)\n", total / stream.size(), total / loops, loops);
+}
+
+static void loopLatency(const std::vector<uint8_t> &stream, std::mt19937 &random) {
+  // Garbage mixed in, so the drop paths are timed too.
+  std::vector<uint8_t> mixed;
+  for (size_t i = 0; i < stream.size(); i++) {
+    mixed.push_back(random() % 200 == 0 ? random() & 0xFF : stream[i]);
+  }
+  std::vector<double> samples;
+  samples.reserve(LOOP_SAMPLES);
+  size_t position = 0;
+  Serial.input.clear();
+  while (samples.size() < LOOP_SAMPLES) {
+    // Top the receive buffer up to what the Mega would hold.
+    while (Serial.input.size() < RX_BUFFER_BYTES) {
+      Serial.input.push_back(mixed[position]);
+      position = (position + 1) % mixed.size();
+    }
+    Clock::time_point start = Clock::now();
+    loop();
+    samples.push_back(nanoseconds(Clock::now() - start));
+    Serial.output.clear();
+  }
+  std::sort(samples.begin(), samples.end());
+  double sum = 0;
+  for (double sample : samples) sum += sample;
+  printf("loop latency     %7.1f ns avg  %7.1f ns p99  %7.1f ns p99.99  %7.1f ns max  (%u bytes/loop at most)\n",
+         sum / samples.size(), samples[samples.size() * 99 / 100], samples[samples.size() * 9999 / 10000],
+         samples.back(), (unsigned)MAX_BYTES_PER_LOOP);
+}
+
+int main() {
+  setup();
+  std::mt19937 random(1);
+  std::vector<uint8_t> stream = traffic(STREAM_MESSAGES, random);
+  printf("%zu messages, %zu bytes\n", STREAM_MESSAGES, stream.size());
+  parseOnly(stream);
+  parseAndApply(stream);
+  loopLatency(stream, random);
+  return 0;
+}
@@ -0,0 +1,23 @@
+// The sketch built as ordinary C++, as the Arduino IDE does after putting the core header in front. Include
+// this from exactly one file per program; it defines the sketch's globals, setup() and loop().
+#pragma once
+
+#include "Arduino.h"
+#include "../arduino.ino"
+
+// Encodes a frame the way the host does, for feeding to the firmware.
+inline std::vector<uint8_t> hostFrame(uint8_t version, uint8_t type, const std::vector<uint8_t> &payload) {
+  std::vector<uint8_t> body = { version, type };
+  body.insert(body.end(), payload.begin(), payload.end());
+  uint16_t crc = crc16(body.data(), body.size());
+  body.push_back(crc & 0xFF);
+  body.push_back(crc >> 8);
+  std::vector<uint8_t> encoded(body.size() + 2);
+  encoded.resize(cobsEncode(body.data(), body.size(), encoded.data()));
+  encoded.push_back(0);
+  return encoded;
+}
+
+inline std::vector<uint8_t> u16(uint16_t value) {
+  return { (uint8_t)(value & 0xFF), (uint8_t)(value >> 8) };
+}
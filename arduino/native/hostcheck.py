@@ -0,0 +1,237 @@
+# Checks of the host side of the serial link, run by `make test` next to the firmware's tests: sequence
+# tracking across the 16-bit wrap, the frames app/serialprotocol.py builds and reads, and baud negotiation
+# against the simulated firmware.
+import os
+import struct
+import sys
+import threading
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+import serial  # noqa: E402
+from arduinothread import ArduinoReadWorker, ArduinoWriteWorker  # noqa: E402
+from commandchannel import CommandChannel  # noqa: E402
+from commandtracker import ACK_TIMEOUT, CommandTracker  # noqa: E402
+from firmwaresim import FirmwareSimulator  # noqa: E402
+from serialbench import BenchReader  # noqa: E402
+from seriallink import BAUD_CONFIRM_TIMEOUT, CRC_ERROR_WINDOW, LinkControl  # noqa: E402
+from serialprotocol import (ACK_FORMAT, ACK_STATUS_OK, COMMAND_FORMAT, MSG_ACK, MSG_COMMAND,  # noqa: E402
+                            MSG_KEEPALIVE, MSG_UPDATE, SEQUENCE_FORMAT, SEQUENCED_ACK_FORMAT, UPDATE_FIELDS,
+                            DEFAULT_BAUD, ProtocolError, decode_frame, encode_control, encode_frame, split_frame)
+
+failures = 0
+
+COMMAND = {"axisInfo": [1600, 1400, 1550, 1450], "left_trigger": 0.5, "right_trigger": -0.25,
+           "claw_trigger": 1700, "claw_bumper": 1300}
+NEUTRAL_OUTPUTS = (1500,) * 4
+# Longest the writer may be kept off the link by one step down, failed or not, however many slower rates there
+# are: the switch itself and, if the firmware has to revert, the wait for it.
+STEP_BLACKOUT_LIMIT = 2 * BAUD_CONFIRM_TIMEOUT + 2.0
+
+
+def check(condition, what):
+    global failures
+    if not condition:
+        line = traceback.extract_stack(limit=2)[0].lineno
+        print(f"  {os.path.basename(__file__)}:{line}: {what} failed")
+        failures += 1
+
+
+def wire(frame):
+    # What the reader hands the decoder: the frame without its delimiter.
+    check(frame.endswith(b"\0") and b"\0" not in frame[:-1], "single delimiter")
+    return frame[:-1]
+
+
+def tracker_near_wrap(now):
+    # Runs the counter up to 0xFFFE the way the writer would, every command acknowledged at once.
+    tracker = CommandTracker()
+    for _ in range(0xFFFE):
+        tracker.acked(tracker.sent(now), now)
+    return tracker
+
+
+def test_wraparound():
+    # stats() expires in-flight commands against the real clock, so the checks keep to it.
+    now = time.monotonic()
+    tracker = tracker_near_wrap(now)
+    seqs = [tracker.sent(now + 0.01) for _ in range(4)]
+    check(seqs == [0xFFFE, 0xFFFF, 0, 1], "sequence wraps to 0")
+
+    # 0 and then 0xFFFF: the older command across the wrap is acknowledged second, so it is reordered.
+    tracker.acked(0, now + 0.02)
+    tracker.acked(0xFFFF, now + 0.03)
+    stats = tracker.stats()
+    check(stats["reordered"] == 1, "ack from before the wrap counts as reordered")
+    # 1 is newer than 0 across the wrap, so it is in order.
+    tracker.acked(1, now + 0.04)
+    check(tracker.stats()["reordered"] == 1, "ack after the wrap counts as in order")
+    check(tracker.stats()["in_flight"] == 1, "only 0xFFFE still in flight")
+
+
+def test_expired_ack():
+    now = time.monotonic() - 2 * ACK_TIMEOUT
+    tracker = tracker_near_wrap(now)
+    late = tracker.sent(now)
+    on_time = tracker.sent(now + ACK_TIMEOUT / 2)
+    # The first ack comes back after ACK_TIMEOUT: the command was already lost and it is no round trip.
+    tracker.acked(on_time, now + ACK_TIMEOUT + 0.01)
+    tracker.acked(late, now + ACK_TIMEOUT + 0.02)
+    stats = tracker.stats()
+    check(stats["lost"] == 1 and stats["late"] == 1, "expired ack counted lost and late")
+    check(stats["acked"] == 0xFFFE + 1, "on-time ack counted")
+    check(stats["rtt_ms_max"] < ACK_TIMEOUT * 1000, "expired ack leaves no round trip")
+    check(stats["reordered"] == 0, "a late ack is not also reordered")
+    # A duplicate of an ack already matched is late too.
+    tracker.acked(on_time, now + ACK_TIMEOUT + 0.03)
+    check(tracker.stats()["late"] == 2, "duplicate ack counted late")
+
+
+def test_command_round_trip():
+    for version in (1, 2):
+        version_read, msg_type, payload = split_frame(wire(encode_control(COMMAND, version, seq=0xFFFF)))
+        check(version_read == version and msg_type == MSG_COMMAND, f"v{version} command header")
+        if version >= 2:
+            seq, = SEQUENCE_FORMAT.unpack_from(payload)
+            check(seq == 0xFFFF, "command sequence number")
+            payload = payload[SEQUENCE_FORMAT.size:]
+        check(COMMAND_FORMAT.unpack(payload) == (1600, 1400, 1550, 1450, 500, -250, 1700, 1300),
+              f"v{version} command fields")
+
+
+def test_update_round_trip():
+    changed = {"right_trigger": -1.0, "claw_bumper": 1100}
+    version, msg_type, payload = split_frame(wire(encode_control(changed, seq=42)))
+    check(version == 2 and msg_type == MSG_UPDATE, "update header")
+    seq, mask = struct.unpack_from("<HB", payload)
+    check(seq == 42, "update sequence number")
+    offset = 3
+    fields = {}
+    for bit, (key, layout) in enumerate(UPDATE_FIELDS):
+        if mask & (1 << bit):
+            fields[key] = struct.unpack_from(layout, payload, offset)
+            offset += struct.calcsize(layout)
+    check(fields == {"right_trigger": (-1000,), "claw_bumper": (1100,)}, "update fields")
+    check(offset == len(payload), "update has nothing after its fields")
+
+    version, msg_type, payload = split_frame(wire(encode_control({}, seq=7)))
+    check(msg_type == MSG_KEEPALIVE and SEQUENCE_FORMAT.unpack(payload) == (7,), "keepalive")
+    version, msg_type, payload = split_frame(wire(encode_control({}, version=1)))
+    check(version == 1 and msg_type == MSG_KEEPALIVE and payload == b"", "v1 keepalive has no sequence number")
+
+
+def test_ack_decoding():
+    message = decode_frame(wire(encode_frame(MSG_ACK, SEQUENCED_ACK_FORMAT.pack(ACK_STATUS_OK, 0xFFFF), 2)))
+    check(message.type == MSG_ACK and message.fields == {"status": "OK", "seq": 0xFFFF}, "v2 ack")
+    message = decode_frame(wire(encode_frame(MSG_ACK, ACK_FORMAT.pack(ACK_STATUS_OK), 1)))
+    check(message.fields == {"status": "OK"}, "v1 ack has no sequence number")
+    message = decode_frame(wire(encode_frame(MSG_ACK, SEQUENCED_ACK_FORMAT.pack(3, 5), 2)))
+    check(message.fields == {"status": "ERROR 3", "seq": 5}, "v2 error ack")
+
+    # A v1 payload in a v2 frame, or a flipped bit, is refused rather than misread.
+    flipped = bytearray(encode_frame(MSG_ACK, SEQUENCED_ACK_FORMAT.pack(ACK_STATUS_OK, 1), 2))
+    flipped[4] ^= 0x80
+    for frame in (encode_frame(MSG_ACK, ACK_FORMAT.pack(ACK_STATUS_OK), 2), bytes(flipped)):
+        try:
+            decode_frame(wire(frame))
+            check(False, "bad ack refused")
+        except ProtocolError:
+            pass
+
+
+def test_failed_switch():
+    # The two rates above 250000 fail their probe, so the firmware waits out a revert at each. Its watchdog
+    # must not trip meanwhile.
+    simulator = FirmwareSimulator(max_stable_baud=250000)
+    simulator.start()
+    port = serial.Serial(simulator.port, DEFAULT_BAUD, timeout=0.05, write_timeout=0)
+    reader = BenchReader(port, 1)
+    try:
+        link = LinkControl(port, reader.control, lambda: reader.decoder.errors)
+        check(link.hello(2.0) is not None, "handshake")
+        check(link.step_up() == 250000, "settles on the fastest stable rate")
+        time.sleep(0.1)
+        check(simulator.link_events == [], "no watchdog trip during negotiation")
+    finally:
+        reader.running = False
+        reader.thread.join()
+        port.close()
+        simulator.stop()
+
+
+def drive_until_step(simulator, writer, steps, timeout):
+    # Feeds the writer a changing setpoint every tick, as the control scheduler would, until a step down was
+    # triggered and the pilot's commands reach the firmware again. Returns how long they did not, and whether
+    # the thrusters were stopped meanwhile.
+    triggered = len(steps)
+    stopped = False
+    deadline = time.monotonic() + timeout
+    tick = 0
+    while time.monotonic() < deadline:
+        tick += 1
+        writer.channel.put_setpoint({**COMMAND, "axisInfo": [1600 + tick % 2, 1400, 1550, 1450]})
+        time.sleep(0.02)
+        if len(steps) == triggered:
+            continue
+        if simulator.outputs[:4] == NEUTRAL_OUTPUTS:
+            stopped = True
+        elif stopped:
+            return time.monotonic() - steps[triggered], stopped
+    return None, stopped
+
+
+def test_step_down():
+    # The wire turns marginal in use. Each trigger makes the writer try one slower rate, with the thrusters
+    # stopped first, rather than search every rate while the last command keeps them running.
+    simulator = FirmwareSimulator()
+    simulator.start()
+    port = serial.Serial(simulator.port, DEFAULT_BAUD, timeout=0.05, write_timeout=0)
+    reader = ArduinoReadWorker(port, CommandTracker())
+    steps = []
+    writer = ArduinoWriteWorker(port, CommandChannel(), reader, refresh=lambda: steps.append(time.monotonic()))
+    threads = [threading.Thread(target=reader.read_arduino), threading.Thread(target=writer.handle_data)]
+    for thread in threads:
+        thread.start()
+    try:
+        deadline = time.monotonic() + 5.0
+        while writer.protocol is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        check(writer.link.baud == 1_000_000, "starts at the fastest rate")
+        # Clean at the next rate down, then at none of the rates the second trigger may try.
+        for max_stable_baud, error_rate, expected in ((500_000, 0.02, 500_000), (57_600, 0.05, 500_000)):
+            simulator._FirmwareSimulator__max_stable_baud = max_stable_baud
+            simulator._FirmwareSimulator__error_rate = error_rate
+            blackout, stopped = drive_until_step(simulator, writer, steps, 3 * CRC_ERROR_WINDOW + STEP_BLACKOUT_LIMIT)
+            check(blackout is not None, "errors trigger a step down and commands resume")
+            check(blackout is None or blackout < STEP_BLACKOUT_LIMIT, f"commands blacked out {blackout} s")
+            check(stopped, "thrusters stopped for the step")
+            check(writer.link.baud == expected, f"one rate per trigger, {writer.link.baud} baud")
+    finally:
+        writer.running = reader.running = False
+        for thread in threads:
+            thread.join()
+        port.close()
+        simulator.stop()
+
+
+def main():
+    tests = [
+        ("wraparound", test_wraparound),
+        ("expired ack", test_expired_ack),
+        ("command", test_command_round_trip),
+        ("update", test_update_round_trip),
+        ("ack decoding", test_ack_decoding),
+        ("failed switch", test_failed_switch),
+        ("step down", test_step_down),
+    ]
+    for name, run in tests:
+        before = failures
+        run()
+        print(f"{name:<16} {'ok' if failures == before else 'FAILED'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
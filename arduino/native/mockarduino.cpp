@@ -0,0 +1,4 @@
+#include "Arduino.h"
+
+MockSerial Serial;
+unsigned long mockMillis = 0;
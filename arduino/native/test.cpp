@@ -0,0 +1,339 @@
+// Unit tests of the firmware's serial handling, built natively with `make test`.
+#include <stdio.h>
+#include <string>
+#include "firmware.h"
+
+static int failures = 0;
+
+#define CHECK(condition)                                             \
+  do {                                                               \
+    if (!(condition)) {                                              \
+      printf("  %s:%d: CHECK(%s) failed\n", __FILE__, __LINE__, #condition); \
+      failures++;                                                    \
+    }                                                                \
+  } while (0)
+
+// Frames encoded by app/serialprotocol.py, so both ends are held to the same wire format.
+static const uint8_t PYTHON_COMMAND[] = {  // encode_command(..., version=2, seq=7)
+  0x04, 0x02, 0x10, 0x07, 0x13, 0x40, 0x06, 0x78, 0x05, 0x0E, 0x06, 0xAA, 0x05, 0xF4, 0x01, 0x06,
+  0xFF, 0xA4, 0x06, 0x14, 0x05, 0x9B, 0x23, 0x00
+};
+static const uint8_t PYTHON_UPDATE[] = {  // encode_update({"claw_trigger": 1800}, version=2, seq=8)
+  0x04, 0x02, 0x11, 0x08, 0x06, 0x08, 0x08, 0x07, 0xCB, 0x9C, 0x00
+};
+static const uint8_t PYTHON_HELLO[] = { 0x06, 0x01, 0x01, 0x02, 0xDF, 0xE8, 0x00 };
+static const char PYTHON_JSON[] = "{\"axisInfo\": [1600, 1400, 1550, 1450], \"left_trigger\": 0.5, "
+                                  "\"right_trigger\": -0.25, \"claw_trigger\": 1700, \"claw_bumper\": 1300}";
+
+struct Reply {
+  uint8_t version;
+  uint8_t type;
+  std::vector<uint8_t> payload;
+};
+
+static void reset() {
+  Serial.input.clear();
+  Serial.output.clear();
+  mockMillis = 0;
+  parser = FrameParser();
+  currentBaud = previousBaud = DEFAULT_BAUD;
+  baudPending = false;
+  lastFrameAt = 0;
+  heartbeatTimeoutMs = DEFAULT_HEARTBEAT_TIMEOUT_MS;
+  heartbeatSeen = linkLost = jsonHost = false;
+  setup();
+}
+
+static void inject(const uint8_t *data, size_t length) { Serial.inject(data, length); }
+static void inject(const std::vector<uint8_t> &data) { Serial.inject(data.data(), data.size()); }
+
+static void runUntilIdle() {
+  while (Serial.available()) loop();
+}
+
+// Splits what the firmware wrote into binary replies; JSON replies are left in Serial.output.
+static std::vector<Reply> replies() {
+  std::vector<Reply> result;
+  FrameParser reader;
+  for (uint8_t value : Serial.output) {
+    if (reader.feed(value) == FrameParser::FRAME) {
+      result.push_back({ reader.body()[0], reader.body()[1],
+                         std::vector<uint8_t>(reader.body() + 2, reader.body() + reader.length()) });
+    }
+  }
+  Serial.output.clear();
+  return result;
+}
+
+static void testPythonCommand() {
+  reset();
+  inject(PYTHON_COMMAND, sizeof(PYTHON_COMMAND));
+  runUntilIdle();
+  CHECK(leftThruster.microseconds == 1600);
+  CHECK(rightThruster.microseconds == 1400);
+  CHECK(leftUpThruster.microseconds == 1550);
+  CHECK(rightUpThruster.microseconds == 1450);
+  CHECK(claw.microseconds == 1700);
+  CHECK(claw2.microseconds == 1300);
+  std::vector<Reply> sent = replies();
+  CHECK(sent.size() == 1);
+  CHECK(sent[0].version == 2 && sent[0].type == MSG_ACK);
+  CHECK(sent[0].payload == std::vector<uint8_t>({ ACK_STATUS_OK, 7, 0 }));
+}
+
+static void testPythonUpdate() {
+  reset();
+  inject(PYTHON_UPDATE, sizeof(PYTHON_UPDATE));
+  runUntilIdle();
+  CHECK(claw.microseconds == 1800);
+  CHECK(leftThruster.microseconds == 1500);
+  std::vector<Reply> sent = replies();
+  CHECK(sent.size() == 1 && sent[0].payload == std::vector<uint8_t>({ ACK_STATUS_OK, 8, 0 }));
+}
+
+static void testHello() {
+  reset();
+  inject(PYTHON_HELLO, sizeof(PYTHON_HELLO));
+  runUntilIdle();
+  std::vector<Reply> sent = replies();
+  CHECK(sent.size() == 1);
+  CHECK(sent[0].version == 1 && sent[0].type == MSG_HELLO_ACK && sent[0].payload[0] == PROTOCOL_VERSION);
+}
+
+static void testJson() {
+  reset();
+  inject((const uint8_t *)PYTHON_JSON, sizeof(PYTHON_JSON));  // Includes the terminating zero.
+  runUntilIdle();
+  CHECK(leftThruster.microseconds == 1600);
+  CHECK(rightUpThruster.microseconds == 1450);
+  CHECK(claw.microseconds == 1700);
+  CHECK(claw2.microseconds == 1300);
+  CHECK(std::string(Serial.output.begin(), Serial.output.end()) == "{\"status\":\"OK\"}\n");
+
+  // A partial set of keys only moves what it names; a truncated command moves nothing and is not acked.
+  Serial.output.clear();
+  const char partial[] = "{\"claw_bumper\":1400}";
+  inject((const uint8_t *)partial, sizeof(partial));
+  const char truncated[] = "{\"axisInfo\": [1700, 1700, 1700, 1700], \"claw_tr";
+  inject((const uint8_t *)truncated, sizeof(truncated));
+  runUntilIdle();
+  CHECK(claw2.microseconds == 1400);
+  CHECK(leftThruster.microseconds == 1600);
+  CHECK(std::string(Serial.output.begin(), Serial.output.end()) == "{\"status\":\"OK\"}\n");
+}
+
+static void testJsonIntegers() {
+  long values[4] = { 0, 0, 0, 0 };
+  CHECK(jsonIntegers("{\"a\" : [ 1, -2 ,3.9e1, 4 ] }", "a", values, 4) == 4);
+  CHECK(values[0] == 1 && values[1] == -2 && values[2] == 3 && values[3] == 4);
+  CHECK(jsonIntegers("{\"ab\": 5, \"b\": 6}", "b", values, 1) == 1 && values[0] == 6);
+  CHECK(jsonIntegers("{\"a\": [1, 2]}", "a", values, 4) == 2);
+  CHECK(jsonIntegers("{\"a\": 1}", "missing", values, 1) == 0);
+}
+
+static void testByteAtATime() {
+  // Each loop() sees one more byte, as when the frame trickles in at a low rate: nothing blocks, and the
+  // command is applied exactly when its delimiter arrives.
+  reset();
+  for (size_t i = 0; i < sizeof(PYTHON_COMMAND); i++) {
+    CHECK(leftThruster.microseconds == 1500);
+    inject(PYTHON_COMMAND + i, 1);
+    loop();
+    CHECK(Serial.available() == 0);
+  }
+  CHECK(leftThruster.microseconds == 1600);
+}
+
+static void testBoundedLoop() {
+  reset();
+  for (int i = 0; i < 4; i++) inject(PYTHON_COMMAND, sizeof(PYTHON_COMMAND));
+  loop();
+  CHECK(Serial.available() == (int)(4 * sizeof(PYTHON_COMMAND) - MAX_BYTES_PER_LOOP));
+  runUntilIdle();
+  CHECK(replies().size() == 4);
+}
+
+static void testCorruption() {
+  reset();
+  std::vector<uint8_t> corrupt(PYTHON_COMMAND, PYTHON_COMMAND + sizeof(PYTHON_COMMAND));
+  corrupt[6] ^= 0x01;
+  inject(corrupt);
+  // Noise with no delimiter, longer than any message, then a good frame.
+  std::vector<uint8_t> noise(500, 0x5A);
+  inject(noise);
+  inject(std::vector<uint8_t>(1, 0));
+  inject(PYTHON_UPDATE, sizeof(PYTHON_UPDATE));
+  runUntilIdle();
+  CHECK(leftThruster.microseconds == 1500);
+  CHECK(claw.microseconds == 1800);
+  CHECK(parser.errors() == 2);
+  CHECK(replies().size() == 1);
+
+  // A group that runs past the delimiter is not valid COBS.
+  reset();
+  const uint8_t cut[] = { 0x09, 0x02, 0x05, 0x00 };
+  inject(cut, sizeof(cut));
+  runUntilIdle();
+  CHECK(parser.errors() == 1);
+  CHECK(replies().empty());
+}
+
+static void testBaudSwitch() {
+  reset();
+  // The silences below are for the baud timeouts; the watchdog is tested on its own.
+  heartbeatTimeoutMs = 0;
+  std::vector<uint8_t> rate(4);
+  writeU32(rate.data(), 115200);
+  inject(hostFrame(1, MSG_SET_BAUD, rate));
+  runUntilIdle();
+  std::vector<Reply> sent = replies();
+  CHECK(sent.size() == 1 && sent[0].type == MSG_BAUD_ACK && sent[0].payload[4] == BAUD_SWITCHING);
+  CHECK(Serial.baud == 115200);
+
+  // Not committed in time: back to the rate that worked.
+  mockMillis += BAUD_CONFIRM_TIMEOUT_MS;
+  loop();
+  CHECK(Serial.baud == DEFAULT_BAUD);
+
+  inject(hostFrame(1, MSG_SET_BAUD, rate));
+  inject(hostFrame(1, MSG_BAUD_COMMIT, rate));
+  runUntilIdle();
+  sent = replies();
+  CHECK(sent.size() == 2 && sent[1].payload[4] == BAUD_COMMITTED);
+  mockMillis += BAUD_CONFIRM_TIMEOUT_MS;
+  loop();
+  CHECK(Serial.baud == 115200);
+
+  // Committed, but the host went quiet: back to where a reconnecting host looks.
+  mockMillis += BAUD_IDLE_TIMEOUT_MS;
+  loop();
+  CHECK(Serial.baud == DEFAULT_BAUD);
+}
+
+static void testHeartbeatWatchdog() {
+  reset();
+  // Nothing trips before the host has been heard from.
+  mockMillis += 10 * DEFAULT_HEARTBEAT_TIMEOUT_MS;
+  loop();
+  CHECK(replies().empty());
+
+  unsigned long start = mockMillis;
+  inject(PYTHON_COMMAND, sizeof(PYTHON_COMMAND));
+  runUntilIdle();
+  replies();
+  mockMillis = start + DEFAULT_HEARTBEAT_TIMEOUT_MS - 1;
+  loop();
+  CHECK(leftThruster.microseconds == 1600);
+  CHECK(replies().empty());
+
+  // The loop() after the timeout runs out stops the thrusters, leaves the claws, and reports it once.
+  mockMillis = start + DEFAULT_HEARTBEAT_TIMEOUT_MS;
+  loop();
+  CHECK(leftThruster.microseconds == 1500 && rightThruster.microseconds == 1500);
+  CHECK(leftUpThruster.microseconds == 1500 && rightUpThruster.microseconds == 1500);
+  CHECK(claw.microseconds == 1700 && claw2.microseconds == 1300);
+  std::vector<Reply> sent = replies();
+  CHECK(sent.size() == 1 && sent[0].type == MSG_LINK_EVENT && sent[0].payload[0] == LINK_LOST);
+  CHECK(readU32(sent[0].payload.data() + 1) == DEFAULT_HEARTBEAT_TIMEOUT_MS);
+  mockMillis += 1000;
+  loop();
+  CHECK(replies().empty());
+
+  // The next heartbeat restores the link, reporting the whole silence, but commands nothing by itself.
+  inject(hostFrame(2, MSG_KEEPALIVE, u16(9)));
+  runUntilIdle();
+  sent = replies();
+  CHECK(sent.size() == 2 && sent[0].type == MSG_LINK_EVENT && sent[0].payload[0] == LINK_RESTORED);
+  CHECK(readU32(sent[0].payload.data() + 1) == DEFAULT_HEARTBEAT_TIMEOUT_MS + 1000);
+  CHECK(leftThruster.microseconds == 1500);
+
+  // The host sets the timeout; 0 disables the watchdog.
+  inject(hostFrame(1, MSG_SET_WATCHDOG, u16(200)));
+  runUntilIdle();
+  sent = replies();
+  CHECK(sent.size() == 1 && sent[0].type == MSG_WATCHDOG_ACK && readU16(sent[0].payload.data()) == 200);
+  mockMillis += 200;
+  loop();
+  CHECK(replies().size() == 1);
+  inject(hostFrame(1, MSG_SET_WATCHDOG, u16(0)));
+  runUntilIdle();
+  replies();
+  mockMillis += 60000;
+  loop();
+  CHECK(replies().empty());
+}
+
+static void testBaudSwitchWatchdog() {
+  // A rate the host gives up on leaves the two ends on different rates until the firmware reverts. That
+  // silence must not stop the thrusters.
+  reset();
+  inject(PYTHON_COMMAND, sizeof(PYTHON_COMMAND));
+  runUntilIdle();
+  std::vector<uint8_t> rate(4);
+  writeU32(rate.data(), 1000000);
+  inject(hostFrame(1, MSG_SET_BAUD, rate));
+  runUntilIdle();
+  replies();
+  mockMillis += BAUD_CONFIRM_TIMEOUT_MS - 1;
+  loop();
+  CHECK(leftThruster.microseconds == 1600);
+  CHECK(replies().empty());
+
+  // Back at the old rate, the host gets a full timeout from the revert to be heard again.
+  mockMillis += 1;
+  loop();
+  CHECK(Serial.baud == DEFAULT_BAUD);
+  unsigned long revertedAt = mockMillis;
+  mockMillis = revertedAt + DEFAULT_HEARTBEAT_TIMEOUT_MS - 1;
+  loop();
+  CHECK(leftThruster.microseconds == 1600);
+  CHECK(replies().empty());
+  inject(hostFrame(1, MSG_PING, u16(1)));
+  runUntilIdle();
+  std::vector<Reply> sent = replies();
+  CHECK(sent.size() == 1 && sent[0].type == MSG_PONG);
+
+  // A host that stays silent after the revert still trips it.
+  mockMillis += DEFAULT_HEARTBEAT_TIMEOUT_MS;
+  loop();
+  CHECK(leftThruster.microseconds == 1500);
+  sent = replies();
+  CHECK(sent.size() == 1 && sent[0].type == MSG_LINK_EVENT && sent[0].payload[0] == LINK_LOST);
+}
+
+static void testJsonHeartbeat() {
+  reset();
+  inject((const uint8_t *)PYTHON_JSON, sizeof(PYTHON_JSON));
+  runUntilIdle();
+  Serial.output.clear();
+  mockMillis += DEFAULT_HEARTBEAT_TIMEOUT_MS;
+  loop();
+  CHECK(leftThruster.microseconds == 1500);
+  CHECK(std::string(Serial.output.begin(), Serial.output.end()) == "{\"link\":\"lost\",\"silent_ms\":500}\n");
+}
+
+int main() {
+  struct {
+    const char *name;
+    void (*run)();
+  } tests[] = {
+    { "python command", testPythonCommand },
+    { "python update", testPythonUpdate },
+    { "hello", testHello },
+    { "json", testJson },
+    { "json integers", testJsonIntegers },
+    { "byte at a time", testByteAtATime },
+    { "bounded loop", testBoundedLoop },
+    { "corruption", testCorruption },
+    { "baud switch", testBaudSwitch },
+    { "heartbeat", testHeartbeatWatchdog },
+    { "baud watchdog", testBaudSwitchWatchdog },
+    { "json heartbeat", testJsonHeartbeat },
+  };
+  for (auto &test : tests) {
+    int before = failures;
+    test.run();
+    printf("%-16s %s\n", test.name, failures == before ? "ok" : "FAILED");
+  }
+  return failures ? 1 : 0;
+}
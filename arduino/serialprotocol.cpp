@@ -0,0 +1,155 @@
+#include "serialprotocol.h"
+
+#include <stdlib.h>
+#include <string.h>
+
+uint16_t crc16Update(uint16_t crc, uint8_t value) {
+  crc ^= (uint16_t)value << 8;
+  for (uint8_t bit = 0; bit < 8; bit++) {
+    crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  }
+  return crc;
+}
+
+uint16_t crc16(const uint8_t *data, size_t length) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++) crc = crc16Update(crc, data[i]);
+  return crc;
+}
+
+size_t cobsEncode(const uint8_t *in, size_t length, uint8_t *out) {
+  size_t codeIndex = 0;
+  size_t written = 1;
+  uint8_t code = 1;
+  for (size_t i = 0; i < length; i++) {
+    if (in[i]) {
+      out[written++] = in[i];
+      code++;
+    }
+    if (!in[i] || code == 0xFF) {
+      out[codeIndex] = code;
+      codeIndex = written++;
+      code = 1;
+    }
+  }
+  out[codeIndex] = code;
+  return written;
+}
+
+uint16_t readU16(const uint8_t *p) {
+  return (uint16_t)p[0] | ((uint16_t)p[1] << 8);
+}
+
+uint32_t readU32(const uint8_t *p) {
+  return (uint32_t)readU16(p) | ((uint32_t)readU16(p + 2) << 16);
+}
+
+void writeU32(uint8_t *p, uint32_t value) {
+  for (uint8_t i = 0; i < 4; i++) p[i] = value >> (8 * i);
+}
+
+static const char *skipSpace(const char *p) {
+  while (*p == ' ' || *p == '\t' || *p == '\r' || *p == '\n') p++;
+  return p;
+}
+
+uint8_t jsonIntegers(const char *json, const char *key, long *values, uint8_t count) {
+  size_t keyLength = strlen(key);
+  for (const char *quote = strchr(json, '"'); quote != NULL; quote = strchr(quote + 1, '"')) {
+    if (strncmp(quote + 1, key, keyLength) != 0 || quote[keyLength + 1] != '"') continue;
+    const char *p = skipSpace(quote + keyLength + 2);
+    if (*p != ':') continue;
+    p = skipSpace(p + 1);
+    bool array = *p == '[';
+    if (array) p++;
+    uint8_t found = 0;
+    while (found < count) {
+      char *end;
+      long value = strtol(p, &end, 10);
+      if (end == p) break;
+      values[found++] = value;
+      p = end;
+      while ((*p >= '0' && *p <= '9') || *p == '.' || *p == 'e' || *p == 'E' || *p == '+' || *p == '-') p++;
+      p = skipSpace(p);
+      if (!array || *p != ',') break;
+      p = skipSpace(p + 1);
+    }
+    return found;
+  }
+  return 0;
+}
+
+FrameParser::FrameParser() : bodyLength(0), state(START), code(0), remaining(0), crc(0xFFFF), errorCount(0) {}
+
+FrameParser::Result FrameParser::feed(uint8_t value) {
+  if (value == 0) return finish();
+  switch (state) {
+    case START:
+      bodyLength = 0;
+      crc = 0xFFFF;
+      if (value == '{') {
+        state = TEXT;
+        append(value);
+      } else {
+        state = BINARY;
+        code = value;
+        remaining = value - 1;
+      }
+      break;
+    case BINARY:
+      if (remaining > 0) {
+        remaining--;
+        append(value);
+      } else {
+        // The previous group is complete, so this is the next code byte. Unless that group was a full one,
+        // a zero stood where it ended.
+        if (code != 0xFF && !append(0)) break;
+        code = value;
+        remaining = value - 1;
+      }
+      break;
+    case TEXT:
+      append(value);
+      break;
+    case DISCARD:
+      break;
+  }
+  return NONE;
+}
+
+bool FrameParser::append(uint8_t value) {
+  if (bodyLength >= (state == TEXT ? MAX_JSON_BYTES : MAX_FRAME_BYTES)) {
+    state = DISCARD;
+    return false;
+  }
+  buffer[bodyLength++] = value;
+  if (state == BINARY && bodyLength > 2) crc = crc16Update(crc, buffer[bodyLength - 3]);
+  return true;
+}
+
+FrameParser::Result FrameParser::finish() {
+  Result result = NONE;
+  switch (state) {
+    case START:
+      break;
+    case BINARY:
+      // A group cut short by the delimiter is not valid COBS.
+      if (remaining == 0 && bodyLength >= 4 && readU16(buffer + bodyLength - 2) == crc) {
+        bodyLength -= 2;
+        result = FRAME;
+      } else {
+        result = DROPPED;
+      }
+      break;
+    case TEXT:
+      buffer[bodyLength] = 0;
+      result = JSON;
+      break;
+    case DISCARD:
+      result = DROPPED;
+      break;
+  }
+  if (result == DROPPED) errorCount++;
+  state = START;
+  return result;
+}
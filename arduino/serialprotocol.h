@@ -0,0 +1,91 @@
+// Binary protocol, mirrored in app/serialprotocol.py. A frame is version, type, payload and a CRC-16
+// (CCITT-FALSE, little-endian), COBS-encoded and terminated by a zero byte. Legacy JSON commands are
+// terminated by a zero byte too and always start with '{', which a COBS frame this short never does.
+// Version 2 leads COMMAND, UPDATE and KEEPALIVE payloads with a sequence number that the ACK echoes.
+// Replies are framed with the version of the frame they answer, so older hosts can read them.
+//
+// Nothing in here depends on the Arduino core, so it builds unchanged for the Mega and for the native
+// tests and benchmark in native/.
+#pragma once
+
+#include <stddef.h>
+#include <stdint.h>
+
+const uint8_t PROTOCOL_VERSION = 2;
+const uint8_t MSG_HELLO = 0x01;
+const uint8_t MSG_SET_BAUD = 0x02;
+const uint8_t MSG_BAUD_COMMIT = 0x03;
+const uint8_t MSG_PING = 0x04;
+const uint8_t MSG_KEEPALIVE = 0x05;
+const uint8_t MSG_SET_WATCHDOG = 0x06;
+const uint8_t MSG_COMMAND = 0x10;
+const uint8_t MSG_UPDATE = 0x11;
+const uint8_t MSG_HELLO_ACK = 0x81;
+const uint8_t MSG_BAUD_ACK = 0x82;
+const uint8_t MSG_PONG = 0x84;
+const uint8_t MSG_WATCHDOG_ACK = 0x86;
+const uint8_t MSG_ACK = 0x90;
+const uint8_t MSG_LINK_EVENT = 0x91;
+const uint8_t ACK_STATUS_OK = 0;
+const uint8_t BAUD_SWITCHING = 0;
+const uint8_t BAUD_COMMITTED = 1;
+const uint8_t BAUD_REJECTED = 2;
+// LINK_EVENT payload: one of these, then how long the host had been silent in milliseconds (uint32).
+const uint8_t LINK_LOST = 0;
+const uint8_t LINK_RESTORED = 1;
+const size_t MAX_FRAME_BYTES = 64;
+// Longest legacy JSON command accepted; the host's full command is about 130 bytes.
+const size_t MAX_JSON_BYTES = 192;
+// COMMAND payload: 4 thruster pulse widths (uint16), 2 triggers in thousandths (int16), 2 claw pulse widths (uint16).
+const size_t COMMAND_PAYLOAD_BYTES = 16;
+// UPDATE payload: a mask byte, then only the fields whose bit is set, encoded as in COMMAND.
+const uint8_t UPDATE_THRUSTERS = 0x01;
+const uint8_t UPDATE_LEFT_TRIGGER = 0x02;
+const uint8_t UPDATE_RIGHT_TRIGGER = 0x04;
+const uint8_t UPDATE_CLAW = 0x08;
+const uint8_t UPDATE_CLAW2 = 0x10;
+
+uint16_t crc16Update(uint16_t crc, uint8_t value);
+uint16_t crc16(const uint8_t *data, size_t length);
+size_t cobsEncode(const uint8_t *in, size_t length, uint8_t *out);
+uint16_t readU16(const uint8_t *p);
+uint32_t readU32(const uint8_t *p);
+void writeU32(uint8_t *p, uint32_t value);
+
+// Finds "key" in a flat JSON object and reads up to `count` integers from its value, a number or an array
+// of numbers; fractions are truncated. Returns how many were read, 0 if the key is missing.
+uint8_t jsonIntegers(const char *json, const char *key, long *values, uint8_t count);
+
+// Splits the incoming byte stream into messages, one byte at a time, so the loop never waits for the rest
+// of a message. COBS is decoded and the CRC computed as the bytes arrive, so the work per byte is constant
+// and nothing is left to do in bulk when the delimiter comes. Everything lives in one fixed buffer; a
+// message too long for it is skipped up to its delimiter and counted as an error.
+class FrameParser {
+public:
+  enum Result : uint8_t {
+    NONE,   // Mid-message, or an empty message.
+    FRAME,  // A binary frame with a good CRC: body() is version, type and payload, without the CRC.
+    JSON,   // A legacy JSON command: body() is the text, zero-terminated.
+    DROPPED // A message that was discarded: bad COBS, bad CRC, too short or too long.
+  };
+
+  FrameParser();
+  Result feed(uint8_t value);
+  const uint8_t *body() const { return buffer; }
+  size_t length() const { return bodyLength; }
+  uint32_t errors() const { return errorCount; }
+
+private:
+  enum State : uint8_t { START, BINARY, TEXT, DISCARD };
+
+  Result finish();
+  bool append(uint8_t value);
+
+  uint8_t buffer[MAX_JSON_BYTES + 1];
+  size_t bodyLength;
+  State state;
+  uint8_t code;       // The current COBS group's code byte.
+  uint8_t remaining;  // Bytes left in the current COBS group.
+  uint16_t crc;       // Running CRC, two bytes behind the decoded body since the last two are the CRC.
+  uint32_t errorCount;
+};